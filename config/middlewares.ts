@@ -26,6 +26,7 @@ export default [
   'strapi::logger',
   'strapi::query',
   'strapi::body',
+  'global::conditional-get',
   {
     name: 'strapi::session',
     config: {
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Benchmark history and regression gate for the Python pipeline scripts.
+
+Every case below times one stage of a script (setup excluded) `repeat`
+times and measures its peak traced allocation once. A run is stored as one
+JSON line in metrics/bench-history.jsonl, keyed by the commit it ran on
+(`git rev-parse HEAD`, plus "dirty" when the tree has local changes).
+
+compare checks the latest run against a rolling baseline: the runs of the
+previous WINDOW commits. For each case:
+- time: a one-sided Mann-Whitney U test between the run's samples and the
+  pooled baseline samples. The case is a slowdown when p < ALPHA and the
+  median is more than TOLERANCE slower.
+- memory: peak allocation ratio against the baseline median.
+A slowdown past the case's budget (BUDGETS, default DEFAULT_BUDGET) fails
+the command with exit status 1; smaller significant slowdowns are reported
+as warnings.
+
+    python3 bench_history.py run [--repeat 7] [case ...]   # measure HEAD and store it
+    python3 bench_history.py compare                       # latest run vs baseline
+    python3 bench_history.py check [--repeat 7]            # run + compare (CI / cron gate)
+    python3 bench_history.py show [case]
+"""
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+metrics_dir = os.environ.get('PIPELINE_METRICS_DIR', os.path.join(script_dir, 'metrics'))
+history_file = os.path.join(metrics_dir, 'bench-history.jsonl')
+
+WINDOW = 10          # baseline commits
+ALPHA = 0.01         # significance level of the time test
+TOLERANCE = 0.05     # slowdowns under 5% are not reported
+DEFAULT_BUDGET = {'time': 1.5, 'memory': 1.3}
+BUDGETS = {
+    # Stages on the import path get a tighter time budget
+    'validators.check': {'time': 1.25, 'memory': 1.3},
+    'changeset.diff': {'time': 1.25, 'memory': 1.3},
+}
+
+
+# --- Cases: name -> setup() returning the zero-argument stage to time ----------
+
+def _validators_check():
+    from validators import ValidationReport, _bench_records
+    records = list(_bench_records(100000))
+
+    def stage():
+        report = ValidationReport('bench')
+        for record in records:
+            report.check('battery-product', record)
+    return stage
+
+
+def _model_duplicates_detect():
+    from model_duplicates import detect, load_catalog
+    models = load_catalog()
+    return lambda: detect(models)
+
+
+def _changeset_diff():
+    from changeset import diff
+    rng = random.Random(1)
+    snapshot = [{"ref": f"WIPERS-brand-model-{i}", "documentId": f"doc{i}", "category": "wipers",
+                 "name": f"Entry {i}", "wipersPositions": [], "constructionYearEnd": None} for i in range(20000)]
+    records = [(entry['ref'], {key: entry[key] for key in ('ref', 'category', 'name', 'wipersPositions',
+                                                          'constructionYearEnd')})
+               for entry in snapshot]
+    for i in rng.sample(range(len(records)), 400):
+        records[i][1]['constructionYearEnd'] = '12/2026'
+    return lambda: diff(records, snapshot, 'wipers')
+
+
+def _catalog_index_lookup():
+    from catalog_index import CatalogReader
+    catalog = CatalogReader()
+    pairs = [(b, m) for b in catalog.brands for m in catalog.model_slugs(b)]
+    sample = random.Random(1).sample(pairs, min(2000, len(pairs)))
+    return lambda: [catalog.model(b, m) for b, m in sample]
+
+
+def _fulmen_parse_row():
+    from ingest_fulmen import fulmen_workbook_file, iter_sheet_rows, parse_row
+    rows = [cells for _, cells in iter_sheet_rows(fulmen_workbook_file)]
+    return lambda: [parse_row(cells) for cells in rows]
+
+
+def _date_index_build():
+    from date_index import YearIndex, load_intervals
+    intervals = load_intervals()
+    return lambda: YearIndex(intervals)
+
+
+def _battery_encoding_decode():
+    from battery_encoding import decode, encode
+    from catalog_records import _motorisation_record, _synthetic_exide_vehicles
+    motorisations = [_motorisation_record(v) for v in _synthetic_exide_vehicles(30000)]
+    document = json.loads(json.dumps(encode([{"brand": "B", "brandSlug": "b", "model": f"M{i}", "modelSlug": f"m{i}",
+                                              "motorisations": motorisations[i * 12:(i + 1) * 12]}
+                                             for i in range(2500)])))
+    return lambda: decode(document)
+
+
+def _valeo_normalize_model():
+    sys.path.insert(0, os.path.join(script_dir, 'wipers'))
+    import parse_valeo_janv2026 as valeo
+    from json_cache import load_json
+    database = load_json(os.path.join(script_dir, 'wipers', 'wipers_database_janv2026.json'))
+    # Raw Valeo spellings of the rename table, then every model name of the database
+    names = [(name, brand) for brand, renames in valeo.MODEL_NAME_MAP.items() for name in renames]
+    names += [(entry['model'], brand) for brand, entries in database['brands'].items() for entry in entries]
+    return lambda: [valeo.normalize_model(name, brand) for name, brand in names]
+
+
+def _exide_dedupe_motorisations():
+    from catalog_records import _motorisation_record, _synthetic_exide_vehicles, dedupe_motorisations
+    motorisations = [_motorisation_record(v) for v in _synthetic_exide_vehicles(6000)]
+    # Exide repeats a motorisation once per vehicle variant; neighbouring models share half their rows
+    models = [motorisations[i * 6:i * 6 + 12] * 2 for i in range(999)]
+
+    def stage():
+        # Per model (renamed copies, as the transform does), then models merged by cleaned name
+        per_model = [dedupe_motorisations(m.with_name(m.motorisation) for m in rows) for rows in models]
+        return [dedupe_motorisations(per_model[i] + per_model[i + 1]) for i in range(0, len(per_model) - 1, 2)]
+    return stage
+
+
+CASES = {
+    'validators.check': _validators_check,
+    'model_duplicates.detect': _model_duplicates_detect,
+    'changeset.diff': _changeset_diff,
+    'catalog_index.lookup': _catalog_index_lookup,
+    'ingest_fulmen.parse_row': _fulmen_parse_row,
+    'date_index.build': _date_index_build,
+    'battery_encoding.decode': _battery_encoding_decode,
+    'valeo.normalize_model': _valeo_normalize_model,
+    'exide_transform.dedupe': _exide_dedupe_motorisations,
+}
+
+
+# --- Measure and store ------------------------------------------------------------
+
+def current_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=script_dir, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=script_dir,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+    return commit, bool(dirty)
+
+
+def measure(names, repeat):
+    results = {}
+    for name in names:
+        try:
+            stage = CASES[name]()
+        except (ImportError, OSError) as e:
+            print(f"  {name:<26} skipped ({e})")
+            continue
+        stage()  # warm-up
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stage()
+            samples.append(time.perf_counter() - start)
+        tracemalloc.start()
+        stage()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"samples": [round(s, 6) for s in samples], "peakKb": round(peak / 1024, 1)}
+        print(f"  {name:<26} median {statistics.median(samples) * 1000:9.2f} ms   peak {peak / 1024:9.1f} KB")
+    return results
+
+
+def record_run(names, repeat):
+    commit, dirty = current_commit()
+    print(f"Benchmarking {commit[:10]}{' (dirty)' if dirty else ''}, {repeat} samples per case")
+    run = {
+        "commit": commit,
+        "dirty": dirty,
+        "recordedAt": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "cases": measure(names, repeat),
+    }
+    os.makedirs(metrics_dir, exist_ok=True)
+    with open(history_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run) + '\n')
+    return run
+
+
+def load_history():
+    if not os.path.exists(history_file):
+        return []
+    with open(history_file, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# --- Compare ------------------------------------------------------------------------
+
+def mann_whitney_greater(current, baseline):
+    """One-sided p-value that `current` samples are larger than `baseline` (normal approximation, tie-corrected)"""
+    values = sorted([(v, 0) for v in current] + [(v, 1) for v in baseline])
+    ranks = [0.0] * len(values)
+    ties = 0.0
+    i = 0
+    while i < len(values):
+        j = i
+        while j + 1 < len(values) and values[j + 1][0] == values[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+    n1, n2 = len(current), len(baseline)
+    u = sum(rank for rank, (_, group) in zip(ranks, values) if group == 0) - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def baseline_runs(history, run, window=WINDOW):
+    """Most recent run of each of the `window` previous commits (same host)"""
+    by_commit = {}
+    for past in history:
+        if past is run or past['commit'] == run['commit'] or past.get('host') != run.get('host'):
+            continue
+        by_commit.pop(past['commit'], None)
+        by_commit[past['commit']] = past
+    return list(by_commit.values())[-window:]
+
+
+def compare(run, history, window=WINDOW):
+    """Print the comparison table; returns the list of budget breaches"""
+    baseline = baseline_runs(history, run, window)
+    if not baseline:
+        print("No baseline yet (no earlier commit in the history): nothing to compare")
+        return []
+    print(f"\nBaseline: {len(baseline)} commits ({baseline[0]['commit'][:10]} .. {baseline[-1]['commit'][:10]})")
+    print(f"{'case':<26} {'time':>10} {'vs base':>8} {'p':>7} {'peak KB':>10} {'vs base':>8}  verdict")
+    breaches = []
+    for name, result in run['cases'].items():
+        base_samples = [s for past in baseline for s in past['cases'].get(name, {}).get('samples', [])]
+        base_peaks = [past['cases'][name]['peakKb'] for past in baseline if name in past['cases']]
+        if not base_samples:
+            print(f"{name:<26} {'':>10} {'new':>8}")
+            continue
+        budget = BUDGETS.get(name, DEFAULT_BUDGET)
+        time_ratio = statistics.median(result['samples']) / statistics.median(base_samples)
+        p_value = mann_whitney_greater(result['samples'], base_samples)
+        memory_ratio = result['peakKb'] / statistics.median(base_peaks) if statistics.median(base_peaks) else 1.0
+
+        verdict = []
+        significant = p_value < ALPHA and time_ratio > 1 + TOLERANCE
+        if significant and time_ratio > budget['time']:
+            verdict.append(f"FAIL time > {budget['time']}x")
+        elif significant:
+            verdict.append("slower")
+        if memory_ratio > budget['memory']:
+            verdict.append(f"FAIL memory > {budget['memory']}x")
+        elif memory_ratio > 1 + TOLERANCE:
+            verdict.append("more memory")
+        if any(v.startswith('FAIL') for v in verdict):
+            breaches.append((name, time_ratio, memory_ratio))
+        print(f"{name:<26} {statistics.median(result['samples']) * 1000:8.2f}ms {time_ratio:7.2f}x {p_value:7.4f} "
+              f"{result['peakKb']:10.1f} {memory_ratio:7.2f}x  {', '.join(verdict) or 'ok'}")
+    return breaches
+
+
+def report(breaches):
+    if breaches:
+        print(f"\n{len(breaches)} budget(s) exceeded:")
+        for name, time_ratio, memory_ratio in breaches:
+            print(f"  {name}: time {time_ratio:.2f}x, memory {memory_ratio:.2f}x the baseline")
+        sys.exit(1)
+    print("\nAll cases within budget")
+
+
+def show(case=None):
+    for run in load_history():
+        for name, result in run['cases'].items():
+            if case in (None, name):
+                print(f"{run['recordedAt'][:19]} {run['commit'][:10]}{'*' if run['dirty'] else ' '} {name:<26} "
+                      f"{statistics.median(result['samples']) * 1000:9.2f} ms {result['peakKb']:9.1f} KB")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    repeat = 7
+    if '--repeat' in args:
+        position = args.index('--repeat')
+        repeat = int(args[position + 1])
+        del args[position:position + 2]
+    names = [name for name in args[1:] if name in CASES] or list(CASES)
+    if args[:1] == ['run']:
+        record_run(names, repeat)
+    elif args[:1] == ['compare']:
+        history = load_history()
+        if not history:
+            sys.exit(f"No history in {history_file}, run 'python3 bench_history.py run' first")
+        report(compare(history[-1], history))
+    elif args[:1] == ['check']:
+        run = record_run(names, repeat)
+        report(compare(run, load_history()))
+    elif args[:1] == ['show']:
+        show(args[1] if len(args) > 1 else None)
+    else:
+        print("Usage: python3 bench_history.py run|check [--repeat N] [case ...] | compare | show [case]")
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Cross-supplier brand alias table: any supplier spelling -> canonical Strapi brand.
+
+Canonical brands come from the newest Strapi export available
+(exported_data/all-brands.json, else json_data/brands.json). Every one of
+them is registered under its raw name, cleaned name (clean_brand_name),
+slug and accent-folded key (upper case, accents and separators removed:
+"Citroën", "CITROEN", "citroen" -> CITROEN). MANUAL_ALIASES adds the
+spellings no normalization can guess (DS AUTOMOBILES -> DS); a manual
+target that is not a Strapi brand (AUSTIN-ROVER) is kept as the spelling
+of its aliases and reported as unresolved under "manual". Qualified
+names are never cut down automatically: Strapi keeps joint-venture brands
+such as "BMW (BRILLIANCE)" apart from BMW. The brand names of every
+supplier file are then resolved once and the result is saved to
+scripts/.cache/brand-aliases.json:
+    {"source", "brands": {id: {id, documentId, name, slug}},
+     "aliases": {alias: id}, "spellings": {alias: manual target not in Strapi},
+     "unresolved": {supplier: [names]}, "conflicts": [...]}
+
+Scripts call load_aliases() once and resolve names with dict lookups:
+    aliases = load_aliases()
+    aliases.canonical_name('CITROËN')   # 'CITROEN'
+    aliases.slug('Mercedes Benz')       # 'mercedes-benz'
+Unknown names keep their own spelling / slugify() slug and are collected in
+aliases.unresolved for the end-of-run report. The table is rebuilt when the
+canonical export or one of the supplier files changes.
+
+    python3 brand_aliases.py build
+    python3 brand_aliases.py resolve <name> [...]
+    python3 brand_aliases.py report          # unresolved supplier brands
+"""
+import json
+import os
+import re
+import sys
+import unicodedata
+
+from json_cache import load_json
+from names import clean_brand_name, slugify
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+aliases_file = os.path.join(script_dir, '.cache', 'brand-aliases.json')
+canonical_sources = [
+    os.path.join(script_dir, 'exported_data', 'all-brands.json'),
+    os.path.join(script_dir, 'json_data', 'brands.json'),
+]
+supplier_files = {
+    'exide': os.path.join(script_dir, 'json_data', 'exide-brands.json'),
+    'valeo': os.path.join(script_dir, 'wipers', 'wipers_database_janv2026.json'),
+    'fulmen': os.path.join(script_dir, 'json_data', 'fulmen-battery-products.json'),
+    'strapi': os.path.join(script_dir, 'json_data', 'brands.json'),
+}
+
+TABLE_VERSION = 3
+
+# Supplier spelling -> canonical brand name (the Valeo parser's former BRAND_NAME_MAP and Valeo long names)
+MANUAL_ALIASES = {
+    'CITROËN': 'CITROEN',
+    'DS AUTOMOBILES': 'DS',
+    'AUSTIN ROVER': 'AUSTIN-ROVER',
+    'DFSK (SERES)': 'DFSK',
+    'LDV (LEYLAND DAF)': 'LDV',
+}
+
+
+def brand_key(name):
+    """Accent-folded, separator-free upper-case key ("Mercedes-Benz" -> MERCEDESBENZ)"""
+    text = unicodedata.normalize('NFKD', name.replace('\ufeff', ''))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).upper().replace('&', ' AND ')
+    return re.sub(r'[^A-Z0-9]+', '', text)
+
+
+def _canonical_brands(path):
+    data = load_json(path)
+    entries = data.get('brands') or data.get('data') or []
+    brands = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not clean_brand_name(entry.get('name')):
+            continue  # header rows exported as brands ("Marque")
+        brands.append({"id": entry['id'], "documentId": entry.get('documentId'),
+                       "name": entry['name'].strip(), "slug": entry.get('slug') or slugify(entry['name'])})
+    return sorted(brands, key=lambda brand: brand['id'])
+
+
+def _supplier_names(supplier, path):
+    data = load_json(path)
+    if supplier == 'valeo':
+        return list(data.get('brands', {}))
+    if supplier == 'fulmen':
+        return sorted({product.get('brand') for product in data if product.get('brand')})
+    entries = data.get('data', [])
+    return [entry['name'] if isinstance(entry, dict) else entry for entry in entries]
+
+
+def supplier_mtimes():
+    """{supplier: mtime_ns of its brand file, None when absent}: the resolved names depend on them"""
+    return {supplier: os.stat(path).st_mtime_ns if os.path.exists(path) else None
+            for supplier, path in supplier_files.items()}
+
+
+def build_table():
+    source = next((path for path in canonical_sources if os.path.exists(path)), None)
+    if source is None:
+        sys.exit("No Strapi brand export found (exported_data/all-brands.json or json_data/brands.json)")
+    brands = _canonical_brands(source)
+    by_id = {brand['id']: brand for brand in brands}
+    aliases, conflicts = {}, []
+
+    def register(alias, brand_id, kind):
+        if not alias:
+            return
+        known = aliases.setdefault(alias, brand_id)
+        if known != brand_id:
+            conflicts.append({"alias": alias, "kind": kind, "kept": by_id[known]['name'],
+                              "dropped": by_id[brand_id]['name']})
+
+    # Exact spellings first so that they win over derived keys of other brands
+    for brand in brands:
+        register(brand['name'], brand['id'], 'raw')
+        register(clean_brand_name(brand['name']), brand['id'], 'cleaned')
+    for brand in brands:
+        register(brand['slug'], brand['id'], 'slug')
+        register(brand_key(brand['name']), brand['id'], 'folded')
+
+    table = {"version": TABLE_VERSION, "source": os.path.relpath(source, script_dir),
+             "sourceMtime": os.stat(source).st_mtime_ns, "supplierMtimes": supplier_mtimes(),
+             "brands": {str(brand['id']): brand for brand in brands},
+             "aliases": aliases, "spellings": {}, "unresolved": {}, "conflicts": conflicts}
+    resolver = BrandAliases(table)
+    missing = set()
+    for alias, target in MANUAL_ALIASES.items():
+        brand = resolver.resolve(target, record=False)
+        if brand:
+            register(alias, brand['id'], 'manual')
+            register(brand_key(alias), brand['id'], 'manual')
+        else:
+            # Not (yet) a Strapi brand: the aliases still get the manual spelling
+            table['spellings'][alias] = table['spellings'][brand_key(alias)] = target
+            missing.add(target)
+    table['unresolved']['manual'] = sorted(missing)
+
+    for supplier, path in supplier_files.items():
+        if not os.path.exists(path):
+            continue
+        unresolved = []
+        for name in _supplier_names(supplier, path):
+            if not isinstance(name, str) or not clean_brand_name(name):
+                continue
+            brand = resolver.resolve(name, record=False)
+            if brand is None:
+                unresolved.append(name)
+            elif name not in aliases:
+                aliases[name] = brand['id']  # raw supplier spelling: exact hit next time
+        table['unresolved'][supplier] = sorted(unresolved)
+
+    os.makedirs(os.path.dirname(aliases_file), exist_ok=True)
+    with open(aliases_file, 'w', encoding='utf-8') as f:
+        json.dump(table, f, indent=2, ensure_ascii=False)
+    return table
+
+
+class BrandAliases:
+    """O(1) brand resolution against the precomputed alias table"""
+
+    def __init__(self, table):
+        self.table = table
+        self.brands = {int(brand_id): brand for brand_id, brand in table['brands'].items()}
+        self.aliases = table['aliases']
+        self.spellings = table.get('spellings', {})
+        self.unresolved = {}
+
+    def resolve(self, name, record=True):
+        """Canonical brand {id, documentId, name, slug} for any spelling; None when unknown"""
+        if not isinstance(name, str):
+            return None
+        brand_id = self.aliases.get(name)
+        if brand_id is None:
+            stripped = name.replace('\ufeff', '').strip()
+            brand_id = self.aliases.get(stripped)
+            if brand_id is None:
+                brand_id = self.aliases.get(brand_key(stripped))
+        if brand_id is None:
+            if record and clean_brand_name(name):
+                self.unresolved[name] = self.unresolved.get(name, 0) + 1
+            return None
+        return self.brands[brand_id]
+
+    def spelling(self, name):
+        """Manual target of an alias whose brand is not in Strapi, else the name as written"""
+        if not isinstance(name, str):
+            return name
+        stripped = name.replace('\ufeff', '').strip()
+        for key in (name, stripped, brand_key(stripped)):
+            if key in self.spellings:
+                return self.spellings[key]
+        return name.strip()
+
+    def canonical_name(self, name, record=True):
+        brand = self.resolve(name, record)
+        return brand['name'] if brand else self.spelling(name)
+
+    def slug(self, name):
+        brand = self.resolve(name)
+        return brand['slug'] if brand else slugify(self.spelling(name))
+
+    def print_unresolved(self, limit=20):
+        if not self.unresolved:
+            return
+        names = sorted(self.unresolved, key=lambda n: -self.unresolved[n])
+        print(f"Unresolved brands ({len(names)}, kept as written): "
+              + ', '.join(f"{name} ({self.unresolved[name]})" for name in names[:limit])
+              + (' ...' if len(names) > limit else ''))
+
+
+_loaded = None
+
+
+def load_aliases(rebuild=False):
+    """Alias table of this process (built on first use, rebuilt when the canonical export or a supplier file changed)"""
+    global _loaded
+    if _loaded is not None and not rebuild:
+        return _loaded
+    table = None
+    if not rebuild and os.path.exists(aliases_file):
+        table = load_json(aliases_file, use_cache=False)
+        source = os.path.join(script_dir, table.get('source', ''))
+        current = next((path for path in canonical_sources if os.path.exists(path)), None)
+        if (table.get('version') != TABLE_VERSION or current != source
+                or os.stat(source).st_mtime_ns != table.get('sourceMtime')
+                or supplier_mtimes() != table.get('supplierMtimes')):
+            table = None
+    _loaded = BrandAliases(table or build_table())
+    return _loaded
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['build']:
+        table = load_aliases(rebuild=True).table
+        print(f"{len(table['brands'])} canonical brands from {table['source']}, {len(table['aliases'])} aliases, "
+              f"{len(table['conflicts'])} conflicts -> {aliases_file}")
+        for supplier, names in table['unresolved'].items():
+            print(f"  {supplier}: {len(names)} unresolved")
+    elif args[:1] == ['resolve'] and len(args) > 1:
+        aliases = load_aliases()
+        for name in args[1:]:
+            brand = aliases.resolve(name)
+            print(f"{name!r} -> " + (f"{brand['name']} (id {brand['id']}, {brand['slug']})" if brand else 'unresolved'))
+    elif args[:1] == ['report']:
+        table = load_aliases().table
+        for supplier, names in table['unresolved'].items():
+            print(f"{supplier}: {len(names)} unresolved brands")
+            for name in names:
+                print(f"  {name}")
+        for conflict in table['conflicts']:
+            print(f"conflict: {conflict['alias']!r} ({conflict['kind']}) kept {conflict['kept']}, "
+                  f"not {conflict['dropped']}")
+    else:
+        print("Usage: python3 brand_aliases.py build | resolve <name> [...] | report")
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Brand/model reconciliation engine shared by merge_brands.py,
+find_missing_brands.py and find_missing_models.py.
+
+Every source (Strapi, Exide, Valeo, Fulmen...) is loaded and normalized
+once. Each brand and each (brand, model) key then gets a membership
+bitmask in a single pass, so union, intersections and per-source
+differences are all read off the same index instead of being recomputed
+by every script.
+"""
+import json
+import os
+
+from battery_encoding import load_battery_products
+from brand_aliases import load_aliases
+from json_cache import load_json
+from names import clean_brand_name, clean_model_name, slugify
+from run_metrics import RunMetrics
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+json_data_dir = os.path.join(script_dir, 'json_data')
+strapi_brands_file = os.path.join(json_data_dir, 'brands.json')
+strapi_models_file = os.path.join(json_data_dir, 'models.json')
+exide_brands_file = os.path.join(json_data_dir, 'exide-brands.json')
+exide_vehicles_file = os.path.join(script_dir, 'liste_affectation', 'exide-vehicles-by-brand.json')
+valeo_wipers_file = os.path.join(script_dir, 'wipers', 'wipers_database_janv2026.json')
+fulmen_products_file = os.path.join(json_data_dir, 'fulmen-battery-products.json')
+
+all_brands_unique_file = os.path.join(json_data_dir, 'all-brands-unique.json')
+missing_brands_file = os.path.join(json_data_dir, 'missing-brands.json')
+missing_models_file = os.path.join(json_data_dir, 'missing-models-by-brand.json')
+reconciliation_file = os.path.join(json_data_dir, 'brand-reconciliation.json')
+
+
+class Source:
+    """Normalized view of one supplier: cleaned brand names and models per brand"""
+
+    def __init__(self, name, brands=None, models_by_brand=None, raw_models_by_brand=None):
+        self.name = name
+        self.brands = set(brands or ())
+        # brand -> set of cleaned model names
+        self.models_by_brand = models_by_brand or {}
+        # brand (as written in the source file) -> model names in file order
+        self.raw_models_by_brand = raw_models_by_brand or {}
+        # Flat model name / slug sets, for sources whose models are not linked to a brand
+        self.model_names = set()
+        self.model_slugs = set()
+
+    def add_model(self, brand, model):
+        cleaned = clean_model_name(model)
+        if cleaned:
+            self.models_by_brand.setdefault(brand, set()).add(cleaned)
+
+
+def load_strapi_source():
+    """Brands from json_data/brands.json; models from json_data/models.json (not linked to brands)"""
+    source = Source('strapi')
+    if os.path.exists(strapi_brands_file):
+        print("Reading brands.json (Strapi database)...")
+        brands_data = load_json(strapi_brands_file)
+        if isinstance(brands_data.get('data'), list):
+            for brand in brands_data['data']:
+                if isinstance(brand, dict) and 'name' in brand:
+                    cleaned = clean_brand_name(brand['name'])
+                elif isinstance(brand, str):
+                    cleaned = clean_brand_name(brand)
+                else:
+                    cleaned = None
+                if cleaned:
+                    source.brands.add(cleaned)
+
+    # Strapi models are exported without their brand: only the flat sets are filled
+    if os.path.exists(strapi_models_file):
+        print("Reading models.json (Strapi database)...")
+        strapi_data = load_json(strapi_models_file)
+        if isinstance(strapi_data.get('data'), list):
+            for model in strapi_data['data']:
+                if not isinstance(model, dict):
+                    continue
+                if 'name' in model:
+                    cleaned = clean_model_name(model['name'])
+                    if cleaned:
+                        source.model_names.add(cleaned)
+                if model.get('slug'):
+                    source.model_slugs.add(model['slug'].lower())
+    return source
+
+
+def load_exide_source():
+    """Brands from json_data/exide-brands.json; models from exide-vehicles-by-brand.json"""
+    source = Source('exide')
+    if os.path.exists(exide_brands_file):
+        print("Reading exide-brands.json (Exide data)...")
+        exide_brands_data = load_json(exide_brands_file)
+        if isinstance(exide_brands_data.get('data'), list):
+            for brand in exide_brands_data['data']:
+                if isinstance(brand, str):
+                    cleaned = clean_brand_name(brand)
+                    if cleaned:
+                        source.brands.add(cleaned)
+
+    if os.path.exists(exide_vehicles_file):
+        print("Reading exide-vehicles-by-brand.json (Exide data)...")
+        exide_data = load_json(exide_vehicles_file)
+        for brand_name, models in exide_data.items():
+            if not isinstance(models, list):
+                continue
+            source.raw_models_by_brand[brand_name] = models
+            cleaned_brand = clean_brand_name(brand_name)
+            if cleaned_brand:
+                for model in models:
+                    source.add_model(cleaned_brand, model)
+    return source
+
+
+def load_valeo_source():
+    """Brands and models from the Valeo wipers database"""
+    source = Source('valeo')
+    if not os.path.exists(valeo_wipers_file):
+        return source
+    print("Reading wipers_database_janv2026.json (Valeo data)...")
+    valeo_data = load_json(valeo_wipers_file)
+    for brand_name, entries in valeo_data.get('brands', {}).items():
+        cleaned_brand = clean_brand_name(brand_name)
+        if not cleaned_brand:
+            continue
+        source.brands.add(cleaned_brand)
+        for entry in entries:
+            source.add_model(cleaned_brand, entry.get('model'))
+    return source
+
+
+def load_battery_products_source(name, path):
+    """Brands and models from a battery-products file (Exide transform / Fulmen ingestion shape)"""
+    source = Source(name)
+    if not os.path.exists(path):
+        return source
+    print(f"Reading {os.path.basename(path)} ({name} data)...")
+    for product in load_battery_products(path):
+        cleaned_brand = clean_brand_name(product.get('brand'))
+        if not cleaned_brand:
+            continue
+        source.brands.add(cleaned_brand)
+        source.add_model(cleaned_brand, product.get('model'))
+    return source
+
+
+def load_sources():
+    """Load every known source once, in a fixed order (the order defines the bitmask bits)"""
+    return [
+        load_strapi_source(),
+        load_exide_source(),
+        load_valeo_source(),
+        load_battery_products_source('fulmen', fulmen_products_file),
+    ]
+
+
+class Reconciliation:
+    """Membership bitmasks for brands and (brand, model slug) keys across all sources"""
+
+    def __init__(self, sources):
+        self.sources = sources
+        self.bits = {source.name: 1 << i for i, source in enumerate(sources)}
+        self.by_name = {source.name: source for source in sources}
+        self.brand_masks = {}
+        self.model_masks = {}
+        self.model_labels = {}
+
+        # Supplier spellings of one Strapi brand share a key
+        canonical = load_aliases().canonical_name
+
+        # Single pass over every source
+        for source in sources:
+            bit = self.bits[source.name]
+            for brand in source.brands:
+                brand = canonical(brand)
+                self.brand_masks[brand] = self.brand_masks.get(brand, 0) | bit
+            for brand, models in source.models_by_brand.items():
+                brand = canonical(brand)
+                for model in models:
+                    key = (brand, slugify(model))
+                    self.model_masks[key] = self.model_masks.get(key, 0) | bit
+                    self.model_labels.setdefault(key, model)
+
+    def mask(self, *names):
+        mask = 0
+        for name in names:
+            mask |= self.bits[name]
+        return mask
+
+    def brands_where(self, within, equals):
+        """Brands whose membership restricted to `within` sources is exactly `equals`"""
+        return {brand for brand, m in self.brand_masks.items() if m & within == equals}
+
+    def brands_in_any(self, within):
+        return {brand for brand, m in self.brand_masks.items() if m & within}
+
+    def summary(self):
+        """Union, global intersection and per-source differences for brands and models"""
+        report = {"sources": {}, "brands": {}, "models": {}}
+
+        for kind, masks in (("brands", self.brand_masks), ("models", self.model_masks)):
+            # Only sources that actually provide this kind of key take part
+            present = 0
+            for m in masks.values():
+                present |= m
+            label = (lambda k: k) if kind == "brands" else (lambda k: f"{k[0]} | {self.model_labels[k]}")
+            section = report[kind]
+            section["union"] = len(masks)
+            section["common_to_all"] = sorted(label(k) for k, m in masks.items() if m == present)
+            section["only_in"] = {}
+            section["missing_from"] = {}
+            for name, bit in self.bits.items():
+                if not present & bit:
+                    continue
+                section["only_in"][name] = sorted(label(k) for k, m in masks.items() if m == bit)
+                section["missing_from"][name] = sorted(label(k) for k, m in masks.items() if not m & bit)
+            section["pairwise_common"] = {}
+            names = [n for n, b in self.bits.items() if present & b]
+            for i, a in enumerate(names):
+                for b in names[i + 1:]:
+                    pair = self.bits[a] | self.bits[b]
+                    section["pairwise_common"][f"{a}+{b}"] = sum(1 for m in masks.values() if m & pair == pair)
+
+        for source in self.sources:
+            report["sources"][source.name] = {
+                "brands": len(source.brands),
+                "models": sum(len(v) for v in source.models_by_brand.values()),
+            }
+        return report
+
+
+def reconcile(sources=None):
+    return Reconciliation(sources if sources is not None else load_sources())
+
+
+def all_brands_unique_report(rec):
+    """Output of merge_brands.py: Strapi ∪ Exide brands (canonical names, counts included)"""
+    api, exide = rec.bits['strapi'], rec.bits['exide']
+    both = api | exide
+    all_unique_brands_list = sorted(rec.brands_in_any(both))
+    common = rec.brands_where(both, both)
+    only_in_api = rec.brands_where(both, api)
+    only_in_exide = rec.brands_where(both, exide)
+    return {
+        "data": all_unique_brands_list,
+        "meta": {
+            "total": len(all_unique_brands_list),
+            "from_api": len(rec.brands_in_any(api)),
+            "from_exide": len(rec.brands_in_any(exide)),
+            "common": len(common),
+            "only_in_api": len(only_in_api),
+            "only_in_exide": len(only_in_exide)
+        }
+    }
+
+
+def missing_brands_report(rec):
+    """Output of find_missing_brands.py: Exide brands that Strapi does not have"""
+    api, exide = rec.bits['strapi'], rec.bits['exide']
+    missing_brands_list = sorted(rec.brands_where(api | exide, exide))
+    return {
+        "data": missing_brands_list,
+        "meta": {
+            "total": len(missing_brands_list),
+            "total_in_strapi": len(rec.brands_in_any(api)),
+            "total_in_exide": len(rec.brands_in_any(exide)),
+            "description": "Brands that exist in Exide data but are missing from Strapi database"
+        }
+    }
+
+
+def missing_models_report(rec):
+    """Output of find_missing_models.py: Exide models unknown to Strapi (by name or slug), per brand"""
+    strapi = rec.by_name['strapi']
+    missing_models_by_brand = {}
+    for brand_name, exide_models in rec.by_name['exide'].raw_models_by_brand.items():
+        missing_models = []
+        for model_name in exide_models:
+            cleaned_name = clean_model_name(model_name)
+            if not cleaned_name:
+                continue
+            if cleaned_name in strapi.model_names or slugify(cleaned_name) in strapi.model_slugs:
+                continue
+            missing_models.append(cleaned_name)
+        if missing_models:
+            missing_models_by_brand[brand_name] = missing_models
+    return missing_models_by_brand
+
+
+REPORTS = {
+    'all-brands-unique': (all_brands_unique_file, all_brands_unique_report),
+    'missing-brands': (missing_brands_file, missing_brands_report),
+    'missing-models-by-brand': (missing_models_file, missing_models_report),
+    'brand-reconciliation': (reconciliation_file, lambda rec: rec.summary()),
+}
+
+
+def write_report(rec, name):
+    """Build one report from the shared reconciliation and save it; returns the report"""
+    path, build = REPORTS[name]
+    report = build(rec)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    print(f"Saving {name} to {path}...")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+def main():
+    with RunMetrics('brand-reconciliation') as metrics:
+        metrics.stage('load')
+        sources = load_sources()
+        metrics.stage('reconcile')
+        rec = reconcile(sources)
+        for source in rec.sources:
+            print(f"  {source.name}: {len(source.brands)} brands, "
+                  f"{sum(len(v) for v in source.models_by_brand.values())} models")
+
+        metrics.stage('write')
+        reports = {name: write_report(rec, name) for name in REPORTS}
+        metrics.stage(None)
+
+        summary = reports['brand-reconciliation']
+        missing_models = sum(len(m) for m in reports['missing-models-by-brand'].values())
+        metrics.count('rows_in', sum(len(source.brands) for source in rec.sources))
+        metrics.count('brands', summary['brands']['union'])
+        metrics.count('models', summary['models']['union'])
+        metrics.count('missing_brands', reports['missing-brands']['meta']['total'])
+        metrics.count('missing_models', missing_models)
+        print(f"\nBrands (union): {summary['brands']['union']}")
+        print(f"Brands common to all sources: {len(summary['brands']['common_to_all'])}")
+        for name, brands in summary['brands']['only_in'].items():
+            print(f"  only in {name}: {len(brands)}")
+        print(f"Models (union): {summary['models']['union']}")
+        for name, models in summary['models']['only_in'].items():
+            print(f"  only in {name}: {len(models)}")
+        print(f"\nMissing brands from Strapi: {reports['missing-brands']['meta']['total']}")
+        print(f"Missing models from Strapi: {missing_models}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Offset-indexed reader for the per-brand export shards (exported_data/brands/).
+
+The index (scripts/.cache/exported-data-index.json) maps every brand slug to
+its shard and the byte span of its brandInfo object, and every model slug of
+that brand to the byte span of the model object inside the shard. A single
+model or brand header is then one seek + read + json.loads of a few hundred
+bytes instead of parsing all-brands.json or guessing file names.
+
+The index records each shard's size and mtime and is rebuilt on first use
+when a shard was added, removed or rewritten (export-all-brands-models*.js).
+
+    from catalog_index import CatalogReader
+    catalog = CatalogReader()
+    catalog.model('peugeot', '208')          # one model object
+    catalog.brand_info('peugeot')            # brandInfo only
+    for brand in catalog.iter_brands():      # one shard parsed at a time
+        ...
+
+    python3 catalog_index.py build
+    python3 catalog_index.py brand <brand-slug>
+    python3 catalog_index.py model <brand-slug> <model-slug>
+    python3 catalog_index.py --bench
+"""
+import glob
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+exported_data_dir = os.path.join(script_dir, 'exported_data')
+index_file = os.path.join(script_dir, '.cache', 'exported-data-index.json')
+
+INDEX_VERSION = 1
+
+_WS = re.compile(r'[ \t\n\r]*')
+
+
+def _skip(text, pos, expected=None):
+    pos = _WS.match(text, pos).end()
+    if expected is not None:
+        if text[pos:pos + 1] != expected:
+            raise ValueError(f"expected {expected!r} at character {pos}")
+        pos = _WS.match(text, pos + 1).end()
+    return pos
+
+
+def shard_spans(raw):
+    """(brandInfo span, [(model slug, span)]) of a shard; spans are (byte offset, byte length)"""
+    text = raw.decode('utf-8')
+    decoder = json.JSONDecoder()
+    ascii_only = len(text) == len(raw)
+    last = [0, 0]  # last (character, byte) position, to convert offsets incrementally
+
+    def byte_offset(char_pos):
+        if ascii_only:
+            return char_pos
+        last[1] += len(text[last[0]:char_pos].encode('utf-8'))
+        last[0] = char_pos
+        return last[1]
+
+    def span(start, end):
+        offset = byte_offset(start)
+        return offset, byte_offset(end) - offset
+
+    info_span, models = None, []
+    pos = _skip(text, 0, '{')
+    while text[pos:pos + 1] != '}':
+        key, pos = decoder.raw_decode(text, pos)
+        pos = _skip(text, pos, ':')
+        if key == 'models':
+            pos = _skip(text, pos, '[')
+            while text[pos:pos + 1] != ']':
+                model, end = decoder.raw_decode(text, pos)
+                models.append((model.get('slug') or '', span(pos, end)))
+                pos = _skip(text, end)
+                if text[pos:pos + 1] == ',':
+                    pos = _skip(text, pos + 1)
+            pos = _skip(text, pos + 1)
+        else:
+            _, end = decoder.raw_decode(text, pos)
+            if key == 'brandInfo':
+                info_span = span(pos, end)
+            pos = _skip(text, end)
+        if text[pos:pos + 1] == ',':
+            pos = _skip(text, pos + 1)
+    return info_span, models
+
+
+def build_index(directory=exported_data_dir, path=index_file):
+    """Scan every shard once and write the index atomically"""
+    brands = {}
+    for shard in sorted(glob.glob(os.path.join(directory, 'brands', '*.json'))):
+        with open(shard, 'rb') as f:
+            raw = f.read()
+        info_span, models = shard_spans(raw)
+        info = json.loads(raw[info_span[0]:info_span[0] + info_span[1]]) if info_span else {}
+        stem = os.path.splitext(os.path.basename(shard))[0]
+        slug = info.get('slug') or stem
+        if slug in brands:  # two shards claiming the same slug: fall back to the file name
+            slug = stem
+        spans = {}
+        for model_slug, model_span in models:
+            spans.setdefault(model_slug, []).append(list(model_span))
+        stat = os.stat(shard)
+        brands[slug] = {
+            "file": os.path.relpath(shard, directory),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "name": info.get('name'),
+            "brandInfo": list(info_span) if info_span else None,
+            "modelCount": len(models),
+            "models": spans,
+        }
+    index = {"version": INDEX_VERSION, "directory": os.path.abspath(directory), "brands": brands}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(index, f, separators=(',', ':'), ensure_ascii=False)
+    os.replace(tmp, path)
+    return index
+
+
+def _is_current(index, directory):
+    if index.get('version') != INDEX_VERSION or index.get('directory') != os.path.abspath(directory):
+        return False
+    shards = glob.glob(os.path.join(directory, 'brands', '*.json'))
+    if len(shards) != len(index['brands']):
+        return False
+    for entry in index['brands'].values():
+        try:
+            stat = os.stat(os.path.join(directory, entry['file']))
+        except OSError:
+            return False
+        if stat.st_size != entry['size'] or stat.st_mtime_ns != entry['mtime']:
+            return False
+    return True
+
+
+class CatalogReader:
+    """Brand / model access to exported_data through the offset index"""
+
+    def __init__(self, directory=exported_data_dir, path=index_file):
+        self.directory = directory
+        index = None
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                index = json.load(f)
+        if index is None or not _is_current(index, directory):
+            index = build_index(directory, path)
+        self.brands = index['brands']
+        self._model_brands = None
+
+    def _read(self, brand_slug, span):
+        with open(os.path.join(self.directory, self.brands[brand_slug]['file']), 'rb') as f:
+            f.seek(span[0])
+            return json.loads(f.read(span[1]))
+
+    def brand_slugs(self):
+        return list(self.brands)
+
+    def brand_info(self, brand_slug):
+        """brandInfo of a brand (None for an unknown slug)"""
+        entry = self.brands.get(brand_slug)
+        if entry is None or not entry['brandInfo']:
+            return None
+        return self._read(brand_slug, entry['brandInfo'])
+
+    def model_slugs(self, brand_slug):
+        entry = self.brands.get(brand_slug)
+        return list(entry['models']) if entry else []
+
+    def model(self, brand_slug, model_slug):
+        """First model with this slug in the brand's shard (None when absent)"""
+        spans = self.brands.get(brand_slug, {}).get('models', {}).get(model_slug)
+        return self._read(brand_slug, spans[0]) if spans else None
+
+    def models(self, brand_slug, model_slug):
+        """All models with this slug in the brand's shard (duplicates included)"""
+        spans = self.brands.get(brand_slug, {}).get('models', {}).get(model_slug, [])
+        return [self._read(brand_slug, span) for span in spans]
+
+    def find_model(self, model_slug):
+        """(brand slug, model) for every brand that has a model with this slug"""
+        if self._model_brands is None:
+            self._model_brands = {}
+            for brand_slug, entry in self.brands.items():
+                for slug in entry['models']:
+                    self._model_brands.setdefault(slug, []).append(brand_slug)
+        return [(brand_slug, self.model(brand_slug, model_slug))
+                for brand_slug in self._model_brands.get(model_slug, [])]
+
+    def brand(self, brand_slug):
+        """Whole shard of one brand ({brandInfo, modelCount, models, ...})"""
+        if brand_slug not in self.brands:
+            return None
+        with open(os.path.join(self.directory, self.brands[brand_slug]['file']), 'rb') as f:
+            return json.loads(f.read())
+
+    def iter_brands(self):
+        """Shards one at a time, in slug order; only one is held in memory"""
+        for brand_slug in sorted(self.brands):
+            yield self.brand(brand_slug)
+
+
+def bench(lookups=2000, seed=1):
+    build_start = time.perf_counter()
+    build_index()
+    built = time.perf_counter() - build_start
+    start = time.perf_counter()
+    catalog = CatalogReader()
+    opened = time.perf_counter() - start
+    pairs = [(brand_slug, model_slug) for brand_slug in catalog.brands for model_slug in catalog.model_slugs(brand_slug)]
+    sample = random.Random(seed).sample(pairs, min(lookups, len(pairs)))
+    print(f"Index: {len(catalog.brands)} brands, {len(pairs)} model slugs "
+          f"(built in {built * 1000:.0f} ms, opened in {opened * 1000:.1f} ms, "
+          f"{os.path.getsize(index_file) / 1024:.0f} KB)")
+
+    start = time.perf_counter()
+    for brand_slug, model_slug in sample:
+        catalog.model(brand_slug, model_slug)
+    indexed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for brand_slug, model_slug in sample:
+        with open(os.path.join(exported_data_dir, catalog.brands[brand_slug]['file']), encoding='utf-8') as f:
+            next(m for m in json.load(f)['models'] if m.get('slug') == model_slug)
+    full = time.perf_counter() - start
+    print(f"{len(sample)} model lookups: {indexed / len(sample) * 1e6:.0f} µs indexed, "
+          f"{full / len(sample) * 1e6:.0f} µs parsing the shard ({full / indexed:.1f}x)")
+
+    start = time.perf_counter()
+    count = sum(len(brand['models']) for brand in catalog.iter_brands())
+    print(f"iter_brands: {count} models from {len(catalog.brands)} shards in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['build']:
+        index = build_index()
+        print(f"Indexed {len(index['brands'])} brands, "
+              f"{sum(b['modelCount'] for b in index['brands'].values())} models -> {index_file}")
+    elif args[:1] == ['brand'] and len(args) == 2:
+        catalog = CatalogReader()
+        print(json.dumps(catalog.brand_info(args[1]), indent=2, ensure_ascii=False))
+        print(f"{len(catalog.model_slugs(args[1]))} model slugs")
+    elif args[:1] == ['model'] and len(args) == 3:
+        print(json.dumps(CatalogReader().models(args[1], args[2]), indent=2, ensure_ascii=False))
+    elif args[:1] == ['--bench']:
+        bench()
+    else:
+        print("Usage: python3 catalog_index.py build | brand <brand-slug> | model <brand-slug> <model-slug> | --bench")
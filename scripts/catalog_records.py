@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Compact record types for in-memory catalog processing.
+
+Exide motorisations and Valeo wiper entries used to be nested dicts (one
+motorisation = 1 dict + 5 battery dicts). These __slots__ classes hold the
+same fields with interned strings and serialize back to exactly the same
+JSON through to_json() (same keys, same order).
+
+Use json_default as the `default=` hook of json.dump so lists of records
+can be dumped directly.
+
+Memory benchmark (10x dataset, dicts vs records):
+    python3 catalog_records.py --bench
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from sys import intern
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+wipers_database_file = os.path.join(script_dir, 'wipers', 'wipers_database_janv2026.json')
+
+
+def _s(value):
+    """Intern strings (refs, fuels, dates repeat a lot); leave None/other values untouched"""
+    return intern(value) if isinstance(value, str) else value
+
+
+class BatteryOptions:
+    __slots__ = ('option1', 'option2', 'option3')
+
+    def __init__(self, option1="", option2="", option3=""):
+        self.option1 = _s(option1)
+        self.option2 = _s(option2)
+        self.option3 = _s(option3)
+
+    @classmethod
+    def from_source(cls, battery_obj):
+        """Same rules as extract_battery_options: missing or falsy options become ''"""
+        if not battery_obj or not isinstance(battery_obj, dict):
+            return EMPTY_BATTERY
+        option1 = battery_obj.get("option1", "") or ""
+        option2 = battery_obj.get("option2", "") or ""
+        option3 = battery_obj.get("option3", "") or ""
+        if not (option1 or option2 or option3):
+            return EMPTY_BATTERY
+        return cls(option1, option2, option3)
+
+    def key(self):
+        return (self.option1, self.option2, self.option3)
+
+    def to_json(self):
+        return {"option1": self.option1, "option2": self.option2, "option3": self.option3}
+
+
+# Immutable in practice: shared by every motorisation without that battery type
+EMPTY_BATTERY = BatteryOptions()
+
+
+class Motorisation:
+    __slots__ = ('motorisation', 'fuel', 'startDate', 'endDate',
+                 'batteryAGM', 'batteryEFB', 'batteryPremium', 'batteryExcell', 'batteryClassic')
+
+    BATTERY_FIELDS = ('batteryAGM', 'batteryEFB', 'batteryPremium', 'batteryExcell', 'batteryClassic')
+
+    def __init__(self, motorisation, fuel, startDate, endDate,
+                 batteryAGM=EMPTY_BATTERY, batteryEFB=EMPTY_BATTERY, batteryPremium=EMPTY_BATTERY,
+                 batteryExcell=EMPTY_BATTERY, batteryClassic=EMPTY_BATTERY):
+        self.motorisation = _s(motorisation)
+        self.fuel = _s(fuel)
+        self.startDate = _s(startDate)
+        self.endDate = _s(endDate)
+        self.batteryAGM = batteryAGM
+        self.batteryEFB = batteryEFB
+        self.batteryPremium = batteryPremium
+        self.batteryExcell = batteryExcell
+        self.batteryClassic = batteryClassic
+
+    def with_name(self, name):
+        """Copy with another motorisation name (battery blocks are shared, they are never mutated)"""
+        return Motorisation(name, self.fuel, self.startDate, self.endDate,
+                            self.batteryAGM, self.batteryEFB, self.batteryPremium,
+                            self.batteryExcell, self.batteryClassic)
+
+    def key(self):
+        """Everything motorisations_are_equal compares, as a hashable tuple"""
+        return (self.motorisation, self.startDate, self.endDate, self.fuel,
+                self.batteryAGM.key(), self.batteryEFB.key(), self.batteryPremium.key(),
+                self.batteryExcell.key(), self.batteryClassic.key())
+
+    def to_json(self):
+        return {
+            "motorisation": self.motorisation,
+            "fuel": self.fuel,
+            "startDate": self.startDate,
+            "endDate": self.endDate,
+            "batteryAGM": self.batteryAGM.to_json(),
+            "batteryEFB": self.batteryEFB.to_json(),
+            "batteryPremium": self.batteryPremium.to_json(),
+            "batteryExcell": self.batteryExcell.to_json(),
+            "batteryClassic": self.batteryClassic.to_json()
+        }
+
+
+def dedupe_motorisations(motorisations):
+    """Drop motorisations identical to an earlier one (same name, dates, fuel and battery options)"""
+    unique = []
+    seen = set()
+    for motorisation in motorisations:
+        key = motorisation.key()
+        if key not in seen:
+            seen.add(key)
+            unique.append(motorisation)
+    return unique
+
+
+class WiperEntry:
+    """One Valeo PerfectVision row (wipers_database_janv2026.json entry)"""
+
+    __slots__ = ('id', 'model', 'picto1', 'picto2', 'direction', 'start', 'end',
+                 'multi_kit_avant', 'multi_cote_conducteur', 'multi_mono_balais', 'multi_cote_passager',
+                 'std_cote_conducteur', 'std_mono_balais', 'std_cote_passager', 'arriere')
+
+    def __init__(self, id, model, picto1, picto2, direction, start, end,
+                 multi_kit_avant, multi_cote_conducteur, multi_mono_balais, multi_cote_passager,
+                 std_cote_conducteur, std_mono_balais, std_cote_passager, arriere):
+        self.id = id
+        self.model = _s(model)
+        self.picto1 = _s(picto1)
+        self.picto2 = _s(picto2)
+        self.direction = _s(direction)
+        self.start = _s(start)
+        self.end = _s(end)
+        self.multi_kit_avant = _s(multi_kit_avant)
+        self.multi_cote_conducteur = _s(multi_cote_conducteur)
+        self.multi_mono_balais = _s(multi_mono_balais)
+        self.multi_cote_passager = _s(multi_cote_passager)
+        self.std_cote_conducteur = _s(std_cote_conducteur)
+        self.std_mono_balais = _s(std_mono_balais)
+        self.std_cote_passager = _s(std_cote_passager)
+        self.arriere = _s(arriere)
+
+    @classmethod
+    def from_json(cls, entry):
+        years = entry.get("productionYears") or {}
+        wipers = entry.get("wipers") or {}
+        multi = wipers.get("multiconnexion") or {}
+        std = wipers.get("standard") or {}
+        return cls(entry.get("id"), entry.get("model"), entry.get("picto1"), entry.get("picto2"),
+                   entry.get("direction"), years.get("start"), years.get("end"),
+                   multi.get("kitAvant"), multi.get("coteConducteur"), multi.get("monoBalais"),
+                   multi.get("cotePassager"), std.get("coteConducteur"), std.get("monoBalais"),
+                   std.get("cotePassager"), wipers.get("arriere"))
+
+    def multiconnexion(self):
+        return (self.multi_kit_avant, self.multi_cote_conducteur, self.multi_mono_balais, self.multi_cote_passager)
+
+    def standard(self):
+        return (self.std_cote_conducteur, self.std_mono_balais, self.std_cote_passager)
+
+    def has_wipers(self):
+        return any(self.multiconnexion()) or any(self.standard()) or bool(self.arriere)
+
+    def wipers_json(self):
+        return {
+            "multiconnexion": {
+                "kitAvant":       self.multi_kit_avant,
+                "coteConducteur": self.multi_cote_conducteur,
+                "monoBalais":     self.multi_mono_balais,
+                "cotePassager":   self.multi_cote_passager,
+            },
+            "standard": {
+                "coteConducteur": self.std_cote_conducteur,
+                "monoBalais":     self.std_mono_balais,
+                "cotePassager":   self.std_cote_passager,
+            },
+            "arriere": self.arriere,
+        }
+
+    def to_json(self):
+        return {
+            "id":        self.id,
+            "model":     self.model,
+            "picto1":    self.picto1,
+            "picto2":    self.picto2,
+            "direction": self.direction,
+            "productionYears": {"start": self.start, "end": self.end},
+            "wipers": self.wipers_json(),
+        }
+
+
+def json_default(obj):
+    """`default=` hook for json.dump: serializes records like the former dicts"""
+    if hasattr(obj, 'to_json'):
+        return obj.to_json()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# --- Benchmark -----------------------------------------------------------------
+
+def _synthetic_exide_vehicles(count):
+    """Exide-like motorisation dicts with a realistic amount of ref repetition"""
+    fuels = ['Diesel', 'Petrol', 'Hybrid', 'Electric']
+    refs = [f"E{letter}{n:03d}" for letter in 'ABCKLN' for n in range(0, 1000, 25)]
+    for i in range(count):
+        yield {
+            "type": f"{1.0 + (i % 30) / 10:.1f} TDI {60 + i % 150}kW",
+            "fuelType": fuels[i % len(fuels)],
+            "startDate": f"{1990 + i % 35}-{1 + i % 12:02d}-01",
+            "endDate": "" if i % 3 else f"{1995 + i % 30}-{1 + i % 12:02d}-01",
+            "batteries": {
+                kind: {"option1": refs[(i + k) % len(refs)],
+                       "option2": refs[(i * 7 + k) % len(refs)] if i % 2 else "",
+                       "option3": ""}
+                for k, kind in enumerate(['agm', 'efb', 'premium', 'excell', 'classic'])
+                if (i + k) % 4
+            },
+        }
+
+
+def _motorisation_dict(vehicle):
+    batteries = vehicle["batteries"]
+    block = lambda b: {"option1": (b or {}).get("option1", "") or "",
+                       "option2": (b or {}).get("option2", "") or "",
+                       "option3": (b or {}).get("option3", "") or ""}
+    # json round trip gives each string its own object, like a parsed input file
+    return json.loads(json.dumps({
+        "motorisation": vehicle["type"], "fuel": vehicle["fuelType"],
+        "startDate": vehicle["startDate"], "endDate": vehicle["endDate"],
+        "batteryAGM": block(batteries.get("agm")), "batteryEFB": block(batteries.get("efb")),
+        "batteryPremium": block(batteries.get("premium")), "batteryExcell": block(batteries.get("excell")),
+        "batteryClassic": block(batteries.get("classic")),
+    }))
+
+
+def _motorisation_record(vehicle):
+    batteries = json.loads(json.dumps(vehicle["batteries"]))
+    return Motorisation(vehicle["type"], vehicle["fuelType"], vehicle["startDate"], vehicle["endDate"],
+                        BatteryOptions.from_source(batteries.get("agm")),
+                        BatteryOptions.from_source(batteries.get("efb")),
+                        BatteryOptions.from_source(batteries.get("premium")),
+                        BatteryOptions.from_source(batteries.get("excell")),
+                        BatteryOptions.from_source(batteries.get("classic")))
+
+
+def _wiper_rows(scale):
+    """Valeo CSV-like rows (lists of strings, one per entry) rebuilt from the current database"""
+    with open(wipers_database_file, 'r', encoding='utf-8') as f:
+        database = json.load(f)
+    for copy in range(scale):
+        for brand, entries in database["brands"].items():
+            for e in entries:
+                w, y = e["wipers"], e["productionYears"]
+                m, st = w["multiconnexion"], w["standard"]
+                # Fresh string objects for every row, as csv.reader produces
+                yield [f"{e['id']}-{copy}", "".join(brand), "".join(e["model"]), "".join(e["picto1"]),
+                       "".join(e["picto2"]), "".join(e["direction"]), "".join(y["start"] or ""), "".join(y["end"] or ""),
+                       "".join(m["kitAvant"] or ""), "".join(m["coteConducteur"] or ""),
+                       "".join(m["monoBalais"] or ""), "".join(m["cotePassager"] or ""),
+                       "".join(st["coteConducteur"] or ""), "".join(st["monoBalais"] or ""),
+                       "".join(st["cotePassager"] or ""), "".join(w["arriere"] or "")]
+
+
+def _wiper_dict(row):
+    v = lambda s: s or None
+    return {
+        "id": row[0], "model": row[2], "picto1": row[3], "picto2": row[4], "direction": row[5],
+        "productionYears": {"start": v(row[6]), "end": v(row[7])},
+        "wipers": {
+            "multiconnexion": {"kitAvant": v(row[8]), "coteConducteur": v(row[9]),
+                               "monoBalais": v(row[10]), "cotePassager": v(row[11])},
+            "standard": {"coteConducteur": v(row[12]), "monoBalais": v(row[13]), "cotePassager": v(row[14])},
+            "arriere": v(row[15]),
+        },
+    }
+
+
+def _wiper_record(row):
+    v = lambda s: s or None
+    return WiperEntry(row[0], row[2], row[3], row[4], row[5], v(row[6]), v(row[7]),
+                      v(row[8]), v(row[9]), v(row[10]), v(row[11]), v(row[12]), v(row[13]), v(row[14]),
+                      v(row[15]))
+
+
+def _build(kind, mode, scale):
+    if kind == 'exide':
+        count = 30000 * scale // 10
+        build = _motorisation_record if mode == 'records' else _motorisation_dict
+        return [build(v) for v in _synthetic_exide_vehicles(count)]
+    build = _wiper_record if mode == 'records' else _wiper_dict
+    return [build(row) for row in _wiper_rows(scale)]
+
+
+def _measure(kind, mode, scale):
+    """Retained bytes per record (tracemalloc) for one dataset/representation"""
+    tracemalloc.start()
+    records = _build(kind, mode, scale)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(records), current / len(records)
+
+
+def peak_rss_mb():
+    """Peak RSS of this process in MB (VmHWM: unlike ru_maxrss it is not inherited across fork/exec)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _rss_child(kind, mode, scale):
+    start = time.perf_counter()
+    records = _build(kind, mode, scale)
+    out = json.dumps(records, default=json_default)
+    elapsed = time.perf_counter() - start
+    rss_mb = peak_rss_mb()
+    print(json.dumps({"records": len(records), "rss_mb": rss_mb, "seconds": elapsed, "bytes": len(out)}))
+
+
+def bench(scale=10):
+    print(f"Dataset scale: {scale}x")
+    print(f"{'dataset':<8} {'repr':<8} {'records':>8} {'bytes/rec':>10} {'peak RSS':>10} {'time':>8}")
+    for kind in ('exide', 'wipers'):
+        if kind == 'wipers' and not os.path.exists(wipers_database_file):
+            continue
+        for mode in ('dicts', 'records'):
+            count, per_record = _measure(kind, mode, scale)
+            child = subprocess.run([sys.executable, __file__, '--rss', kind, mode, str(scale)],
+                                   capture_output=True, text=True, check=True)
+            stats = json.loads(child.stdout)
+            print(f"{kind:<8} {mode:<8} {count:>8} {per_record:>10.0f} "
+                  f"{stats['rss_mb']:>8.1f}MB {stats['seconds']:>7.2f}s")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['--bench']:
+        bench(int(args[1]) if len(args) > 1 else 10)
+    elif args[:1] == ['--rss']:
+        _rss_child(args[1], args[2], int(args[3]))
+    else:
+        print("Usage: python3 catalog_records.py --bench [scale]")
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Change-set stage: what an import actually has to write to Strapi.
+
+    python3 changeset.py fetch battery|fulmen|wipers
+    python3 changeset.py diff  battery|fulmen|wipers
+    python3 changeset.py --bench
+
+fetch saves the Strapi collection of a source as json_data/strapi-<collection>.json
+(same {"data", "meta"} layout as fetch_models.py, relations populated). diff
+builds the records the importer would send (strapi_import.SOURCES, relations
+resolved against Strapi), keys each one like the importer (slug, wipers: ref)
+and compares its hash with the hash of the snapshot entry projected on the
+same fields (relations reduced to their documentId):
+- create: key not in the snapshot,
+- update: key in the snapshot, and the payload merged with the entry as the
+  importer merges it (strapi_import.MERGES) hashes differently,
+- delete: snapshot entry of the same source (batteryBrand / category) whose
+  key is no longer produced, unless other suppliers' positions are on it.
+The result goes to json_data/changesets/<source>.json and is applied with
+    python3 strapi_import.py <source> --changeset
+
+--bench simulates a monthly update on the Valeo database (2% of the entries
+changed, 1% added, 0.5% removed) and compares the writes of a full import
+with the change set.
+"""
+import json
+import os
+import random
+import sys
+import time
+
+from json_cache import load_json
+from run_metrics import RunMetrics
+from names import slugify
+from strapi_import import (KEYS, MERGES, SCOPES, SOURCES, Catalog, StrapiClient, content_hash,
+                           foreign_positions)
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+json_data_dir = os.path.join(script_dir, 'json_data')
+changesets_dir = os.path.join(json_data_dir, 'changesets')
+
+def snapshot_file(collection):
+    return os.path.join(json_data_dir, f"strapi-{collection}.json")
+
+
+def changeset_file(source):
+    return os.path.join(changesets_dir, f"{source}.json")
+
+
+def fetch_snapshot(source, client=None):
+    collection = SOURCES[source][0]
+    client = client or StrapiClient()
+    entries = list(client.iter_entries(collection, populate='*'))
+    path = snapshot_file(collection)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"data": entries, "meta": {"total": len(entries)}}, f, indent=2, ensure_ascii=False)
+    print(f"Saved {len(entries)} {collection} to {path}")
+    return entries
+
+
+def snapshot_index(entries, source):
+    """key -> entry for the snapshot entries of the source"""
+    scope_field, scope_value = SCOPES[source]
+    key = KEYS[source]
+    return {entry[key]: entry for entry in entries if entry.get(scope_field) == scope_value and entry.get(key)}
+
+
+def projected(entry, fields):
+    """`entry` on `fields`, populated relations reduced to their documentId (as payloads send them)"""
+    values = {}
+    for field in fields:
+        value = entry.get(field)
+        values[field] = value['documentId'] if isinstance(value, dict) and 'documentId' in value else value
+    return values
+
+
+def diff(records, snapshot_entries, source):
+    """Create / update / delete sets between `records` ((key, payload) pairs) and a snapshot"""
+    collection = SOURCES[source][0]
+    merge = MERGES.get(collection, (None, None))[1]
+    unique = {}
+    for key, payload in records:
+        unique.setdefault(key, payload)  # first one wins, as in strapi_import.run_import
+    records = unique
+    snapshot = snapshot_index(snapshot_entries, source)
+
+    create, update, unchanged = [], [], 0
+    for key, payload in records.items():
+        entry = snapshot.get(key)
+        if entry is None:
+            create.append({"key": key, "payload": payload})
+            continue
+        if merge:
+            payload = merge(entry, payload)
+        if content_hash(projected(entry, payload)) != content_hash(payload):
+            update.append({"key": key, "documentId": entry.get('documentId') or entry.get('id'), "payload": payload})
+        else:
+            unchanged += 1
+    # A wipers product also holding other suppliers' positions is shared: it is not the source's to delete
+    gone = [(key, entry) for key, entry in snapshot.items() if key not in records]
+    delete = [{"key": key, "documentId": entry.get('documentId') or entry.get('id')}
+              for key, entry in gone if not foreign_positions(entry)]
+
+    return {
+        "source": source,
+        "collection": collection,
+        "keyField": KEYS[source],
+        "stats": {
+            "records": len(records),
+            "snapshot": len(snapshot),
+            "create": len(create),
+            "update": len(update),
+            "delete": len(delete),
+            "shared": len(gone) - len(delete),
+            "unchanged": unchanged,
+        },
+        "create": create,
+        "update": update,
+        "delete": delete,
+    }
+
+
+def build_changeset(source):
+    collection, path, make_records = SOURCES[source]
+    snapshot_path = snapshot_file(collection)
+    if not os.path.exists(path):
+        sys.exit(f"{path} not found")
+    if not os.path.exists(snapshot_path):
+        sys.exit(f"{snapshot_path} not found, run 'python3 changeset.py fetch {source}' first")
+
+    with RunMetrics(f"changeset-{source}") as metrics:
+        metrics.stage('diff')
+        catalog = Catalog.fetch(StrapiClient())
+        changeset = diff(make_records(path, catalog), load_json(snapshot_path).get('data', []), source)
+        metrics.stage('write')
+        os.makedirs(changesets_dir, exist_ok=True)
+        with open(changeset_file(source), 'w', encoding='utf-8') as f:
+            json.dump(changeset, f, indent=2, ensure_ascii=False)
+        metrics.stage(None)
+        metrics.counts(changeset['stats'])
+        metrics.count('rows_in', changeset['stats']['records'])
+        metrics.count('rows_out', sum(changeset['stats'][kind] for kind in ('create', 'update', 'delete')))
+        print_stats(changeset['stats'])
+        print(f"Saved change set to {changeset_file(source)}")
+        return changeset
+
+
+def print_stats(stats):
+    writes = stats['create'] + stats['update'] + stats['delete']
+    print(f"Records: {stats['records']}  Snapshot: {stats['snapshot']}")
+    print(f"Create: {stats['create']}  Update: {stats['update']}  Delete: {stats['delete']}  "
+          f"Unchanged: {stats['unchanged']}  Shared, not deleted: {stats['shared']}")
+    if writes:
+        print(f"Writes: {writes} instead of {stats['records']} for a full import "
+              f"({stats['records'] / writes:.1f}x fewer)")
+
+
+def bench(seed=1):
+    """Monthly-update simulation on the Valeo records against a snapshot of the previous month"""
+    collection, path, make_records = SOURCES['wipers']
+    if not os.path.exists(path):
+        print(f"{path} not found")
+        return
+    rng = random.Random(seed)
+    # Every Valeo brand and model taken as a Strapi one
+    brands, models = {}, {}
+    for brand_name, entries in load_json(path).get('brands', {}).items():
+        brand = brands[brand_name] = {"documentId": f"brand-{slugify(brand_name)}", "name": brand_name,
+                                      "slug": slugify(brand_name)}
+        for entry in entries:
+            models.setdefault((brand_name, entry['model']), {
+                "documentId": f"model-{slugify(brand_name)}-{slugify(entry['model'])}", "name": entry['model'],
+                "slug": slugify(entry['model']), "brand": brand})
+    previous = dict(make_records(path, Catalog(list(brands.values()), list(models.values()))))
+    snapshot = [dict(payload, documentId=f"doc{i:06d}") for i, payload in enumerate(previous.values())]
+
+    current = {key: json.loads(json.dumps(payload)) for key, payload in previous.items()}
+    keys = list(current)
+    for key in rng.sample(keys, len(keys) // 50):
+        current[key]['constructionYearEnd'] = '12/2026'
+    for key in rng.sample(keys, len(keys) // 200):
+        del current[key]
+    for i in range(len(keys) // 100):
+        current[f"NEW-ENTRY-{i}"] = dict(next(iter(previous.values())), ref=f"NEW-ENTRY-{i}")
+
+    start = time.perf_counter()
+    changeset = diff(current.items(), snapshot, 'wipers')
+    elapsed = time.perf_counter() - start
+    print_stats(changeset['stats'])
+    print(f"Diff computed in {elapsed * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if len(args) == 2 and args[0] in ('fetch', 'diff') and args[1] in SOURCES:
+        if args[0] == 'fetch':
+            fetch_snapshot(args[1])
+        else:
+            build_changeset(args[1])
+    elif args[:1] == ['--bench']:
+        bench()
+    else:
+        print("Usage: python3 changeset.py fetch|diff battery|fulmen|wipers | --bench")
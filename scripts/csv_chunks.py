@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Parallel parsing of large supplier CSVs by byte ranges.
+
+The file is cut into byte ranges that start and end on record boundaries:
+a cut moves forward to the next newline that is not inside a quoted field
+(quoted fields may hold newlines, "" is an escaped quote). Each range is
+read, decoded and fed to csv.reader in a worker process, which also runs
+the caller's row function (normalization), so only the normalized results
+travel back. Results come back in file order, with the physical line
+number csv.reader would have given (reader.line_num).
+
+    rows = parse_chunked(path, parse_row, skip_rows=3)   # [(line_num, parse_row(row)), ...]
+
+`parse_row` must be a module-level function. Workers are forked, so it
+may live in the __main__ of a flat script (parse_valeo_janv2026.py).
+Small files, a single worker, or platforms without fork go through
+parse_serial (plain csv.reader, the former single-core path).
+
+    python3 csv_chunks.py --bench <csv> [--skip N] [--scale N]   # raw rows at 1, 2, 4, 8 workers
+"""
+import bisect
+import csv
+import io
+import mmap
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Below this a range is not worth a process (pool start-up and pickling cost more)
+MIN_CHUNK_BYTES = 256 * 1024
+# Ranges per worker: smaller ranges even out the load across workers
+CHUNKS_PER_WORKER = 4
+
+BENCH_WORKERS = (1, 2, 4, 8)
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+_QUOTED_FIELD = re.compile(rb'"(?:[^"]|"")*"')
+
+
+def quoted_spans(data, start=0, delimiter=','):
+    """(starts, ends) of the quoted fields of data[start:], as csv.reader reads them:
+    a quote opens a field only right after a delimiter or a line break, elsewhere it is text.
+    Jumps from quote to quote, so files with few quoted fields cost one find() per quote."""
+    separators = delimiter.encode() + b'\r\n'
+    starts, ends = [], []
+    pos = data.find(b'"', start)
+    while pos != -1:
+        if pos == 0 or data[pos - 1] in separators:
+            match = _QUOTED_FIELD.match(data, pos)
+            end = match.end() if match else len(data)  # never closed: csv.reader reads to the end
+            starts.append(pos)
+            ends.append(end)
+            pos = end
+        else:
+            pos += 1
+        pos = data.find(b'"', pos)
+    return starts, ends
+
+
+def _record_end(data, pos, starts, ends):
+    """Offset just after the first record break at or after pos (len(data) at the end)"""
+    while True:
+        newline = data.find(b'\n', pos)
+        if newline == -1:
+            return len(data)
+        i = bisect.bisect_right(starts, newline) - 1
+        if i < 0 or ends[i] <= newline:
+            return newline + 1
+        pos = ends[i]
+
+
+def split_ranges(path, chunks, skip_rows=0, delimiter=','):
+    """[(start, end, line_base)] byte ranges of the records after the `skip_rows` header rows;
+    line_base is the number of physical lines before the range"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        starts, ends = quoted_spans(data, 0, delimiter)
+        begin = 0
+        for _ in range(skip_rows):
+            begin = _record_end(data, begin, starts, ends)
+        ranges = []
+        line_base = data[:begin].count(b'\n')
+        step = max((size - begin) // max(chunks, 1), 1)
+        while begin < size:
+            end = _record_end(data, begin + step, starts, ends) if begin + step < size else size
+            ranges.append((begin, end, line_base))
+            line_base += data[begin:end].count(b'\n')
+            begin = end
+    return ranges
+
+
+def _parse_range(task):
+    """Worker: [(line_num, row_fn(row))] for the records of one byte range"""
+    path, start, end, line_base, row_fn, encoding, delimiter = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode(encoding)
+    reader = csv.reader(io.StringIO(text, newline=''), delimiter=delimiter)
+    return [(line_base + reader.line_num, row_fn(row)) for row in reader]
+
+
+def _raw_row(row):
+    return row
+
+
+def chunk_count(size, workers):
+    """Number of byte ranges parse_chunked cuts a file of `size` bytes into for `workers` processes"""
+    if workers == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        return 1
+    return max(1, min(workers * CHUNKS_PER_WORKER, size // MIN_CHUNK_BYTES))
+
+
+def parse_chunked(path, row_fn=_raw_row, skip_rows=0, workers=None, encoding='utf-8', delimiter=','):
+    """[(line_num, row_fn(row))] for every record after the header rows, in file order"""
+    workers = workers or default_workers()
+    chunks = chunk_count(os.path.getsize(path), workers)
+    if chunks == 1:
+        return parse_serial(path, row_fn, skip_rows, encoding, delimiter)
+    tasks = [(path, start, end, line_base, row_fn, encoding, delimiter)
+             for start, end, line_base in split_ranges(path, chunks, skip_rows, delimiter)]
+    if len(tasks) <= 1:
+        parts = map(_parse_range, tasks)
+    else:
+        executor = ProcessPoolExecutor(min(workers, len(tasks)), mp_context=multiprocessing.get_context('fork'))
+        with executor:
+            parts = list(executor.map(_parse_range, tasks))
+    results = []
+    for part in parts:
+        results.extend(part)
+    return results
+
+
+def parse_serial(path, row_fn=_raw_row, skip_rows=0, encoding='utf-8', delimiter=','):
+    """The single-core reference: csv.reader over the whole file"""
+    with open(path, encoding=encoding, newline='') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        for _ in range(skip_rows):
+            next(reader, None)
+        return [(reader.line_num, row_fn(row)) for row in reader]
+
+
+def scaled_copy(path, scale, skip_rows=0, delimiter=','):
+    """Temp copy of the CSV with its records repeated `scale` times (header rows kept once)"""
+    header_end = split_ranges(path, 1, skip_rows, delimiter)[0][0] if os.path.getsize(path) else 0
+    with open(path, 'rb') as f:
+        data = f.read()
+    body = data[header_end:]
+    if body and not body.endswith(b'\n'):
+        body += b'\n'
+    fd, copy = tempfile.mkstemp(prefix='csv-chunks-', suffix='.csv')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data[:header_end])
+        for _ in range(scale):
+            f.write(body)
+    return copy
+
+
+def bench_scaling(path, row_fn=_raw_row, skip_rows=0, scale=1, repeat=3, delimiter=','):
+    """Print serial csv.reader vs parse_chunked at 1, 2, 4, 8 workers (results checked identical)"""
+    target = scaled_copy(path, scale, skip_rows, delimiter) if scale > 1 else path
+    try:
+        def best_of(fn):
+            best, result = None, None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = fn()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            return best, result
+
+        serial, expected = best_of(lambda: parse_serial(target, row_fn, skip_rows, delimiter=delimiter))
+        size_mb = os.path.getsize(target) / 1024 / 1024
+        print(f"{os.path.basename(path)} x{scale}: {size_mb:.1f} MB, {len(expected)} records, "
+              f"{default_workers()} CPU(s), best of {repeat}")
+        print(f"{'workers':>8} {'ranges':>7} {'time':>9} {'rows/s':>10} {'speedup':>8}")
+        print(f"{'serial':>8} {'-':>7} {serial * 1000:>7.0f}ms {len(expected) / serial:>10.0f} {1.0:>7.2f}x")
+        for workers in BENCH_WORKERS:
+            elapsed, result = best_of(lambda: parse_chunked(target, row_fn, skip_rows, workers, delimiter=delimiter))
+            if result != expected:
+                sys.exit(f"parse_chunked with {workers} workers differs from csv.reader")
+            print(f"{workers:>8} {chunk_count(os.path.getsize(target), workers):>7} {elapsed * 1000:>7.0f}ms "
+                  f"{len(result) / elapsed:>10.0f} {serial / elapsed:>7.2f}x")
+    finally:
+        if target != path:
+            os.unlink(target)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['--bench'] and len(args) >= 2:
+        options = dict(zip(args[2::2], args[3::2]))
+        bench_scaling(args[1], skip_rows=int(options.get('--skip', 0)), scale=int(options.get('--scale', 1)))
+    else:
+        print("Usage: python3 csv_chunks.py --bench <csv> [--skip N] [--scale N]")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Production-date interval index for year-based vehicle filtering.
+
+Exide motorisations carry startDate/endDate as 'YYYY-MM-01' (see convert_date
+in the Exide transform) and Valeo entries carry productionYears as 'MM/YYYY'.
+Both are normalized here to sortable integers YYYYMM (201203 = March 2012);
+a missing end means "still produced" and stays open (None / NULL): it is
+resolved against the year asked at query time, never against the year the
+index or the seed was built in.
+
+The in-memory index buckets every closed interval by (brand slug, model
+slug, year), brands resolved to their Strapi slug through the brand_aliases
+table, so "entries active in year Y for model M" is a single dict lookup
+plus the (few) open intervals of that model.
+
+    python3 date_index.py query <brand> <model> <year>
+    python3 date_index.py seed [tablet-app.db]
+The seed stage exports the intervals to a `production_intervals` table whose
+(brand_slug, model_slug, start_ym) index turns the same question into a
+B-tree range read on the tablet (end_ym NULL while still produced).
+"""
+import os
+import re
+import sys
+
+from brand_aliases import load_aliases
+from battery_encoding import load_battery_products
+from json_cache import load_json
+from names import slugify
+from run_metrics import RunMetrics
+from seed_db import open_seed, replace_table
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+battery_products_file = os.path.join(script_dir, 'json_data', 'exide-battery-products.json')
+wipers_database_file = os.path.join(script_dir, 'wipers', 'wipers_database_janv2026.json')
+
+_ISO = re.compile(r'^(\d{4})-(\d{2})(?:-\d{2})?$')   # 2012-03-01 (Exide transform output)
+_RAW = re.compile(r'^(\d{4})(\d{2})$')                # 201203 (raw Exide dateFrom/dateTo)
+_VALEO = re.compile(r'^(\d{1,2})/(\d{4})$')           # 03/2012 (Valeo productionYears)
+_YEAR = re.compile(r'^(\d{4})$')                      # /2012 or 2012 (Valeo rows without month)
+
+
+def year_month(value, default_month=1):
+    """Parse any supplier date format into YYYYMM; None when empty or invalid"""
+    if not isinstance(value, str):
+        return None
+    value = value.strip().lstrip('/')
+    for pattern, year_group, month_group in ((_ISO, 1, 2), (_RAW, 1, 2), (_VALEO, 2, 1)):
+        match = pattern.match(value)
+        if match:
+            year, month = int(match.group(year_group)), int(match.group(month_group))
+            if 1 <= month <= 12:
+                return year * 100 + month
+            return None
+    match = _YEAR.match(value)
+    if match:
+        return int(match.group(1)) * 100 + default_month
+    return None
+
+
+def interval(start, end):
+    """(start_ym, end_ym) for a pair of supplier dates; end_ym is None while still produced"""
+    start_ym = year_month(start, default_month=1)
+    end_ym = year_month(end, default_month=12)
+    return (start_ym or 0, end_ym)
+
+
+def iter_intervals(battery_products, wipers_database):
+    """Yield (source, brand, model, label, start_ym, end_ym) for Exide and Valeo entries"""
+    for product in battery_products:
+        for motorisation in product.get('motorisations', []):
+            start_ym, end_ym = interval(motorisation.get('startDate'), motorisation.get('endDate'))
+            yield ('exide', product.get('brand'), product.get('model'),
+                   motorisation.get('motorisation'), start_ym, end_ym)
+    for brand, entries in wipers_database.get('brands', {}).items():
+        for entry in entries:
+            years = entry.get('productionYears') or {}
+            start_ym, end_ym = interval(years.get('start'), years.get('end'))
+            yield ('valeo', brand, entry.get('model'), entry.get('id'), start_ym, end_ym)
+
+
+class YearIndex:
+    """Year buckets: (brand slug, model slug, year) -> closed intervals active that year,
+    (brand slug, model slug) -> open intervals, matched against the year asked"""
+
+    def __init__(self, intervals):
+        self.buckets = {}
+        self.open = {}
+        self.brand_slug = load_aliases().slug
+        for row in intervals:
+            source, brand, model, label, start_ym, end_ym = row
+            if not start_ym:
+                continue
+            key = (self.brand_slug(brand), slugify(model))
+            if end_ym is None:
+                self.open.setdefault(key, []).append(row)
+                continue
+            for year in range(start_ym // 100, end_ym // 100 + 1):
+                self.buckets.setdefault(key + (year,), []).append(row)
+
+    def active_in(self, brand, model, year, source=None):
+        key, year = (self.brand_slug(brand), slugify(model)), int(year)
+        rows = self.buckets.get(key + (year,), []) + [row for row in self.open.get(key, []) if row[4] // 100 <= year]
+        if source:
+            rows = [row for row in rows if row[0] == source]
+        return rows
+
+
+def load_intervals():
+    battery_products = load_battery_products(battery_products_file) if os.path.exists(battery_products_file) else []
+    wipers_database = load_json(wipers_database_file) if os.path.exists(wipers_database_file) else {}
+    return list(iter_intervals(battery_products, wipers_database))
+
+
+def export_to_seed(intervals, db_path=None):
+    brand_slug = load_aliases().slug
+    conn = open_seed(db_path)
+    with conn:
+        count = replace_table(
+            conn, 'production_intervals',
+            """CREATE TABLE production_intervals (
+              source TEXT NOT NULL,
+              brand_slug TEXT NOT NULL,
+              model_slug TEXT NOT NULL,
+              label TEXT,
+              start_ym INTEGER NOT NULL,
+              end_ym INTEGER
+            )""",
+            ((source, brand_slug(brand), slugify(model), label, start_ym, end_ym)
+             for source, brand, model, label, start_ym, end_ym in intervals if start_ym),
+            indexes=[
+                "CREATE INDEX idx_production_intervals_model_start ON production_intervals"
+                "(brand_slug, model_slug, start_ym, end_ym)",
+            ],
+        )
+    conn.close()
+    print(f"Exported {count} production intervals to the seed")
+    print("Tablet query: SELECT ... FROM production_intervals WHERE brand_slug = ? AND model_slug = ? "
+          "AND start_ym <= :year * 100 + 12 AND (end_ym IS NULL OR end_ym >= :year * 100 + 1)")
+    return count
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['query'] and len(args) == 4:
+        index = YearIndex(load_intervals())
+        rows = index.active_in(args[1], args[2], args[3])
+        for source, brand, model, label, start_ym, end_ym in rows:
+            end = end_ym or ''
+            print(f"  [{source}] {brand} {model} - {label} ({start_ym} -> {end})")
+        print(f"{len(rows)} entries active in {args[3]}")
+    elif args[:1] == ['seed']:
+        with RunMetrics('date-index-seed') as metrics:
+            metrics.stage('load')
+            intervals = load_intervals()
+            metrics.stage('seed')
+            metrics.count('rows_in', len(intervals))
+            metrics.count('rows_out', export_to_seed(intervals, args[1] if len(args) > 1 else None))
+    else:
+        print("Usage: python3 date_index.py query <brand> <model> <year> | seed [tablet-app.db]")
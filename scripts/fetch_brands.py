@@ -1,47 +1,42 @@
 #!/usr/bin/env python3
-import requests
-import json
+"""
+Export every Strapi brand to brands.json ({"data", "meta"}).
 
-all_brands = []
-page = 1
-page_size = 25
+    python3 fetch_brands.py [--ndjson] [--no-cache]
 
-while True:
-    url = f"http://localhost:1338/api/brands?pagination[page]={page}&pagination[pageSize]={page_size}"
-    print(f"Fetching page {page}...")
-    
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        
-        all_brands.extend(data.get('data', []))
-        
-        pagination = data.get('meta', {}).get('pagination', {})
-        current_page = pagination.get('page', page)
-        page_count = pagination.get('pageCount', 1)
-        
-        print(f"Page {current_page}/{page_count}, Total brands so far: {len(all_brands)}")
-        
-        if current_page >= page_count:
-            break
-            
-        page += 1
-        
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching page {page}: {e}")
-        break
+Pages are written to disk as they arrive (stream_fetch.py): memory stays flat
+whatever the collection size, and the export is only replaced once the last
+page is in. --ndjson writes brands.ndjson instead (one brand per line).
+Pages already fetched are revalidated with If-None-Match / If-Modified-Since
+(http_cache.py): unchanged pages come back as 304 and are read from
+scripts/.cache/http/. --no-cache downloads everything.
+"""
+import sys
 
-# Save to JSON file
-output = {
-    "data": all_brands,
-    "meta": {
-        "total": len(all_brands)
-    }
-}
+import requests
 
-with open('brands.json', 'w', encoding='utf-8') as f:
-    json.dump(output, f, indent=2, ensure_ascii=False)
+from http_cache import HttpCache
+from run_metrics import RunMetrics
+from stream_fetch import JsonDocumentWriter, NdjsonWriter
+from strapi_import import STRAPI_URL, StrapiClient
 
-print(f"\nSuccessfully saved {len(all_brands)} brands to brands.json")
+ndjson = '--ndjson' in sys.argv[1:]
+output_path = 'brands.ndjson' if ndjson else 'brands.json'
+
+with RunMetrics('fetch-brands') as metrics:
+    metrics.stage('fetch')
+    print(f"Fetching brands from {STRAPI_URL}/api/brands...")
+    client = StrapiClient(workers=1, rate=0, cache=None if '--no-cache' in sys.argv[1:] else HttpCache())
+    try:
+        with (NdjsonWriter(output_path) if ndjson else JsonDocumentWriter(output_path)) as writer:
+            for brand in client.iter_entries('brands'):
+                writer.write(brand)
+    except requests.exceptions.RequestException as e:
+        sys.exit(f"Error fetching brands after {writer.count} entries: {e} ({output_path} left unchanged)")
+    metrics.count('rows_out', writer.count)
+    if client.cache:
+        metrics.count('pages_not_modified', client.cache.hits)
+        metrics.count('bytes_downloaded', client.cache.bytes_downloaded)
+        print(client.cache.summary())
 
+    print(f"\nSuccessfully saved {writer.count} brands to {output_path}")
@@ -1,52 +1,44 @@
 #!/usr/bin/env python3
-import requests
-import json
-import os
+"""
+Export every Strapi model to json_data/models.json ({"data", "meta"}).
 
-all_models = []
-page = 1
-page_size = 25
+    python3 fetch_models.py [--ndjson] [--no-cache]
 
-# Create json_data directory if it doesn't exist
-os.makedirs('json_data', exist_ok=True)
+Pages are written to disk as they arrive (stream_fetch.py): memory stays flat
+whatever the collection size, and the export is only replaced once the last
+page is in. --ndjson writes json_data/models.ndjson instead (one model per line).
+Pages already fetched are revalidated with If-None-Match / If-Modified-Since
+(http_cache.py): unchanged pages come back as 304 and are read from
+scripts/.cache/http/. --no-cache downloads everything.
+"""
+import sys
 
-while True:
-    url = f"http://localhost:1338/api/models?pagination[page]={page}&pagination[pageSize]={page_size}"
-    print(f"Fetching page {page}...")
-    
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        
-        all_models.extend(data.get('data', []))
-        
-        pagination = data.get('meta', {}).get('pagination', {})
-        current_page = pagination.get('page', page)
-        page_count = pagination.get('pageCount', 1)
-        
-        print(f"Page {current_page}/{page_count}, Total models so far: {len(all_models)}")
-        
-        if current_page >= page_count:
-            break
-            
-        page += 1
-        
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching page {page}: {e}")
-        break
+import requests
 
-# Save to JSON file
-output = {
-    "data": all_models,
-    "meta": {
-        "total": len(all_models)
-    }
-}
+from http_cache import HttpCache
+from run_metrics import RunMetrics
+from stream_fetch import JsonDocumentWriter, NdjsonWriter
+from strapi_import import STRAPI_URL, StrapiClient
 
-output_path = 'json_data/models.json'
-with open(output_path, 'w', encoding='utf-8') as f:
-    json.dump(output, f, indent=2, ensure_ascii=False)
+ndjson = '--ndjson' in sys.argv[1:]
+output_path = 'json_data/models.ndjson' if ndjson else 'json_data/models.json'
 
-print(f"\nSuccessfully saved {len(all_models)} models to {output_path}")
+with RunMetrics('fetch-models') as metrics:
+    metrics.stage('fetch')
+    print(f"Fetching models from {STRAPI_URL}/api/models...")
+    client = StrapiClient(workers=1, rate=0, cache=None if '--no-cache' in sys.argv[1:] else HttpCache())
+    try:
+        with (NdjsonWriter(output_path) if ndjson else JsonDocumentWriter(output_path)) as writer:
+            for model in client.iter_entries('models'):
+                writer.write(model)
+                if writer.count % 1000 == 0:
+                    print(f"  {writer.count} models so far")
+    except requests.exceptions.RequestException as e:
+        sys.exit(f"Error fetching models after {writer.count} entries: {e} ({output_path} left unchanged)")
+    metrics.count('rows_out', writer.count)
+    if client.cache:
+        metrics.count('pages_not_modified', client.cache.hits)
+        metrics.count('bytes_downloaded', client.cache.bytes_downloaded)
+        print(client.cache.summary())
 
+    print(f"\nSuccessfully saved {writer.count} models to {output_path}")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+On-disk HTTP conditional-request cache for the Strapi fetchers.
+
+StrapiClient(cache=HttpCache()) sends If-None-Match / If-Modified-Since for
+every GET URL it has already seen. A 304 Not Modified is then answered from
+the cached body, so an unchanged page costs one round trip with no payload
+instead of a full download. The cache entry for a URL stores its ETag,
+Last-Modified and raw body:
+    scripts/.cache/http/<sha1 of the URL>.entry
+A response without either header is not cached. Strapi's content API sends
+neither on its own: the global::conditional-get middleware
+(src/middlewares/conditional-get.ts) adds a weak ETag to every GET /api/*
+response and answers 304 when If-None-Match matches it.
+
+    python3 http_cache.py --bench [models]   # cold fetch vs no-op refresh
+    python3 http_cache.py --clear
+"""
+import hashlib
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+cache_dir = os.path.join(script_dir, '.cache', 'http')
+
+
+class HttpCache:
+    """ETag / Last-Modified validators and bodies keyed by request URL"""
+
+    def __init__(self, directory=cache_dir):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.bytes_downloaded = 0
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.entry')
+
+    def _read(self, url):
+        """(header dict, body bytes) or (None, None)"""
+        try:
+            with open(self._path(url), 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return None, None
+        (size,) = struct.unpack_from('<I', raw)
+        header = json.loads(raw[4:4 + size])
+        if header.get('url') != url:
+            return None, None
+        return header, raw[4 + size:]
+
+    def conditional_headers(self, url):
+        header, _ = self._read(url)
+        if header is None:
+            return {}
+        headers = {}
+        if header.get('etag'):
+            headers['If-None-Match'] = header['etag']
+        if header.get('lastModified'):
+            headers['If-Modified-Since'] = header['lastModified']
+        return headers
+
+    def body(self, url):
+        """Cached body for a 304 answer (counted as a hit)"""
+        _, body = self._read(url)
+        if body is None:
+            raise KeyError(f"304 for {url} without a cached body")
+        self.hits += 1
+        self.bytes_saved += len(body)
+        return body
+
+    def store(self, url, response):
+        """Keep the body of a 200 answer when it carries validators"""
+        self.misses += 1
+        self.bytes_downloaded += len(response.content)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        header = json.dumps({"url": url, "etag": etag, "lastModified": last_modified}).encode('utf-8')
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            f.write(response.content)
+        os.replace(tmp, self._path(url))
+
+    def summary(self):
+        return (f"HTTP cache: {self.hits} not modified, {self.misses} downloaded "
+                f"({self.bytes_downloaded / 1024:.0f} KB transferred, {self.bytes_saved / 1024:.0f} KB served from cache)")
+
+
+def clear():
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def bench(count=20000):
+    from strapi_import import StrapiClient, start_stand_in_server
+    server, store = start_stand_in_server(latency=0.02, failure_rate=0)
+    store['models'] = {f"doc{i:06d}": {"id": i, "documentId": f"doc{i:06d}", "name": f"MODEL {i}",
+                                       "slug": f"model-{i}", "isActive": True,
+                                       "createdAt": "2025-09-21T11:22:10.702Z"} for i in range(count)}
+    store['brands'] = {f"b{i}": {"id": i, "name": f"BRAND {i}", "slug": f"brand-{i}"} for i in range(300)}
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    directory = tempfile.mkdtemp()
+    print(f"Stand-in Strapi at {url}: {count} models, 300 brands, 20 ms per request")
+    try:
+        for label in ('no cache', 'cold cache', 'no-op refresh'):
+            cache = None if label == 'no cache' else HttpCache(directory)
+            client = StrapiClient(url, workers=1, rate=0, cache=cache)
+            start = time.perf_counter()
+            entries = sum(1 for collection in ('brands', 'models') for _ in client.iter_entries(collection))
+            elapsed = time.perf_counter() - start
+            print(f"{label:<14} {entries} entries in {elapsed:.2f}s"
+                  + (f"  {cache.summary()}" if cache else ''))
+        store['models']['doc000042']['name'] = 'MODEL 42 (renamed)'
+        cache = HttpCache(directory)
+        client = StrapiClient(url, workers=1, rate=0, cache=cache)
+        start = time.perf_counter()
+        renamed = [m for m in client.iter_entries('models') if m['id'] == 42][0]['name']
+        print(f"{'one change':<14} models in {time.perf_counter() - start:.2f}s  {cache.summary()} -> {renamed!r}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['--bench']:
+        bench(int(args[1]) if len(args) > 1 else 20000)
+    elif args[:1] == ['--clear']:
+        clear()
+        print(f"Removed {cache_dir}")
+    else:
+        print("Usage: python3 http_cache.py --bench [models] | --clear")
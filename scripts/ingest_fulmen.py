@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Fulmen Endurance ILV workbook -> battery products.
+
+    python3 ingest_fulmen.py ["liste_affectation/ILV FULMEN ENDURANCE.xlsx"]
+
+The workbook is a PDF conversion: one sheet, two page columns interleaved
+row by row, column positions that move from page to page and cells that
+sometimes hold a whole wrapped line ("C4 CACTUS   1.2 VTi  Petrole 2014-09").
+Rows are therefore parsed from their text rather than from fixed columns:
+
+    <model> <type> <fuel> <from YYYY-MM> [<to YYYY-MM>] <refs...>
+
+- brand header rows hold a single known brand name; since both page columns
+  have their own brand, a model is attached to the recent brand whose
+  catalog (Exide / Valeo) knows its first word,
+- rows with only a type reuse the previous model of the same brand (a brand
+  header starts afresh),
+- refs are classified by Fulmen family (F40-F44/FK -> AGM, F30-F32/FL -> EFB,
+  F1-F12 -> conventional, as laid out in the sheet's columns),
+- rows that cannot be parsed entirely (text left over), vehicles with more
+  refs in one battery family than its three options, and vehicles that fail
+  the motorisation shape (e.g. no type name) are counted and written to the
+  rejects file; none of them is emitted.
+
+The sheet is read with openpyxl in read-only mode (rows are streamed, never
+loaded as a whole) and the output has the same shape as
+transform-exide-to-battery-products.py, written to
+json_data/fulmen-battery-products.json (batteryPremium/batteryExcell stay
+empty, conventional refs go to batteryClassic).
+"""
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import deque
+
+from brand_aliases import load_aliases
+from brand_reconciliation import load_exide_source, load_strapi_source, load_valeo_source, slugify
+from catalog_records import BatteryOptions, EMPTY_BATTERY, Motorisation, json_default, peak_rss_mb
+from run_metrics import RunMetrics
+from validators import VALIDATORS, ValidationReport
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+fulmen_workbook_file = os.path.join(script_dir, 'liste_affectation', 'ILV FULMEN ENDURANCE.xlsx')
+output_file = os.path.join(script_dir, 'json_data', 'fulmen-battery-products.json')
+rejects_file = os.path.join(script_dir, 'json_data', 'fulmen-rejected-rows.json')
+
+# Separator put between cells when a row is joined into one line
+SEP = '\x1f'
+
+FUELS = {
+    'diesel': 'Diesel',
+    'petrole': 'Petrol',
+    'essence': 'Petrol',
+    'hybride': 'Hybrid',
+    'electrique': 'Electric',
+    'gpl': 'LPG',
+}
+_FUEL = re.compile(r'(?<![A-Za-z])(Diesel|P[ée]trole|Essence|Hybride|[ÉE]lectrique|GPL)(?![A-Za-z])', re.IGNORECASE)
+_DATES = re.compile(r'[\s\x1f]*(\d{4})-(\d{2})(?:[\s\x1f]+(\d{4})-(\d{2}))?')
+_REF = re.compile(r'F[KL]?\d{1,4}')
+_REFS = re.compile(r'(?:[\s\x1f/]*\bF[KL]?\d{1,4}\b)+')
+_FIELD_SPLIT = re.compile(r'\x1f|\s{3,}')
+_TYPE_ONLY = re.compile(r'^\d[.,]\d')
+# Dates / refs spilled from the previous line of a wrapped cell
+_STRAY = re.compile(r'(?:\d{4}-\d{2}|F[KL]?\d{1,4})(?:[\s/]+(?:\d{4}-\d{2}|F[KL]?\d{1,4}))*')
+
+# Options of a battery block (BatteryOptions option1..option3)
+BATTERY_OPTIONS = 3
+
+# Number of recent brand headers a model can belong to (one per page column, plus slack)
+BRAND_LANES = 3
+
+
+def ref_family(ref):
+    """Battery block of a Fulmen ref: batteryAGM, batteryEFB or batteryClassic"""
+    if ref.startswith('FK') or re.fullmatch(r'F4\d', ref):
+        return 'batteryAGM'
+    if ref.startswith('FL') or re.fullmatch(r'F3\d', ref):
+        return 'batteryEFB'
+    return 'batteryClassic'
+
+
+def convert_date(year, month):
+    """YYYY + MM -> YYYY-MM-01 (same format as the Exide transform), '' when invalid"""
+    if not year or not month or not 1 <= int(month) <= 12:
+        return ""
+    return f"{year}-{month}-01"
+
+
+def clean_model_name(name):
+    """Remove parentheses and their contents from model name (same rule as the Exide transform)"""
+    cleaned = re.sub(r'\s*\([^)]*\)', '', name)
+    if '(' in cleaned:
+        cleaned = cleaned[:cleaned.index('(')].strip()
+    return re.sub(r'\s+', ' ', cleaned).strip(' ,/|')
+
+
+# Comma between two types, not the decimal comma of a displacement ("2,2 D")
+_TYPE_SPLIT = re.compile(r'(?<!\d),|,(?!\d)')
+
+
+def _fields(text):
+    fields = (field.strip(' ,/') for field in _FIELD_SPLIT.split(text))
+    return [field for field in fields if field and not _STRAY.fullmatch(field)]
+
+
+def parse_row(cells):
+    """Split one sheet row into vehicle tuples (model or None, type, fuel, start, end, refs)
+
+    Returns (vehicles, leftover) where leftover is the text that belongs to no
+    vehicle (empty for a fully parsed row).
+    """
+    text = SEP.join(cells)
+    vehicles = []
+    position = 0
+    leftover = []
+    for fuel_match in _FUEL.finditer(text):
+        if fuel_match.start() < position:
+            continue
+        dates = _DATES.match(text, fuel_match.end())
+        if not dates:
+            continue
+        prefix = _fields(text[position:fuel_match.start()])
+        refs_match = _REFS.match(text, dates.end())
+        position = refs_match.end() if refs_match else dates.end()
+        refs = _REF.findall(refs_match.group(0)) if refs_match else []
+
+        if not prefix:
+            leftover.append(fuel_match.group(0))
+            continue
+        if len(prefix) == 1 and _TYPE_ONLY.match(prefix[0]):
+            model, motorisation = None, prefix[0]
+        else:
+            # Cells list several types ("2.8 JTD, 2.8 JTD 4x4, 2.8 JTD"): keep each type once
+            types = (name.strip() for field in prefix[1:] for name in _TYPE_SPLIT.split(field))
+            model, motorisation = prefix[0], ', '.join(dict.fromkeys(name for name in types if name))
+        fuel_key = fuel_match.group(1).lower().replace('é', 'e').replace('É', 'e')
+        vehicles.append((model, motorisation, FUELS[fuel_key],
+                         convert_date(dates.group(1), dates.group(2)),
+                         convert_date(dates.group(3), dates.group(4)), refs))
+    rest = _fields(text[position:])
+    if rest:
+        leftover.extend(rest)
+    return vehicles, ' '.join(leftover)
+
+
+def fold(text):
+    """Accent-folded slug used to compare names across sources (CITROËN == Citroen)"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return slugify(''.join(char for char in text if not unicodedata.combining(char)))
+
+
+def first_word(model):
+    words = fold(model).split('-')
+    return words[0] if words else ''
+
+
+class BrandResolver:
+    """Known brand names and, per brand, the first word of every known model"""
+
+    def __init__(self, sources):
+        self.brands = {}
+        self.model_words = {}
+        for source in sources:
+            for brand in source.brands | set(source.models_by_brand):
+                self.brands.setdefault(fold(brand), brand)
+            for brand, models in source.models_by_brand.items():
+                words = self.model_words.setdefault(fold(brand), set())
+                for model in models:
+                    words.add(first_word(model))
+        # model first word -> brands that have it; brands of the first source (Strapi)
+        # win over supplier aliases (VW / VOLKSWAGEN) when both have the model
+        primary = {fold(brand) for brand in sources[0].brands} if sources else set()
+        self.owners = {}
+        for brand_key, words in self.model_words.items():
+            for word in words:
+                self.owners.setdefault(word, set()).add(brand_key)
+        for word, owners in self.owners.items():
+            if len(owners) > 1 and owners & primary:
+                self.owners[word] = owners & primary
+
+    def brand_header(self, text):
+        """Canonical brand name when `text` is a brand header, else None"""
+        return self.brands.get(fold(text)) if len(text) < 40 else None
+
+    def brand_headers(self, cells):
+        """Brands announced by a row: every cell is a brand (one per page column),
+        or the row ends a wrapped model with ' / BRAND' ('B1) / KIA')"""
+        brands = [self.brand_header(cell) for cell in cells]
+        if all(brands):
+            return brands
+        if len(cells) == 1 and ' / ' in cells[0]:
+            brand = self.brand_header(cells[0].rsplit(' / ', 1)[1])
+            if brand:
+                return [brand]
+        return []
+
+    def pick(self, model, recent, seen):
+        """Brand of `model`: the most recent brand header whose catalog knows its
+        first word, else the most recent brand of the sheet that does, else the
+        only known brand with that model, else the latest brand header (guessed)"""
+        word = first_word(model)
+        for candidates in (recent, seen):
+            for brand in candidates:
+                if word in self.model_words.get(fold(brand), ()):
+                    return brand, True
+        # Brand header lost in a merged cell: use the only brand that has such a model
+        owners = self.owners.get(word, ())
+        if len(owners) == 1:
+            return self.brands.get(next(iter(owners))), True
+        return (recent[0] if recent else None), False
+
+
+def iter_sheet_rows(path):
+    """Yield (row number, [cell text]) for every non-empty row, streaming the sheet"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        sys.exit("openpyxl is required to read the Fulmen workbook: pip install openpyxl")
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            for number, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+                cells = [re.sub(r'\s*\n\s*', ' ', str(value)).strip() for value in row if value is not None]
+                cells = [cell for cell in cells if cell]
+                if cells:
+                    yield number, cells
+    finally:
+        workbook.close()
+
+
+def ingest(path, resolver, validation=None):
+    """Stream the workbook; returns (products keyed by (brand, model), stats, rejected rows)
+
+    Records are checked against the validators shapes as they are built when a
+    ValidationReport is given (provenance: sheet row number).
+    """
+    aliases = load_aliases()
+    products = {}
+    seen = set()
+    stats = dict.fromkeys(('rows', 'headers', 'brands', 'vehicles', 'duplicates', 'brand_guessed',
+                           'rejected', 'rejected_vehicles', 'too_many_refs', 'invalid'), 0)
+    rejected = []
+    recent_brands = deque(maxlen=BRAND_LANES)
+    seen_brands = deque()
+    last_model = {}
+
+    for number, cells in iter_sheet_rows(path):
+        stats['rows'] += 1
+        if any(cell.startswith('Modèle') for cell in cells) or cells[0].startswith('TROUVEZ'):
+            stats['headers'] += 1
+            continue
+        headers = resolver.brand_headers(cells)
+        if headers:
+            stats['brands'] += 1
+            last_model.clear()
+            for brand in headers:
+                for brands in (recent_brands, seen_brands):
+                    if brand in brands:
+                        brands.remove(brand)
+                    brands.appendleft(brand)
+            continue
+
+        vehicles, leftover = parse_row(cells)
+        if leftover or not vehicles:
+            # A partly parsed row may have lost or misattributed a vehicle: none of it is kept
+            stats['rejected'] += 1
+            stats['rejected_vehicles'] += len(vehicles)
+            rejected.append({"row": number, "cells": cells, "reason": "unparsed text", "leftover": leftover})
+            continue
+
+        for model, motorisation, fuel, start_date, end_date, refs in vehicles:
+            if model is not None and not clean_model_name(model):
+                model = None
+            if model is None:
+                brand, model = last_model.get('brand'), last_model.get('model')
+                if not model:
+                    continue
+            else:
+                brand, known = resolver.pick(model, recent_brands, seen_brands)
+                stats['brand_guessed'] += not known
+            if not brand:
+                continue
+            last_model.update(brand=brand, model=model)
+            brand = aliases.canonical_name(brand)
+
+            blocks = {}
+            for ref in refs:
+                blocks.setdefault(ref_family(ref), []).append(ref)
+            crowded = {family: family_refs for family, family_refs in blocks.items()
+                       if len(family_refs) > BATTERY_OPTIONS}
+            if crowded:
+                stats['too_many_refs'] += 1
+                rejected.append({"row": number, "cells": cells, "reason": "more refs than battery options",
+                                 "motorisation": motorisation, "refs": crowded})
+                continue
+            record = Motorisation(
+                motorisation, fuel, start_date, end_date,
+                batteryAGM=BatteryOptions(*blocks['batteryAGM']) if 'batteryAGM' in blocks else EMPTY_BATTERY,
+                batteryEFB=BatteryOptions(*blocks['batteryEFB']) if 'batteryEFB' in blocks else EMPTY_BATTERY,
+                batteryClassic=BatteryOptions(*blocks['batteryClassic']) if 'batteryClassic' in blocks else EMPTY_BATTERY,
+            )
+            cleaned_model = clean_model_name(model)
+            key = (brand, cleaned_model)
+            if (key, record.key()) in seen:
+                stats['duplicates'] += 1
+                continue
+            seen.add((key, record.key()))
+            valid = (validation.check('motorisation', record, f"sheet row {number}") if validation
+                     else VALIDATORS['motorisation'](record) is None)
+            if not valid:
+                stats['invalid'] += 1
+                rejected.append({"row": number, "cells": cells, "reason": "invalid motorisation",
+                                 "motorisation": record.to_json()})
+                continue
+            product = products.get(key)
+            if product is None:
+                product = products[key] = {
+                    "brand": brand,
+                    "brandSlug": aliases.slug(brand),
+                    "model": cleaned_model,
+                    "modelSlug": slugify(cleaned_model),
+                    "motorisations": [],
+                }
+                if validation:
+                    validation.check('battery-product-header', dict(product, motorisations=[record]),
+                                     f"sheet row {number}")
+            product["motorisations"].append(record)
+            stats['vehicles'] += 1
+    return products, stats, rejected
+
+
+def main(path=fulmen_workbook_file):
+    if not os.path.exists(path):
+        sys.exit(f"{path} not found")
+    with RunMetrics('fulmen-ingest') as metrics:
+        metrics.stage('load-sources')
+        resolver = BrandResolver([load_strapi_source(), load_exide_source(), load_valeo_source()])
+
+        print(f"Streaming {os.path.basename(path)}...")
+        start = time.perf_counter()
+        validation = ValidationReport('fulmen-battery-products')
+        metrics.stage('ingest')
+        products, stats, rejected = ingest(path, resolver, validation)
+        elapsed = time.perf_counter() - start
+        metrics.stage('write')
+
+        battery_products = list(products.values())
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(battery_products, f, indent=2, ensure_ascii=False, default=json_default)
+        with open(rejects_file, 'w', encoding='utf-8') as f:
+            json.dump(rejected, f, indent=2, ensure_ascii=False)
+
+        print(f"\nRows read: {stats['rows']} ({stats['headers']} headers, {stats['brands']} brand rows)")
+        print(f"Vehicles parsed: {stats['vehicles']} ({stats['duplicates']} duplicates dropped, "
+              f"{stats['brand_guessed']} with a guessed brand)")
+        print(f"Rejected rows: {stats['rejected']} ({stats['rejected_vehicles']} vehicles not kept), "
+              f"vehicles with more than {BATTERY_OPTIONS} refs in a family: {stats['too_many_refs']}, "
+              f"invalid vehicles: {stats['invalid']} "
+              f"(see {os.path.relpath(rejects_file, script_dir)})")
+        print(f"Saved {len(battery_products)} battery products to {output_file}")
+        validation.print_summary()
+        print(f"Validation report saved to {validation.write()}")
+        load_aliases().print_unresolved()
+        metrics.stage(None)
+        metrics.counts(stats)
+        metrics.count('rows_in', stats['rows'])
+        metrics.count('rows_out', stats['vehicles'])
+        metrics.count('duplicates_removed', stats['duplicates'])
+        metrics.count('products_out', len(battery_products))
+        metrics.count('invalid_records', sum(validation.invalid.values()))
+        metrics.count('unresolved_brands', len(load_aliases().unresolved))
+        print(f"Throughput: {stats['rows'] / elapsed:,.0f} rows/s in {elapsed:.2f}s, peak RSS {peak_rss_mb():.1f} MB")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
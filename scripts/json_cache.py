@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Parsed-input cache for the pipeline scripts.
+
+load_json(path) returns the same object as json.load, but keeps a marshal
+copy of the parsed data under scripts/.cache/json/. A cache entry is keyed
+by the absolute path and records the file size, mtime and a blake2b hash of
+the content:
+- size and mtime unchanged -> the marshal copy is used directly,
+- size or mtime changed but same hash (file touched / copied) -> reused and
+  its header refreshed,
+- anything else -> the JSON is parsed again and the entry rewritten.
+
+Run it directly to compare cold (json.load) and warm (cache hit) load times:
+    python3 json_cache.py --bench [file ...]
+"""
+import hashlib
+import json
+import marshal
+import os
+import struct
+import sys
+import tempfile
+import time
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+cache_dir = os.environ.get('PIPELINE_CACHE_DIR', os.path.join(script_dir, '.cache', 'json'))
+
+# Bump when the on-disk format changes so old entries are ignored
+CACHE_VERSION = 1
+
+# Inputs loaded by several scripts, used by --bench when no file is given
+DEFAULT_BENCH_FILES = [
+    os.path.join(script_dir, 'json_data', 'models-without-brand.json'),
+    os.path.join(script_dir, 'models-without-brand.json'),
+    os.path.join(script_dir, 'json_data', 'models.json'),
+    os.path.join(script_dir, 'liste_affectation', 'exide-vehicles-by-brand.json'),
+    os.path.join(script_dir, 'wipers', 'wipers_database.json'),
+    os.path.join(script_dir, 'wipers', 'wipers_database_janv2026.json'),
+]
+
+
+def file_digest(path):
+    """blake2b hex digest of a file's content"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_path_for(path):
+    key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f"{key}.marshal")
+
+
+def _read_entry(entry_path):
+    """Return (header, payload bytes) or (None, None) when there is no usable entry.
+
+    Layout: 4-byte header length, marshalled header, marshalled data. The
+    payload is read in one go and decoded with marshal.loads, which is much
+    faster than marshal.load on a file object.
+    """
+    try:
+        with open(entry_path, 'rb') as f:
+            (header_len,) = struct.unpack('<I', f.read(4))
+            header = marshal.loads(f.read(header_len))
+            if not isinstance(header, dict) or header.get('version') != CACHE_VERSION:
+                return None, None
+            return header, f.read()
+    except (OSError, EOFError, ValueError, TypeError, struct.error):
+        return None, None
+
+
+def _write_entry(entry_path, header, data=None, payload=None):
+    """Write header + payload atomically (temp file then rename)"""
+    os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix='.tmp')
+    try:
+        if payload is None:
+            payload = marshal.dumps(data)
+        header_bytes = marshal.dumps(header)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(struct.pack('<I', len(header_bytes)))
+            f.write(header_bytes)
+            f.write(payload)
+        os.replace(tmp_path, entry_path)
+    except (OSError, ValueError):
+        # Unmarshallable data or read-only cache dir: the cache is only an optimization
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def load_json(path, use_cache=True):
+    """json.load(path) through the marshal cache"""
+    if not use_cache or os.environ.get('PIPELINE_NO_CACHE'):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    abs_path = os.path.abspath(path)
+    st = os.stat(abs_path)
+    entry_path = cache_path_for(abs_path)
+    header, payload = _read_entry(entry_path)
+
+    if header is not None and header['path'] != abs_path:
+        header = None
+    if header is not None and header['size'] == st.st_size and header['mtime_ns'] == st.st_mtime_ns:
+        return marshal.loads(payload)
+
+    digest = file_digest(abs_path)
+    if header is not None and header['hash'] == digest:
+        header.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+        _write_entry(entry_path, header, payload=payload)
+        return marshal.loads(payload)
+
+    with open(abs_path, 'r', encoding='utf-8') as src:
+        data = json.load(src)
+    _write_entry(entry_path, {
+        'version': CACHE_VERSION,
+        'path': abs_path,
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'hash': digest,
+    }, data)
+    return data
+
+
+def clear_cache():
+    """Remove every cache entry; returns the number of files deleted"""
+    removed = 0
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            if name.endswith('.marshal'):
+                os.unlink(os.path.join(cache_dir, name))
+                removed += 1
+    return removed
+
+
+def _best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench(paths, repeat=5):
+    """Print cold (plain json.load) vs warm (cache hit) load times for each file"""
+    print(f"{'file':<45} {'size':>9} {'json.load':>10} {'cached':>9} {'speedup':>8}")
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        cold = _best_of(lambda: load_json(path, use_cache=False), repeat)
+        load_json(path)  # make sure the entry exists
+        warm = _best_of(lambda: load_json(path), repeat)
+        size_kb = os.path.getsize(path) / 1024
+        print(f"{os.path.relpath(path, script_dir):<45} {size_kb:>7.0f}KB "
+              f"{cold * 1000:>8.1f}ms {warm * 1000:>7.1f}ms {cold / warm:>7.1f}x")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args and args[0] == '--clear':
+        print(f"Removed {clear_cache()} cache entries from {cache_dir}")
+    elif args and args[0] == '--bench':
+        bench(args[1:] or DEFAULT_BENCH_FILES)
+    else:
+        print("Usage: python3 json_cache.py --bench [file ...] | --clear")
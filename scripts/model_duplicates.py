@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate model detector over the exported catalog (exported_data/).
+
+deduplicate-models-lib.js compares every model of a brand with every other
+one; that is fine for one brand but too slow to run over the whole catalog on
+each import. Here candidate pairs come from blocking instead:
+- block by brand (and vehicle type for the models exported without a brand),
+- inside a brand, an inverted index on normalized tokens: every pair sharing
+  a token, except in token blocks larger than MAX_TOKEN_BLOCK (like "COUPE")
+  where only the WINDOW next models in compact-key order are compared,
+- sorted neighborhood: models sorted on their compact key, and on the
+  reversed key, are compared with the next WINDOW models.
+Candidates are scored like calculateSimilarity in the JS library (1 - edit
+distance / longest compact name) with 1.0 for the same token set, and pairs
+at or above the threshold are merged into clusters (union-find).
+
+    python3 model_duplicates.py [--threshold 0.9]   # json_data/model-duplicate-clusters.json
+    python3 model_duplicates.py --gate              # exit 1 on pairs not in the previous report
+    python3 model_duplicates.py --compare           # recall against deduplication-reports/1-duplicate-detection.json
+"""
+import glob
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+
+from catalog_index import CatalogReader
+from json_cache import load_json
+from run_metrics import RunMetrics
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+exported_data_dir = os.path.join(script_dir, 'exported_data')
+clusters_file = os.path.join(script_dir, 'json_data', 'model-duplicate-clusters.json')
+detection_report_file = os.path.join(script_dir, 'deduplication-reports', '1-duplicate-detection.json')
+
+THRESHOLD = 0.90
+WINDOW = 8
+MAX_TOKEN_BLOCK = 40
+
+
+def fold(text):
+    """Upper-case, accent-free text"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).upper()
+
+
+class CatalogModel:
+    __slots__ = ('id', 'name', 'slug', 'brand', 'block', 'tokens', 'compact')
+
+    def __init__(self, model, brand_name, block):
+        self.id = model.get('id')
+        self.name = model.get('name') or ''
+        self.slug = model.get('slug') or ''
+        self.brand = brand_name
+        self.block = block
+        name = fold(self.name).strip()
+        brand = fold(brand_name)
+        # Same brand prefix stripping as normalizeModelName (JS)
+        for prefix in (brand + ' ', brand.replace(' ', '-') + '-'):
+            if brand and name.startswith(prefix):
+                name = name[len(prefix):]
+        self.tokens = tuple(re.findall(r'[A-Z0-9]+', name))
+        self.compact = ''.join(self.tokens)
+
+
+def load_catalog(directory=exported_data_dir):
+    """CatalogModel list of the brand files, plus the brandless exports blocked per vehicle type
+
+    Older no-brand batches also list models that have a brand since; those are skipped by id.
+    """
+    models = []
+    for data in CatalogReader(directory).iter_brands():
+        brand = data.get('brandInfo', {})
+        for model in data.get('models', []):
+            models.append(CatalogModel(model, brand.get('name', ''), brand.get('slug', '')))
+    seen = {model.id for model in models}
+    for path in sorted(glob.glob(os.path.join(directory, 'no-brand', '*.json'))):
+        data = load_json(path)
+        block = f"no-brand-{data.get('vehicleType', 'unknown')}"
+        for model in data.get('models', []):
+            if model.get('id') not in seen:
+                seen.add(model.get('id'))
+                models.append(CatalogModel(model, '', block))
+    return models
+
+
+def similarity(a, b):
+    """1 - Levenshtein(a, b) / longest length (calculateSimilarity in deduplicate-models-lib.js)"""
+    if a == b:
+        return 1.0
+    longest = max(len(a), len(b))
+    if not longest:
+        return 1.0
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return 1.0 - previous[-1] / longest
+
+
+def score(a, b):
+    if a.tokens and sorted(a.tokens) == sorted(b.tokens):
+        return 1.0
+    return similarity(a.compact, b.compact)
+
+
+def candidate_pairs(block_models):
+    """Index pairs (i < j) of one block: shared-token index + sorted neighborhood"""
+    pairs = set()
+    by_token = {}
+    for i, model in enumerate(block_models):
+        for token in set(model.tokens):
+            by_token.setdefault(token, []).append(i)
+    for members in by_token.values():
+        if len(members) > MAX_TOKEN_BLOCK:
+            # Oversized token block: sorted neighborhood inside it instead of all pairs
+            members = sorted(members, key=lambda i: block_models[i].compact)
+            for x, i in enumerate(members):
+                for j in members[x + 1:x + 1 + WINDOW]:
+                    pairs.add((min(i, j), max(i, j)))
+        else:
+            for x, i in enumerate(members):
+                for j in members[x + 1:]:
+                    pairs.add((i, j))
+    for key in (lambda i: block_models[i].compact, lambda i: block_models[i].compact[::-1]):
+        order = sorted(range(len(block_models)), key=key)
+        for x, i in enumerate(order):
+            for j in order[x + 1:x + 1 + WINDOW]:
+                pairs.add((min(i, j), max(i, j)))
+    return pairs
+
+
+def detect(models, threshold=THRESHOLD):
+    """Clusters of near-duplicate models; returns (clusters, stats)"""
+    blocks = {}
+    for model in models:
+        if model.compact:
+            blocks.setdefault(model.block, []).append(model)
+
+    parent = {}
+
+    def find(x):
+        while parent.get(x, x) != x:
+            parent[x] = parent.get(parent[x], parent[x])
+            x = parent[x]
+        return x
+
+    stats = {'models': len(models), 'blocks': len(blocks), 'candidates': 0, 'matches': 0}
+    edges = []
+    for block_models in blocks.values():
+        for i, j in candidate_pairs(block_models):
+            a, b = block_models[i], block_models[j]
+            stats['candidates'] += 1
+            # Edit distance is at least the length difference: skip hopeless pairs cheaply
+            longest = max(len(a.compact), len(b.compact))
+            if 1.0 - abs(len(a.compact) - len(b.compact)) / longest < threshold and \
+                    sorted(a.tokens) != sorted(b.tokens):
+                continue
+            value = score(a, b)
+            if value >= threshold:
+                edges.append((a, b, value))
+                parent[find(id(a))] = find(id(b))
+    stats['matches'] = len(edges)
+    stats['pairwise'] = sum(len(m) * (len(m) - 1) // 2 for m in blocks.values())
+
+    clusters = {}
+    for a, b, value in edges:
+        cluster = clusters.setdefault(find(id(a)), {'members': {}, 'pairs': []})
+        for model in (a, b):
+            cluster['members'][model.id] = model
+        cluster['pairs'].append((a.id, b.id, round(value, 3)))
+
+    result = []
+    for cluster in clusters.values():
+        members = sorted(cluster['members'].values(), key=lambda m: (len(m.name), m.id or 0))
+        scores = [value for _, _, value in cluster['pairs']]
+        result.append({
+            "block": members[0].block,
+            "brand": members[0].brand,
+            "keep": members[0].id,
+            "minScore": min(scores),
+            "maxScore": max(scores),
+            "models": [{"id": m.id, "name": m.name, "slug": m.slug} for m in members],
+            "pairs": [{"a": a, "b": b, "score": value} for a, b, value in cluster['pairs']],
+        })
+    result.sort(key=lambda c: (c['block'], c['models'][0]['name']))
+    stats['clusters'] = len(result)
+    stats['clusteredModels'] = sum(len(c['models']) for c in result)
+    return result, stats
+
+
+def pair_keys(clusters):
+    return {tuple(sorted((pair['a'], pair['b']))) for cluster in clusters for pair in cluster['pairs']}
+
+
+def run(threshold=THRESHOLD, save=True):
+    with RunMetrics('model-duplicates') as metrics:
+        metrics.stage('load')
+        start = time.perf_counter()
+        models = load_catalog()
+        loaded = time.perf_counter()
+        metrics.stage('detect')
+        clusters, stats = detect(models, threshold)
+        elapsed = time.perf_counter() - start
+        metrics.stage(None)
+        metrics.counts(stats)
+        metrics.count('rows_in', stats['models'])
+        metrics.count('rows_out', stats['clusters'])
+        print(f"Models: {stats['models']} in {stats['blocks']} blocks (loaded in {loaded - start:.2f}s)")
+        print(f"Candidate pairs: {stats['candidates']:,} instead of {stats['pairwise']:,} within brands "
+              f"({stats['matches']} above {threshold})")
+        print(f"Clusters: {stats['clusters']} ({stats['clusteredModels']} models) in {elapsed:.2f}s")
+        if save:
+            os.makedirs(os.path.dirname(clusters_file), exist_ok=True)
+            with open(clusters_file, 'w', encoding='utf-8') as f:
+                json.dump({"threshold": threshold, "stats": stats, "clusters": clusters}, f,
+                          indent=2, ensure_ascii=False)
+            print(f"Saved to {clusters_file}")
+        return clusters
+
+
+def gate(threshold=THRESHOLD):
+    """Fail when a pair appears that the previous report did not have"""
+    known = pair_keys(load_json(clusters_file, use_cache=False)['clusters']) if os.path.exists(clusters_file) else set()
+    clusters = run(threshold, save=False)
+    new = pair_keys(clusters) - known
+    if new:
+        names = {m['id']: m['name'] for cluster in clusters for m in cluster['models']}
+        for a, b in sorted(new)[:20]:
+            print(f"  new duplicate: {names.get(a)!r} ({a}) ~ {names.get(b)!r} ({b})")
+        print(f"{len(new)} new duplicate pairs (accept them with 'python3 model_duplicates.py')")
+        sys.exit(1)
+    print("No new duplicate pairs")
+
+
+def compare(threshold=THRESHOLD):
+    """Share of the JS detection groups found by the blocked detector"""
+    clusters = run(threshold, save=False)
+    found = pair_keys(clusters)
+    groups = load_json(detection_report_file).get('allDuplicateGroups', [])
+    pairs = covered = 0
+    for group in groups:
+        ids = [d['id'] for d in group['duplicates']]
+        for x, a in enumerate(ids):
+            for b in ids[x + 1:]:
+                pairs += 1
+                covered += tuple(sorted((a, b))) in found
+    print(f"JS report pairs found: {covered}/{pairs} ({covered / max(pairs, 1):.0%}); "
+          f"the JS groups are greedy, not transitive, and come from an older snapshot")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    threshold = float(args[args.index('--threshold') + 1]) if '--threshold' in args else THRESHOLD
+    if '--gate' in args:
+        gate(threshold)
+    elif '--compare' in args:
+        compare(threshold)
+    elif not args or '--threshold' in args:
+        run(threshold)
+    else:
+        print("Usage: python3 model_duplicates.py [--threshold 0.9] [--gate | --compare]")
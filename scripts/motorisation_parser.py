@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Structured engine attributes for motorisations.
+
+clean_motorisation_name() keeps a display name ("1.6 TDI") and drops the
+rest, so filtering by engine on the tablet meant LIKE scans over names.
+This parser turns a motorisation into typed fields:
+    displacementCc  1598           (from 'Capacity in ccm', else "1.6" / "1598 cc")
+    powerKw         77             (from 'Engine Power in kW', else "77 kW", else hp / 1.36)
+    powerHp         105            (from 'Engine Power in HP', else "105 ch" / "dCi 105")
+    engineCodes     ["CAYC"]       (from 'Engine Type' or parenthesized codes: "(FL0C)")
+    hybrid          True/False     (fuel or name: Hybrid, HEV, PHEV, MHEV, E-Tense...)
+    electric        True/False     (battery electric: fuel Electric, EV, e-tron...)
+
+The Exide transform calls parse_exide_vehicle() on every source vehicle
+(structured Exide columns first, the free-text type as fallback) and writes
+one row per distinct engine to json_data/exide-motorisation-engines.json,
+keyed like the battery products: brandSlug, modelSlug, motorisation (the
+cleaned name), fuel, startDate, endDate.
+
+The seed stage exports them to indexed columns:
+    python3 motorisation_parser.py seed [tablet-app.db]
+    python3 motorisation_parser.py parse "<motorisation>" [fuel]
+    python3 motorisation_parser.py --bench       # indexed lookup vs LIKE scan
+"""
+import functools
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from json_cache import load_json
+from run_metrics import RunMetrics
+from seed_db import open_seed, replace_table
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+engines_file = os.path.join(script_dir, 'json_data', 'exide-motorisation-engines.json')
+
+KW_PER_HP = 0.7355
+
+_LITRES = re.compile(r'(?<![\d.])([1-9]\.\d)(?![\d.])')
+_CC = re.compile(r'\b(\d{3,4})\s*(?:cc|ccm|cm3|cm³)\b', re.IGNORECASE)
+_KW = re.compile(r'\b(\d{2,3})\s*kw\b', re.IGNORECASE)
+_HP = re.compile(r'\b(\d{2,4})\s*(?:hp|bhp|ps|ch|cv)\b', re.IGNORECASE)
+# Power written after the engine family, as in "1.5 dCi 110" or "1.2 PureTech 130"
+_FAMILY_HP = re.compile(
+    r'\b(?:dci|hdi|bluehdi|e-hdi|tce|puretech|vti|thp|crdi|cdti|tdci|tdi|tsi|tfsi|jtd|jtdm|multijet|'
+    r'ecoblue|ecoboost|skyactiv-[dg]|d-4d)\s+(\d{2,3})(?![\w.])', re.IGNORECASE)
+_CODE_GROUP = re.compile(r'\(([^)]*)\)')
+# FL0C, K9K, 2NR-FXE; never a valve count (24V). Free text needs a digit to tell codes from words ("(AUTO)")
+_CODE = re.compile(r'^(?!\d+V$)(?=[A-Z0-9-]*\d)(?=[A-Z0-9-]*[A-Z])[A-Z0-9][A-Z0-9-]{2,9}$')
+# The Engine Type column holds codes only, so all-letter ones count too (CAYC, CZPB, DKZA)
+_TYPE_CODE = re.compile(r'^(?!\d+V$)(?=[A-Z0-9-]*[A-Z])[A-Z0-9][A-Z0-9-]{2,9}$')
+_HYBRID = re.compile(r'\b(?:hybrid|hybride|hev|phev|mhev|mild[- ]hybrid|plug-in|e-tense|e-hybrid)\b', re.IGNORECASE)
+_ELECTRIC = re.compile(r'\b(?:ev|bev|electric|[ée]lectrique|e-tron|kwh)\b', re.IGNORECASE)
+_COMBUSTION = re.compile(r'petrol|diesel|essence|gasoline|lpg|gpl|cng|gnv', re.IGNORECASE)
+
+
+class EngineAttributes:
+    __slots__ = ('displacementCc', 'powerKw', 'powerHp', 'engineCodes', 'hybrid', 'electric')
+
+    def __init__(self, displacementCc=None, powerKw=None, powerHp=None, engineCodes=(),
+                 hybrid=False, electric=False):
+        self.displacementCc = displacementCc
+        self.powerKw = powerKw
+        self.powerHp = powerHp
+        self.engineCodes = tuple(engineCodes)
+        self.hybrid = hybrid
+        self.electric = electric
+
+    def key(self):
+        return (self.displacementCc, self.powerKw, self.powerHp, self.engineCodes, self.hybrid, self.electric)
+
+    def to_json(self):
+        return {
+            "displacementCc": self.displacementCc,
+            "powerKw": self.powerKw,
+            "powerHp": self.powerHp,
+            "engineCodes": list(self.engineCodes),
+            "hybrid": self.hybrid,
+            "electric": self.electric,
+        }
+
+
+def _int(value):
+    """'1598', '1 598', '77.0' -> int; '' / junk -> None"""
+    if value is None:
+        return None
+    text = str(value).replace(' ', '').replace(',', '.')
+    try:
+        number = round(float(text))
+    except ValueError:
+        return None
+    return number or None
+
+
+def engine_codes(text):
+    """Engine codes found in parentheses: "1.2 (SB0A, SB0F)" -> ('SB0A', 'SB0F')"""
+    codes = []
+    for group in _CODE_GROUP.findall(text):
+        for token in re.split(r'[\s,/;]+', group.upper()):
+            if _CODE.match(token) and token not in codes:
+                codes.append(token)
+    return tuple(codes)
+
+
+def engine_type_codes(text):
+    """Engine codes of the structured Engine Type column: "CAYC" -> ('CAYC',), "CAYB, CAYC" -> both"""
+    codes = []
+    for token in re.split(r'[\s,/;]+', (text or '').upper()):
+        if _TYPE_CODE.match(token) and token not in codes:
+            codes.append(token)
+    return tuple(codes)
+
+
+def electrification(text, fuel=''):
+    """(hybrid, electric) from the fuel label and the motorisation name"""
+    hybrid = bool(_HYBRID.search(fuel) or _HYBRID.search(text)
+                  or _ELECTRIC.search(fuel) and _COMBUSTION.search(fuel))  # "Petrol/Electric"
+    electric = (not hybrid and not _COMBUSTION.search(fuel)
+                and bool(_ELECTRIC.search(fuel) or _ELECTRIC.search(text)))
+    return hybrid, electric
+
+
+@functools.lru_cache(maxsize=65536)
+def parse_motorisation(text, fuel=''):
+    """Engine attributes of a free-text motorisation (the same strings repeat across models)"""
+    text = text or ''
+    cc = _CC.search(text)
+    litres = _LITRES.search(text)
+    displacement = int(cc.group(1)) if cc else (round(float(litres.group(1)) * 1000) if litres else None)
+    kw = _KW.search(text)
+    hp = _HP.search(text) or _FAMILY_HP.search(text)
+    power_kw = int(kw.group(1)) if kw else None
+    power_hp = int(hp.group(1)) if hp else None
+    if power_kw is None and power_hp is not None:
+        power_kw = round(power_hp * KW_PER_HP)
+    elif power_hp is None and power_kw is not None:
+        power_hp = round(power_kw / KW_PER_HP)
+    hybrid, electric = electrification(text, fuel or '')
+    if electric:
+        displacement = None
+    return EngineAttributes(displacement, power_kw, power_hp, engine_codes(text), hybrid, electric)
+
+
+def parse_exide_vehicle(vehicle):
+    """Engine attributes of an exide-vehicles.json vehicle: structured columns, then its type string"""
+    fuel = ' '.join(filter(None, (vehicle.get('fuelType', ''), vehicle.get('mixturePreparation', ''))))
+    parsed = parse_motorisation(vehicle.get('type', '').strip(), fuel)
+    displacement = _int(vehicle.get('capacityInCcm'))
+    if displacement is None and _int(vehicle.get('capacityInLitre')):
+        displacement = round(float(str(vehicle['capacityInLitre']).replace(',', '.')) * 1000)
+    power_kw = _int(vehicle.get('enginePowerInKW'))
+    power_hp = _int(vehicle.get('enginePowerInHP'))
+    structured = engine_type_codes(vehicle.get('engineType'))
+    codes = structured + tuple(code for code in parsed.engineCodes if code not in structured)
+    if power_kw is None and power_hp is None:
+        power_kw, power_hp = parsed.powerKw, parsed.powerHp
+    elif power_kw is None:
+        power_kw = round(power_hp * KW_PER_HP)
+    elif power_hp is None:
+        power_hp = round(power_kw / KW_PER_HP)
+    return EngineAttributes(displacement or parsed.displacementCc, power_kw, power_hp, codes,
+                            parsed.hybrid, parsed.electric)
+
+
+# --- Seed export ----------------------------------------------------------------
+
+def load_engines():
+    return load_json(engines_file) if os.path.exists(engines_file) else []
+
+
+def engine_rows(engines):
+    for engine_id, row in enumerate(engines, start=1):
+        codes = row.get('engineCodes') or []
+        yield (engine_id, row['brandSlug'], row['modelSlug'], row['motorisation'], row.get('fuel'),
+               row.get('startDate'), row.get('endDate'), row.get('displacementCc'), row.get('powerKw'),
+               row.get('powerHp'), codes[0] if codes else None, int(row.get('hybrid', False)),
+               int(row.get('electric', False)))
+
+
+def export_to_seed(engines, db_path=None):
+    conn = open_seed(db_path)
+    with conn:
+        count = replace_table(
+            conn, 'motorisation_engines',
+            """CREATE TABLE motorisation_engines (
+              id INTEGER PRIMARY KEY,
+              brand_slug TEXT NOT NULL,
+              model_slug TEXT NOT NULL,
+              motorisation TEXT NOT NULL,
+              fuel TEXT,
+              start_date TEXT,
+              end_date TEXT,
+              displacement_cc INTEGER,
+              power_kw INTEGER,
+              power_hp INTEGER,
+              engine_code TEXT,
+              is_hybrid INTEGER NOT NULL DEFAULT 0,
+              is_electric INTEGER NOT NULL DEFAULT 0
+            )""",
+            engine_rows(engines),
+            indexes=[
+                "CREATE INDEX idx_motorisation_engines_model ON motorisation_engines"
+                "(brand_slug, model_slug, motorisation)",
+                "CREATE INDEX idx_motorisation_engines_power ON motorisation_engines(power_kw, displacement_cc)",
+                "CREATE INDEX idx_motorisation_engines_displacement ON motorisation_engines(displacement_cc, power_kw)",
+                "CREATE INDEX idx_motorisation_engines_electrified ON motorisation_engines"
+                "(brand_slug, model_slug) WHERE is_hybrid = 1 OR is_electric = 1",
+            ],
+        )
+        # Every code of an engine, for "which vehicles use engine K9K" in one index range
+        codes = replace_table(
+            conn, 'motorisation_engine_codes',
+            """CREATE TABLE motorisation_engine_codes (
+              engine_code TEXT NOT NULL,
+              engine_id INTEGER NOT NULL REFERENCES motorisation_engines(id),
+              PRIMARY KEY (engine_code, engine_id)
+            ) WITHOUT ROWID""",
+            ((code, engine_id) for engine_id, row in enumerate(engines, start=1)
+             for code in dict.fromkeys(row.get('engineCodes') or [])),
+        )
+    conn.close()
+    print(f"Exported {count} motorisation engines ({codes} engine codes) to the seed")
+    print("Tablet queries: SELECT ... FROM motorisation_engines WHERE power_kw BETWEEN ? AND ? [AND displacement_cc = ?]")
+    print("                SELECT engine_id FROM motorisation_engine_codes WHERE engine_code = ?")
+    return count, codes
+
+
+def bench(db_path='/tmp/motorisation-engines-bench.db', count=200000):
+    """Engine filter on the seed: indexed columns vs LIKE over motorisation names"""
+    from catalog_records import _synthetic_exide_vehicles
+    families = ['TDI', 'dCi', 'BlueHDi', 'TCe', 'PureTech', 'TSI', 'CDTI', 'Hybrid', 'EV']
+    vehicles = []
+    for i, vehicle in enumerate(_synthetic_exide_vehicles(count)):
+        family = families[i % len(families)]
+        power = 60 + (i * 7) % 150
+        vehicles.append(dict(vehicle, type=f"{1 + i % 20 / 10:.1f} {family} {power} ({power} kW) (K{i % 97:02d}X)"))
+    start = time.perf_counter()
+    parse_motorisation.cache_clear()
+    engines = []
+    for i, vehicle in enumerate(vehicles):
+        engine = parse_motorisation(vehicle['type'], vehicle['fuelType'])
+        engines.append(dict({"brandSlug": f"brand-{i % 50}", "modelSlug": f"model-{i % 900}",
+                             "motorisation": vehicle['type'].split(' (')[0], "fuel": vehicle['fuelType'],
+                             "startDate": vehicle['startDate'], "endDate": vehicle['endDate']},
+                            **engine.to_json()))
+    parse_elapsed = time.perf_counter() - start
+    print(f"Parsed {count:,} motorisations in {parse_elapsed:.2f}s "
+          f"({count / parse_elapsed:,.0f}/s, cache {parse_motorisation.cache_info().hits:,} hits)")
+
+    if os.path.exists(db_path):
+        os.unlink(db_path)
+    sqlite3.connect(db_path).close()
+    export_to_seed(engines, db_path)
+    conn = sqlite3.connect(db_path)
+    queries = {
+        'LIKE scan (before)': ("SELECT COUNT(*) FROM motorisation_engines WHERE motorisation LIKE ? "
+                               "AND motorisation LIKE ?", ('1.6 %', '% 102')),
+        'indexed power + cc': ("SELECT COUNT(*) FROM motorisation_engines WHERE power_kw = ? "
+                               "AND displacement_cc = ?", (102, 1600)),
+        'indexed engine code': ("SELECT COUNT(*) FROM motorisation_engine_codes WHERE engine_code = ?", ('K42X',)),
+    }
+    for label, (sql, params) in queries.items():
+        plan = ' / '.join(row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+        start = time.perf_counter()
+        for _ in range(200):
+            rows = conn.execute(sql, params).fetchone()[0]
+        elapsed = (time.perf_counter() - start) / 200
+        print(f"{label:<22} {elapsed * 1e6:9.1f} µs  {rows:>6} rows  {plan}")
+    conn.close()
+    os.unlink(db_path)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['seed']:
+        with RunMetrics('motorisation-engines-seed') as metrics:
+            metrics.stage('load')
+            engines = load_engines()
+            metrics.stage('seed')
+            count, codes = export_to_seed(engines, args[1] if len(args) > 1 else None)
+            metrics.count('rows_in', len(engines))
+            metrics.count('rows_out', count)
+            metrics.count('engine_codes', codes)
+    elif args[:1] == ['parse'] and len(args) > 1:
+        print(json.dumps(parse_motorisation(args[1], args[2] if len(args) > 2 else '').to_json(),
+                         ensure_ascii=False))
+    elif args[:1] == ['--bench']:
+        bench(count=int(args[1]) if len(args) > 1 else 200000)
+    else:
+        print("Usage: python3 motorisation_parser.py seed [tablet-app.db] | parse <motorisation> [fuel] | --bench [count]")
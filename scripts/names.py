@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Brand/model name cleaning and Strapi-compatible slugs.
+
+Shared by brand_reconciliation.py and brand_aliases.py (and every script
+that builds slugs), so that neither has to import the other for them.
+"""
+import re
+import unicodedata
+
+
+# Helper function to clean brand names
+def clean_brand_name(name):
+    if not isinstance(name, str):
+        return None
+    # Remove BOM and other invisible characters
+    name = name.strip()
+    name = name.replace('\ufeff', '').strip()
+    # Filter out invalid entries
+    if not name or name.lower() in ['marque', 'brand', '']:
+        return None
+    return name if name else None
+
+
+# Helper function to clean model names
+def clean_model_name(name):
+    if not isinstance(name, str):
+        return None
+    name = name.strip()
+    if not name:
+        return None
+    return name
+
+
+# Slugify function to match Strapi's slug generation
+def slugify(text):
+    """Convert text to slug format matching Strapi's slugify"""
+    if not isinstance(text, str):
+        return ""
+    text = unicodedata.normalize('NFKD', text)
+    text = text.lower()
+    text = text.replace('&', ' and ')
+    text = re.sub(r'[^a-z0-9]+', '-', text)
+    return text.strip('-')
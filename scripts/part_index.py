@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Reverse part-number index: battery / wiper reference -> compatible vehicles.
+
+Build stage:
+    python3 part_index.py build
+reads json_data/exide-battery-products.json, json_data/fulmen-battery-products.json
+(ingest_fulmen.py) and the Valeo wipers database,
+and writes json_data/part-index.json:
+    {
+      "battery": {"<REF>": [{"brand", "model", "motorisation", "fuel",
+                             "startDate", "endDate", "batteryType", "option"}, ...]},
+      "wipers":  {"<REF>": [{"brand", "model", "vehicleId", "direction",
+                             "start", "end", "category", "position"}, ...]}
+    }
+Refs are normalized (upper case, single spaces) so lookups are one dict access.
+
+Queries:
+    python3 part_index.py battery EB740
+    python3 part_index.py wiper "VS 32"
+    python3 part_index.py --bench
+"""
+import json
+import os
+import re
+import sys
+import time
+
+from battery_encoding import load_battery_products
+from json_cache import load_json
+from run_metrics import RunMetrics
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+battery_products_files = [
+    os.path.join(script_dir, 'json_data', 'exide-battery-products.json'),
+    os.path.join(script_dir, 'json_data', 'fulmen-battery-products.json'),
+]
+wipers_database_file = os.path.join(script_dir, 'wipers', 'wipers_database_janv2026.json')
+index_file = os.path.join(script_dir, 'json_data', 'part-index.json')
+
+BATTERY_KEYS = {
+    'batteryAGM': 'AGM',
+    'batteryEFB': 'EFB',
+    'batteryPremium': 'Premium',
+    'batteryExcell': 'Excell',
+    'batteryClassic': 'Classic',
+}
+OPTION_KEYS = ('option1', 'option2', 'option3')
+
+
+def normalize_ref(ref):
+    """Canonical form of a part reference used as index key"""
+    if not isinstance(ref, str):
+        return ""
+    return re.sub(r'\s+', ' ', ref).strip().upper()
+
+
+def iter_battery_refs(battery_products):
+    """Yield (ref, vehicle) for every optionN of every battery block of every motorisation"""
+    for product in battery_products:
+        for motorisation in product.get('motorisations', []):
+            for key, battery_type in BATTERY_KEYS.items():
+                block = motorisation.get(key) or {}
+                for option in OPTION_KEYS:
+                    ref = normalize_ref(block.get(option))
+                    if not ref:
+                        continue
+                    yield ref, {
+                        "brand": product.get('brand'),
+                        "model": product.get('model'),
+                        "motorisation": motorisation.get('motorisation'),
+                        "fuel": motorisation.get('fuel'),
+                        "startDate": motorisation.get('startDate'),
+                        "endDate": motorisation.get('endDate'),
+                        "batteryType": battery_type,
+                        "option": option,
+                    }
+
+
+def iter_wiper_refs(wipers_database):
+    """Yield (ref, vehicle) for every wiper ref of every Valeo entry"""
+    for brand, entries in wipers_database.get('brands', {}).items():
+        for entry in entries:
+            years = entry.get('productionYears') or {}
+            wipers = entry.get('wipers') or {}
+            slots = []
+            for category in ('multiconnexion', 'standard'):
+                for position, ref in (wipers.get(category) or {}).items():
+                    slots.append((category, position, ref))
+            slots.append(('arriere', 'arriere', wipers.get('arriere')))
+
+            for category, position, ref in slots:
+                ref = normalize_ref(ref)
+                if not ref:
+                    continue
+                yield ref, {
+                    "brand": brand,
+                    "model": entry.get('model'),
+                    "vehicleId": entry.get('id'),
+                    "direction": entry.get('direction'),
+                    "start": years.get('start'),
+                    "end": years.get('end'),
+                    "category": category,
+                    "position": position,
+                }
+
+
+def build_index(battery_products, wipers_database):
+    index = {"battery": {}, "wipers": {}}
+    for ref, vehicle in iter_battery_refs(battery_products):
+        index["battery"].setdefault(ref, []).append(vehicle)
+    for ref, vehicle in iter_wiper_refs(wipers_database):
+        index["wipers"].setdefault(ref, []).append(vehicle)
+    return index
+
+
+def load_sources():
+    battery_products = []
+    for path in battery_products_files:
+        if os.path.exists(path):
+            print(f"Reading {os.path.basename(path)}...")
+            battery_products.extend(load_battery_products(path))
+    wipers_database = {}
+    if os.path.exists(wipers_database_file):
+        print(f"Reading {os.path.basename(wipers_database_file)}...")
+        wipers_database = load_json(wipers_database_file)
+    return battery_products, wipers_database
+
+
+def build():
+    with RunMetrics('part-index') as metrics:
+        metrics.stage('load')
+        battery_products, wipers_database = load_sources()
+        metrics.stage('index')
+        index = build_index(battery_products, wipers_database)
+        index["meta"] = {
+            "batteryRefs": len(index["battery"]),
+            "wiperRefs": len(index["wipers"]),
+            "sources": [os.path.basename(p) for p in battery_products_files + [wipers_database_file]
+                        if os.path.exists(p)],
+        }
+        metrics.stage('write')
+        os.makedirs(os.path.dirname(index_file), exist_ok=True)
+        with open(index_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        metrics.stage(None)
+        metrics.count('rows_in', len(battery_products)
+                      + sum(len(v) for v in wipers_database.get('brands', {}).values()))
+        metrics.count('battery_refs', index['meta']['batteryRefs'])
+        metrics.count('wiper_refs', index['meta']['wiperRefs'])
+        metrics.count('rows_out', index['meta']['batteryRefs'] + index['meta']['wiperRefs'])
+        print(f"Saved {index['meta']['batteryRefs']} battery refs and "
+              f"{index['meta']['wiperRefs']} wiper refs to {index_file}")
+        return index
+
+
+_index = None
+
+
+def load_index():
+    """Load the persisted index once per process (through the parsed-input cache)"""
+    global _index
+    if _index is None:
+        if not os.path.exists(index_file):
+            raise FileNotFoundError(f"{index_file} not found, run 'python3 part_index.py build' first")
+        _index = load_json(index_file)
+    return _index
+
+
+def vehicles_for_battery(ref):
+    """Vehicles (brand, model, motorisation, dates) an Exide battery ref fits"""
+    return load_index()["battery"].get(normalize_ref(ref), [])
+
+
+def vehicles_for_wiper(ref):
+    """Vehicles (brand, model, Valeo id, production years) a wiper ref fits"""
+    return load_index()["wipers"].get(normalize_ref(ref), [])
+
+
+def bench(repeat=200):
+    """Compare the old full scan with the index lookup for a sample of refs"""
+    battery_products, wipers_database = load_sources()
+    index = build_index(battery_products, wipers_database)
+
+    for kind, refs, scan in (
+        ("battery", list(index["battery"])[:repeat],
+         lambda r: [v for ref, v in iter_battery_refs(battery_products) if ref == r]),
+        ("wipers", list(index["wipers"])[:repeat],
+         lambda r: [v for ref, v in iter_wiper_refs(wipers_database) if ref == r]),
+    ):
+        if not refs:
+            print(f"{kind}: no data")
+            continue
+        sample = refs[:20]
+        start = time.perf_counter()
+        for ref in sample:
+            scan(ref)
+        scan_ms = (time.perf_counter() - start) / len(sample) * 1000
+
+        start = time.perf_counter()
+        for ref in refs:
+            index[kind].get(normalize_ref(ref), [])
+        lookup_us = (time.perf_counter() - start) / len(refs) * 1e6
+
+        print(f"{kind:<8} {len(index[kind]):>6} refs   scan {scan_ms:8.2f} ms/query   "
+              f"index {lookup_us:6.2f} µs/query")
+
+
+def print_vehicles(vehicles):
+    if not vehicles:
+        print("No compatible vehicle found")
+        return
+    for v in vehicles:
+        print("  " + " | ".join(str(value) for value in v.values() if value not in (None, "")))
+    print(f"{len(vehicles)} compatible vehicle(s)")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['build']:
+        build()
+    elif args[:1] == ['--bench']:
+        bench()
+    elif len(args) == 2 and args[0] == 'battery':
+        print_vehicles(vehicles_for_battery(args[1]))
+    elif len(args) == 2 and args[0] == 'wiper':
+        print_vehicles(vehicles_for_wiper(args[1]))
+    else:
+        print("Usage: python3 part_index.py build | battery <REF> | wiper <REF> | --bench")
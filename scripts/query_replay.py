@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Query replay and EXPLAIN QUERY PLAN harness for tablet-app.db builds.
+
+Replays a workload of tablet queries against a seed build (opened read-only,
+nothing is written) and reports, per query, latency percentiles over all
+executions and the query plan, flagging full table scans, temp B-trees
+(ORDER BY / GROUP BY / DISTINCT sorted at query time) and automatic
+indexes (an index SQLite had to build for the query).
+
+    python3 query_replay.py run [tablet-app.db] [--workload FILE] [--repeat N] [--json report.json]
+    python3 query_replay.py compare <a.db> <b.db> [--workload FILE] [--repeat N]
+    python3 query_replay.py plans [tablet-app.db] [--workload FILE]
+
+Workloads:
+- declared (default: WORKLOAD below, the tablet's screens over the Strapi
+  tables and the derived seed tables), or a JSON file with the same shape:
+      [{"name": "models_by_brand",
+        "sql": "SELECT id, name FROM models WHERE brand_id = ? ORDER BY name",
+        "params": [[1], [3]]                         # fixed parameter sets, or
+        "sample": "SELECT id FROM brands"}]          # drawn from the build under test
+- recorded: an NDJSON file (.ndjson / .jsonl) with one executed statement
+  per line, {"sql": "...", "params": [...]}; identical SQL texts are grouped
+  into one query with all their parameter sets.
+A query whose tables do not exist in a build is reported as missing there.
+
+Percentiles are nearest-rank over `--repeat` executions per query (default
+200), cycling through up to 50 parameter sets, after one warm-up run.
+"""
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from seed_db import SEED_DB_PATH
+
+MAX_PARAM_SETS = 50
+
+# The tablet's screens: Strapi tables first, then the Python seed stages
+WORKLOAD = [
+    {"name": "categories", "sql": "SELECT * FROM categories ORDER BY id"},
+    {"name": "db_version", "sql": "SELECT version FROM db_versions ORDER BY id DESC LIMIT 1"},
+    {"name": "brands_list", "sql": "SELECT id, name, slug, logo_url FROM brands ORDER BY name"},
+    {"name": "models_by_brand", "sql": "SELECT id, name, slug FROM models WHERE brand_id = ? ORDER BY name",
+     "sample": "SELECT id FROM brands"},
+    {"name": "model_by_slug", "sql": "SELECT * FROM models WHERE slug = ?", "sample": "SELECT slug FROM models"},
+    {"name": "battery_brands", "sql": "SELECT id, name, slug, logo_url FROM battery_brands ORDER BY name"},
+    {"name": "battery_models_by_brand",
+     "sql": "SELECT id, name, slug FROM battery_models WHERE battery_brand_id = ? ORDER BY name",
+     "sample": "SELECT id FROM battery_brands"},
+    {"name": "battery_product_by_slug", "sql": "SELECT * FROM battery_products WHERE slug = ?",
+     "sample": "SELECT slug FROM battery_products"},
+    {"name": "battery_products_by_model",
+     "sql": "SELECT p.* FROM battery_products p JOIN battery_models m ON m.id = p.battery_model_id "
+            "WHERE m.slug = ? ORDER BY p.name",
+     "sample": "SELECT slug FROM battery_models"},
+    {"name": "lights_search", "sql": "SELECT id, name, slug FROM lights_products WHERE name LIKE ? ORDER BY name",
+     "sample": "SELECT substr(name, 1, instr(name || ' ', ' ') - 1) || '%' FROM lights_products"},
+    {"name": "lights_positions", "sql": "SELECT id, name, slug FROM lights_positions ORDER BY name"},
+    {"name": "light_data_by_product",
+     "sql": "SELECT * FROM light_data WHERE lights_product_id = ?", "sample": "SELECT id FROM lights_products"},
+    {"name": "engines_by_model",
+     "sql": "SELECT * FROM motorisation_engines WHERE brand_slug = ? AND model_slug = ? ORDER BY motorisation",
+     "sample": "SELECT brand_slug, model_slug FROM motorisation_engines"},
+    {"name": "engines_by_power",
+     "sql": "SELECT * FROM motorisation_engines WHERE power_kw BETWEEN ? AND ?",
+     "sample": "SELECT power_kw - 5, power_kw + 5 FROM motorisation_engines WHERE power_kw IS NOT NULL"},
+    {"name": "engines_by_code",
+     "sql": "SELECT e.* FROM motorisation_engine_codes c JOIN motorisation_engines e ON e.id = c.engine_id "
+            "WHERE c.engine_code = ?",
+     "sample": "SELECT engine_code FROM motorisation_engine_codes"},
+    {"name": "production_intervals",
+     "sql": "SELECT * FROM production_intervals WHERE brand_slug = ? AND model_slug = ?",
+     "sample": "SELECT brand_slug, model_slug FROM production_intervals"},
+    {"name": "wipers_by_model",
+     "sql": "SELECT v.*, s.wipers_positions FROM wiper_vehicles v JOIN wiper_sets s ON s.id = v.wiper_set_id "
+            "WHERE v.brand_slug = ? AND v.model_slug = ?",
+     "sample": "SELECT brand_slug, model_slug FROM wiper_vehicles"},
+    {"name": "wipers_shared_set",
+     "sql": "SELECT * FROM wiper_vehicles WHERE wiper_set_id = "
+            "(SELECT wiper_set_id FROM wiper_vehicles WHERE valeo_id = ?)",
+     "sample": "SELECT valeo_id FROM wiper_vehicles"},
+] + [query for category in ('battery', 'lights', 'wipers', 'filters') for query in [
+    {"name": f"sel_{category}_brands", "sql": f"SELECT * FROM sel_{category}_brands"},
+    {"name": f"sel_{category}_models", "sql": f"SELECT * FROM sel_{category}_models WHERE brand_slug = ?",
+     "sample": f"SELECT brand_slug FROM sel_{category}_brands"},
+    {"name": f"sel_{category}_variants",
+     "sql": f"SELECT * FROM sel_{category}_variants WHERE brand_slug = ? AND model_slug = ?",
+     "sample": f"SELECT brand_slug, model_slug FROM sel_{category}_models"},
+    {"name": f"sel_{category}_products", "sql": f"SELECT * FROM sel_{category}_products WHERE variant_id = ?",
+     "sample": f"SELECT variant_id FROM sel_{category}_variants"},
+]]
+
+
+def load_workload(path=None):
+    """Declared queries of a JSON file, recorded statements of an NDJSON file, WORKLOAD by default"""
+    if path is None:
+        return WORKLOAD
+    if path.endswith(('.ndjson', '.jsonl')):
+        grouped = {}
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    statement = json.loads(line)
+                    grouped.setdefault(' '.join(statement['sql'].split()), []).append(statement.get('params') or [])
+        return [{"name": f"recorded_{i:03d}", "sql": sql, "params": params}
+                for i, (sql, params) in enumerate(grouped.items(), 1)]
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def open_build(path):
+    if not os.path.exists(path):
+        sys.exit(f"{path} not found")
+    return sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+
+
+def param_sets(conn, query):
+    if 'params' in query:
+        return [list(params) for params in query['params'][:MAX_PARAM_SETS]] or [[]]
+    if 'sample' in query:
+        # Evenly spread over the candidates so that large and small groups are both replayed
+        rows = conn.execute(f"SELECT DISTINCT * FROM ({query['sample']})").fetchall()
+        step = max(1, len(rows) // MAX_PARAM_SETS)
+        return [list(row) for row in rows[::step][:MAX_PARAM_SETS]]
+    return [[]]
+
+
+def plan_flags(plan):
+    """Warnings of an EXPLAIN QUERY PLAN detail list"""
+    flags = []
+    for detail in plan:
+        if detail.startswith('SCAN ') and not detail.startswith('SCAN CONSTANT'):
+            flags.append('index scan' if 'INDEX' in detail else 'full scan')
+        if 'TEMP B-TREE' in detail:
+            flags.append('temp b-tree')
+        if 'AUTOMATIC' in detail:
+            flags.append('automatic index')
+    return sorted(set(flags))
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def replay_query(conn, query, repeat):
+    """Result dict: latency percentiles (ms), rows per execution, plan and its flags"""
+    try:
+        sets = param_sets(conn, query)
+        plan = [row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + query['sql'], sets[0] if sets else [])]
+    except sqlite3.OperationalError as e:
+        return {"name": query['name'], "error": str(e)}
+    if not sets:
+        return {"name": query['name'], "error": "no parameters sampled (empty table)"}
+    conn.execute(query['sql'], sets[0]).fetchall()  # warm-up
+    timings, rows = [], 0
+    for i in range(repeat):
+        params = sets[i % len(sets)]
+        start = time.perf_counter()
+        rows += len(conn.execute(query['sql'], params).fetchall())
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {"name": query['name'], "executions": repeat, "paramSets": len(sets), "rowsAvg": rows / repeat,
+            "p50": percentile(timings, 50), "p90": percentile(timings, 90), "p99": percentile(timings, 99),
+            "max": timings[-1], "plan": plan, "flags": plan_flags(plan)}
+
+
+def replay(path, workload, repeat=200):
+    conn = open_build(path)
+    start = time.perf_counter()
+    results = [replay_query(conn, query, repeat) for query in workload]
+    conn.close()
+    return {"database": os.path.abspath(path), "sizeBytes": os.path.getsize(path), "repeat": repeat,
+            "elapsedSeconds": round(time.perf_counter() - start, 3), "queries": results}
+
+
+def print_report(report):
+    print(f"{report['database']} ({report['sizeBytes'] / 1024:.0f} KB), {report['repeat']} executions per query")
+    print(f"{'query':<28} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'rows':>7}  flags")
+    for result in report['queries']:
+        if 'error' in result:
+            print(f"{result['name']:<28} {'-':>8} {'-':>8} {'-':>8} {'-':>8} {'-':>7}  missing: {result['error']}")
+            continue
+        print(f"{result['name']:<28} {result['p50']:8.3f} {result['p90']:8.3f} {result['p99']:8.3f} "
+              f"{result['max']:8.3f} {result['rowsAvg']:7.1f}  {', '.join(result['flags'])}")
+    flagged = [r for r in report['queries'] if r.get('flags')]
+    missing = sum(1 for r in report['queries'] if 'error' in r)
+    print(f"{len(report['queries'])} queries, {len(flagged)} flagged, {missing} missing in this build")
+
+
+def print_plans(report):
+    for result in report['queries']:
+        if 'error' in result:
+            continue
+        print(f"{result['name']}" + (f"  [{', '.join(result['flags'])}]" if result['flags'] else ''))
+        for detail in result['plan']:
+            print(f"    {detail}")
+
+
+def print_comparison(a, b):
+    print(f"A: {a['database']} ({a['sizeBytes'] / 1024:.0f} KB)")
+    print(f"B: {b['database']} ({b['sizeBytes'] / 1024:.0f} KB)")
+    print(f"{'query':<28} {'A p50':>8} {'B p50':>8} {'A p90':>8} {'B p90':>8} {'B/A p90':>8}  plan changes")
+    results_b = {result['name']: result for result in b['queries']}
+    for result_a in a['queries']:
+        result_b = results_b.get(result_a['name'], {"error": "not in workload"})
+        if 'error' in result_a or 'error' in result_b:
+            state = ('missing in A' if 'error' in result_a else '') + \
+                    (' missing in B' if 'error' in result_b else '')
+            print(f"{result_a['name']:<28} {'':>44}  {state.strip()}")
+            continue
+        ratio = result_b['p90'] / result_a['p90'] if result_a['p90'] else float('inf')
+        changes = []
+        for flag in sorted(set(result_a['flags']) | set(result_b['flags'])):
+            if flag not in result_b['flags']:
+                changes.append(f"-{flag}")
+            elif flag not in result_a['flags']:
+                changes.append(f"+{flag}")
+        if not changes and result_a['plan'] != result_b['plan']:
+            changes.append('plan differs')
+        print(f"{result_a['name']:<28} {result_a['p50']:8.3f} {result_b['p50']:8.3f} {result_a['p90']:8.3f} "
+              f"{result_b['p90']:8.3f} {ratio:7.2f}x  {' '.join(changes)}")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    options = {'--workload': None, '--repeat': '200', '--json': None}
+    for option in options:
+        if option in args:
+            i = args.index(option)
+            options[option] = args[i + 1] if i + 1 < len(args) else None
+            args = args[:i] + args[i + 2:]
+    workload = load_workload(options['--workload'])
+    repeat = int(options['--repeat'])
+    if args[:1] == ['run']:
+        report = replay(args[1] if len(args) > 1 else SEED_DB_PATH, workload, repeat)
+        print_report(report)
+        if options['--json']:
+            with open(options['--json'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+    elif args[:1] == ['plans']:
+        print_plans(replay(args[1] if len(args) > 1 else SEED_DB_PATH, workload, repeat=1))
+    elif args[:1] == ['compare'] and len(args) == 3:
+        print_comparison(replay(args[1], workload, repeat), replay(args[2], workload, repeat))
+    else:
+        print("Usage: python3 query_replay.py run [tablet-app.db] [--workload FILE] [--repeat N] [--json FILE]\n"
+              "       python3 query_replay.py compare <a.db> <b.db> [--workload FILE] [--repeat N]\n"
+              "       python3 query_replay.py plans [tablet-app.db] [--workload FILE]")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Structured run metrics for the pipeline scripts (cron telemetry).
+
+A script opens one RunMetrics around its run, marks its stages and sets its
+counters:
+
+    with RunMetrics('exide-transform') as metrics:
+        metrics.stage('read')              # ends the previous stage, starts this one
+        ...
+        metrics.count('rows_in', len(vehicles))
+        metrics.stage('merge')
+        ...
+        metrics.count('duplicates_removed', before - after)
+
+When the block is left (normally, on an exception, through sys.exit or
+raise SystemExit) the run is written once, status "failed" for an exception
+or a non-zero exit status:
+- appended as one JSON line to metrics/runs.jsonl,
+- as a node-exporter textfile metrics/<script>.prom (atomic replace), also
+  copied to $NODE_EXPORTER_TEXTFILE_DIR when set, so the textfile collector
+  can alert on throughput (rows_out / duration) and on anomalies (counters).
+
+The metrics directory defaults to scripts/metrics/ and can be moved with
+PIPELINE_METRICS_DIR.
+
+    python3 run_metrics.py [script]      # last runs, one line each
+"""
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+from catalog_records import peak_rss_mb
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+metrics_dir = os.environ.get('PIPELINE_METRICS_DIR', os.path.join(script_dir, 'metrics'))
+runs_file = os.path.join(metrics_dir, 'runs.jsonl')
+
+PREFIX = 'catalog_pipeline'
+
+
+class RunMetrics:
+    """Stage durations and counters of one script run, written at exit"""
+
+    def __init__(self, script):
+        self.script = script
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.status = 'ok'
+        self.written = False
+        self._stage = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # sys.exit("... not found") raises SystemExit: only a non-zero status fails the run
+        if exc_type is SystemExit:
+            if exc.code not in (None, 0):
+                self.status = 'failed'
+        elif exc_type is not None:
+            self.status = 'failed'
+        self.write()
+        return False
+
+    def stage(self, name):
+        """Start stage `name`, ending the current one (lap timer for flat scripts)"""
+        now = time.perf_counter()
+        if self._stage:
+            stage, started = self._stage
+            self.stages[stage] = self.stages.get(stage, 0.0) + now - started
+        self._stage = (name, now) if name else None
+
+    def count(self, name, value):
+        self.counters[name] = value
+
+    def add(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def counts(self, stats):
+        """Copy the numeric entries of a script's own stats dict"""
+        for name, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.counters[name] = value
+
+    def to_json(self):
+        self.stage(None)
+        return {
+            "script": self.script,
+            "startedAt": datetime.datetime.fromtimestamp(self.started, datetime.timezone.utc).isoformat(),
+            "status": self.status,
+            "durationSeconds": round(time.perf_counter() - self.start, 3),
+            "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            "counters": self.counters,
+            "peakRssMb": round(peak_rss_mb(), 1),
+        }
+
+    def textfile(self, run):
+        label = f'script="{self.script}"'
+        lines = [
+            f"# HELP {PREFIX}_last_run_timestamp_seconds Start time of the last run.",
+            f"# TYPE {PREFIX}_last_run_timestamp_seconds gauge",
+            f"{PREFIX}_last_run_timestamp_seconds{{{label}}} {self.started:.0f}",
+            f"# HELP {PREFIX}_success 1 when the last run exited normally.",
+            f"# TYPE {PREFIX}_success gauge",
+            f"{PREFIX}_success{{{label}}} {int(run['status'] == 'ok')}",
+            f"# HELP {PREFIX}_duration_seconds Wall time of the last run.",
+            f"# TYPE {PREFIX}_duration_seconds gauge",
+            f"{PREFIX}_duration_seconds{{{label}}} {run['durationSeconds']}",
+            f"# HELP {PREFIX}_peak_rss_bytes Peak resident memory of the last run.",
+            f"# TYPE {PREFIX}_peak_rss_bytes gauge",
+            f"{PREFIX}_peak_rss_bytes{{{label}}} {int(run['peakRssMb'] * 1024 * 1024)}",
+            f"# HELP {PREFIX}_stage_seconds Wall time per stage of the last run.",
+            f"# TYPE {PREFIX}_stage_seconds gauge",
+        ]
+        lines += [f'{PREFIX}_stage_seconds{{{label},stage="{stage}"}} {seconds}'
+                  for stage, seconds in run['stages'].items()]
+        lines += [f"# HELP {PREFIX}_count Counters of the last run (rows in/out, duplicates, unmapped...).",
+                  f"# TYPE {PREFIX}_count gauge"]
+        lines += [f'{PREFIX}_count{{{label},name="{name}"}} {value}'
+                  for name, value in run['counters'].items() if isinstance(value, (int, float))]
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        if self.written:
+            return
+        self.written = True
+        run = self.to_json()
+        os.makedirs(metrics_dir, exist_ok=True)
+        with open(runs_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(run, ensure_ascii=False) + '\n')
+        text = self.textfile(run)
+        for directory in filter(None, (metrics_dir, os.environ.get('NODE_EXPORTER_TEXTFILE_DIR'))):
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.chmod(tmp, 0o644)  # readable by the node-exporter user (mkstemp creates 0600 files)
+            os.replace(tmp, os.path.join(directory, f"{self.script}.prom"))
+
+
+def read_runs(script=None):
+    if not os.path.exists(runs_file):
+        return []
+    with open(runs_file, encoding='utf-8') as f:
+        runs = [json.loads(line) for line in f if line.strip()]
+    return [run for run in runs if script is None or run['script'] == script]
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    runs = read_runs(args[0] if args else None)
+    for run in runs[-20:]:
+        counters = ' '.join(f"{name}={value}" for name, value in run['counters'].items())
+        print(f"{run['startedAt'][:19]} {run['script']:<24} {run['status']:<6} "
+              f"{run['durationSeconds']:>7.2f}s {run['peakRssMb']:>7.1f} MB  {counters}")
+    if not runs:
+        print(f"No runs recorded in {runs_file}")
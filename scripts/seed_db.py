@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Helpers for the Python post-build stages of the tablet SQLite seed.
+
+generate-sqlite-seed.js builds android/app/src/main/assets/databases/tablet-app.db
+from Strapi; the Python stages then add derived tables to that file.
+"""
+import os
+import sqlite3
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+SEED_DB_PATH = os.path.join(script_dir, '..', 'android', 'app', 'src', 'main', 'assets', 'databases', 'tablet-app.db')
+
+
+def open_seed(path=None):
+    path = path or SEED_DB_PATH
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found, run 'npm run generate-seed' first")
+    return sqlite3.connect(path)
+
+
+def replace_table(conn, name, create_sql, rows, indexes=()):
+    """Drop and recreate `name`, bulk insert `rows` (tuples in column order) and create `indexes`"""
+    conn.execute(f"DROP TABLE IF EXISTS {name}")
+    conn.execute(create_sql)
+    rows = list(rows)
+    if rows:
+        placeholders = ', '.join('?' * len(rows[0]))
+        conn.executemany(f"INSERT INTO {name} VALUES ({placeholders})", rows)
+    for index_sql in indexes:
+        conn.execute(index_sql)
+    return len(rows)
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Post-build size optimizer for the tablet SQLite seed.
+
+The seed is copied to the tablets on first launch, so its size is copy
+time. This last stage of the seed build rewrites a copy of it:
+
+1. Dense keys: the Strapi ids of every `id INTEGER PRIMARY KEY` table
+   (sparse: draft and published versions take every other id) and any
+   `document_id` / `documentId` column (24-character Strapi documentIds)
+   are replaced by dense integers 1..n. Foreign keys (declared ones, plus
+   UNDECLARED_REFERENCES) are rewritten to match. The side mapping used by
+   the sync to translate Strapi ids is written next to the output:
+       <output>.idmap.json  {"format", "tables": {table: {"strapiIds": [...], "documentIds": [...]}}}
+   where dense id n is strapiIds[n - 1].
+2. Unused columns: TABLET_UNUSED_COLUMNS (Strapi timestamps, build-time
+   hashes) are dropped. Columns that are NULL in every row are listed in
+   the report, not dropped: the tablet may read them.
+3. WITHOUT ROWID: tables whose primary key is not a single INTEGER column
+   and whose rows average under 1/20 of a page are clustered on their key.
+4. Page size: the result is vacuumed at each of PAGE_SIZES; the smallest
+   file wins, and page sizes within 2% of it are decided by cold-open
+   latency.
+5. VACUUM, then ANALYZE (sqlite_stat1 for the tablet's query planner),
+   leaving out indexes on relations the build has not filled yet.
+
+The optimized seed is marked with PRAGMA application_id = OPTIMIZED_ID
+(file header; user_version and db_versions belong to the tablet and the
+sync). optimize refuses a marked seed: its ids are already the dense ones,
+and a second pass would lose the Strapi ids of the map. An id map with
+tables is never replaced by an empty one.
+
+The report gives the file size and the cold-open latency before and after:
+the page cache is dropped for the file (posix_fadvise), then a fresh
+read-only connection runs the first execution of every query_replay.py
+query the build has tables for.
+
+    python3 seed_optimizer.py optimize [tablet-app.db] [output.db]   # default: in place
+    python3 seed_optimizer.py report [tablet-app.db]
+"""
+import fnmatch
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from query_replay import WORKLOAD, param_sets
+from seed_db import SEED_DB_PATH
+
+PAGE_SIZES = (1024, 2048, 4096, 8192, 16384)
+COLD_RUNS = 5
+MAP_FORMAT = 'seed-id-map-v1'
+OPTIMIZED_ID = 0x534F5054  # "SOPT"
+
+# (table pattern, column): columns no tablet screen or sync step reads
+TABLET_UNUSED_COLUMNS = [
+    ('*', 'created_at'),
+    ('*', 'updated_at'),
+    ('*', 'document_id'),
+    ('*', 'documentId'),
+    ('wiper_sets', 'hash'),
+]
+KEPT_COLUMNS = {('db_versions', 'created_at')}
+
+# (table pattern, column) -> referenced table, for key columns without a FOREIGN KEY clause
+UNDECLARED_REFERENCES = {
+    ('sel_*_brands', 'brand_id'): 'brands',
+    ('sel_*_models', 'model_id'): 'models',
+}
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _matches(table, column, pairs):
+    return any(fnmatch.fnmatchcase(table, pattern) and column == name for pattern, name in pairs)
+
+
+def user_tables(conn):
+    return [name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+
+
+class TableLayout:
+    """Columns, keys, unique constraints and indexes of a table, from its PRAGMAs"""
+
+    def __init__(self, conn, name):
+        self.name = name
+        self.columns = [(row[1], row[2], row[3], row[4], row[5])
+                        for row in conn.execute(f"PRAGMA table_info({_quote(name)})")]
+        self.primary_key = [column for column, *_, pk in sorted(self.columns, key=lambda c: c[4]) if pk]
+        self.types = {column: declared.upper() for column, declared, *_ in self.columns}
+        self.foreign_keys = {row[3]: (row[2], row[4] or 'id')
+                             for row in conn.execute(f"PRAGMA foreign_key_list({_quote(name)})")}
+        for (pattern, column), target in UNDECLARED_REFERENCES.items():
+            if fnmatch.fnmatchcase(name, pattern) and column in self.types:
+                self.foreign_keys.setdefault(column, (target, 'id'))
+        sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()[0]
+        self.without_rowid = 'WITHOUT ROWID' in ' '.join(sql.upper().split())
+        self.unique = []
+        self.indexes = []
+        for _, index, unique, origin, _ in conn.execute(f"PRAGMA index_list({_quote(name)})"):
+            columns = [row[2] for row in conn.execute(f"PRAGMA index_info({_quote(index)})")]
+            if origin == 'u':
+                self.unique.append(columns)
+            elif origin == 'c':
+                index_sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (index,)).fetchone()[0]
+                self.indexes.append((index, columns, index_sql))
+
+    @property
+    def integer_key(self):
+        return self.primary_key == ['id'] and self.types['id'] == 'INTEGER' and not self.without_rowid
+
+    def create_sql(self, name, kept, without_rowid):
+        single_key = len(self.primary_key) == 1 and not without_rowid
+        lines = []
+        for column, declared, notnull, default, pk in self.columns:
+            if column not in kept:
+                continue
+            line = f"  {_quote(column)} {declared}".rstrip()
+            if pk and single_key:
+                line += " PRIMARY KEY"
+            if notnull:
+                line += " NOT NULL"
+            if default is not None:
+                line += f" DEFAULT {default}"
+            lines.append(line)
+        if self.primary_key and not single_key:
+            lines.append(f"  PRIMARY KEY ({', '.join(map(_quote, self.primary_key))})")
+        for columns in self.unique:
+            if all(column in kept for column in columns):
+                lines.append(f"  UNIQUE ({', '.join(map(_quote, columns))})")
+        for column, (target, target_column) in self.foreign_keys.items():
+            if column in kept and (column, target) not in _undeclared(self.name):
+                lines.append(f"  FOREIGN KEY ({_quote(column)}) REFERENCES {_quote(target)}({_quote(target_column)})")
+        return f"CREATE TABLE {_quote(name)} (\n" + ',\n'.join(lines) + "\n)" + (" WITHOUT ROWID" if without_rowid else '')
+
+
+def _undeclared(table):
+    return {(column, target) for (pattern, column), target in UNDECLARED_REFERENCES.items()
+            if fnmatch.fnmatchcase(table, pattern)}
+
+
+def _average_row_bytes(conn, layout):
+    columns = ' + '.join(f"COALESCE(LENGTH(CAST({_quote(column)} AS BLOB)), 0)" for column, *_ in layout.columns)
+    average = conn.execute(f"SELECT AVG({columns}) FROM {_quote(layout.name)}").fetchone()[0]
+    return average or 0
+
+
+def remap_and_rebuild(conn):
+    """Steps 1-3 on an open copy of the seed; returns (id map, report lines)"""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    layouts = {name: TableLayout(conn, name) for name in user_tables(conn)}
+    report = []
+
+    # 1. Dense ids, computed from the original tables before any rewrite
+    conn.execute("CREATE TEMP TABLE id_map (tbl TEXT NOT NULL, old INTEGER NOT NULL, new INTEGER NOT NULL, "
+                 "PRIMARY KEY (tbl, old)) WITHOUT ROWID")
+    id_map = {}
+    for name, layout in layouts.items():
+        if not layout.integer_key:
+            continue
+        document_column = next((c for c in ('document_id', 'documentId') if c in layout.types), None)
+        select = f"SELECT id{', ' + _quote(document_column) if document_column else ''} FROM {_quote(name)} ORDER BY id"
+        rows = conn.execute(select).fetchall()
+        ids = [row[0] for row in rows]
+        if ids == list(range(1, len(ids) + 1)) and not document_column:
+            continue
+        conn.executemany("INSERT INTO temp.id_map VALUES (?, ?, ?)",
+                         ((name, old, new) for new, old in enumerate(ids, 1)))
+        entry = {"strapiIds": ids}
+        if document_column:
+            entry["documentIds"] = [row[1] for row in rows]
+        id_map[name] = entry
+        report.append(f"dense ids     {name}: {len(ids)} rows, ids up to {ids[-1] if ids else 0} -> {len(ids)}"
+                      + (f", {document_column} moved to the id map" if document_column else ''))
+
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    for name, layout in layouts.items():
+        dropped = [column for column, *_ in layout.columns
+                   if _matches(name, column, TABLET_UNUSED_COLUMNS) and (name, column) not in KEPT_COLUMNS
+                   and column not in layout.primary_key]
+        kept = [column for column, *_ in layout.columns if column not in dropped]
+        remapped = {column: target for column, (target, _) in layout.foreign_keys.items()
+                    if target in id_map and column in kept}
+        if 'id' in kept and layout.integer_key and name in id_map:
+            remapped['id'] = name
+        without_rowid = layout.without_rowid
+        if not without_rowid and layout.primary_key and not layout.integer_key \
+                and _average_row_bytes(conn, layout) < page_size / 20:
+            without_rowid = True
+            report.append(f"without rowid {name}: clustered on ({', '.join(layout.primary_key)})")
+        if not dropped and not remapped and without_rowid == layout.without_rowid:
+            continue
+        if dropped:
+            report.append(f"dropped       {name}: {', '.join(dropped)}")
+        expressions = []
+        for column in kept:
+            if column in remapped:
+                expressions.append(f"(SELECT new FROM temp.id_map WHERE tbl = '{remapped[column]}' "
+                                   f"AND old = t.{_quote(column)})")
+            else:
+                expressions.append(f"t.{_quote(column)}")
+        rebuilt = f"_optimized_{name}"
+        conn.execute(layout.create_sql(rebuilt, set(kept), without_rowid))
+        conn.execute(f"INSERT INTO {_quote(rebuilt)} ({', '.join(map(_quote, kept))}) "
+                     f"SELECT {', '.join(expressions)} FROM {_quote(name)} t")
+        conn.execute(f"DROP TABLE {_quote(name)}")
+        conn.execute(f"ALTER TABLE {_quote(rebuilt)} RENAME TO {_quote(name)}")
+        for index, columns, index_sql in layout.indexes:
+            if all(column in kept for column in columns):
+                try:
+                    conn.execute(index_sql)
+                except sqlite3.OperationalError as e:
+                    report.append(f"index skipped {index}: {e}")
+            else:
+                report.append(f"index dropped {index}: on dropped columns")
+    conn.execute("DROP TABLE temp.id_map")
+    conn.commit()
+
+    for name in user_tables(conn):
+        empty = [column for column, *_ in TableLayout(conn, name).columns
+                 if conn.execute(f"SELECT COUNT(*) FROM {_quote(name)} WHERE {_quote(column)} IS NOT NULL").fetchone()[0] == 0
+                 and conn.execute(f"SELECT COUNT(*) FROM {_quote(name)}").fetchone()[0] > 0]
+        if empty:
+            report.append(f"always NULL   {name}: {', '.join(empty)} (kept)")
+    return id_map, report
+
+
+def vacuum_at(source, path, page_size):
+    """Copy of `source` vacuumed at `page_size` and analyzed"""
+    shutil.copyfile(source, path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.execute(f"PRAGMA page_size = {page_size}")
+    conn.execute("VACUUM")
+    conn.execute("ANALYZE")
+    _drop_placeholder_stats(conn)
+    conn.commit()
+    conn.close()
+    return os.path.getsize(path)
+
+
+def _drop_placeholder_stats(conn):
+    """Forget the statistics of indexes whose leading column is NULL in every row
+
+    Such columns are relations the sync fills on the tablet (models.brand_id
+    in a skeleton build); their "every key matches every row" statistics
+    would keep the planner off the index once the data is there, since the
+    tablet never re-runs ANALYZE.
+    """
+    for index, table in conn.execute("SELECT idx, tbl FROM sqlite_stat1 WHERE idx IS NOT NULL").fetchall():
+        columns = [row[2] for row in conn.execute(f"PRAGMA index_info({_quote(index)})")]
+        if columns and columns[0] and conn.execute(
+                f"SELECT 1 FROM {_quote(table)} WHERE {_quote(columns[0])} IS NOT NULL LIMIT 1").fetchone() is None:
+            conn.execute("DELETE FROM sqlite_stat1 WHERE idx = ?", (index,))
+
+
+def _drop_page_cache(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def cold_open(path, runs=COLD_RUNS):
+    """(median ms to open and run the first query, median ms for one pass of the workload, queries run)"""
+    conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    statements = []
+    for query in WORKLOAD:
+        try:
+            sets = param_sets(conn, query)
+            conn.execute('EXPLAIN ' + query['sql'], sets[0] if sets else [])
+        except sqlite3.OperationalError:
+            continue
+        if sets:
+            statements.append((query['sql'], sets[0]))
+    conn.close()
+    first, total = [], []
+    for _ in range(runs):
+        _drop_page_cache(path)
+        start = time.perf_counter()
+        conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+        for i, (sql, params) in enumerate(statements):
+            conn.execute(sql, params).fetchall()
+            if i == 0:
+                first.append(time.perf_counter() - start)
+        conn.close()
+        total.append(time.perf_counter() - start)
+    return statistics.median(first) * 1000, statistics.median(total) * 1000, len(statements)
+
+
+def table_sizes(path):
+    conn = sqlite3.connect(path)
+    try:
+        return dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"))
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        conn.close()
+
+
+def describe(path, label):
+    conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    page_size, page_count = (conn.execute(f"PRAGMA {p}").fetchone()[0] for p in ('page_size', 'page_count'))
+    conn.close()
+    first, total, count = cold_open(path)
+    print(f"{label:<7} {os.path.getsize(path) / 1024:8.0f} KB  page size {page_size:>5} x {page_count:<5} "
+          f"cold open + first query {first:6.2f} ms, {count} queries {total:7.2f} ms")
+    return os.path.getsize(path), total
+
+
+def map_path(seed):
+    return os.path.splitext(seed)[0] + '.idmap.json'
+
+
+def is_optimized(path):
+    conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        return conn.execute("PRAGMA application_id").fetchone()[0] == OPTIMIZED_ID
+    finally:
+        conn.close()
+
+
+def optimize(source=SEED_DB_PATH, output=None):
+    output = output or source
+    if not os.path.exists(source):
+        sys.exit(f"{source} not found")
+    if is_optimized(source):
+        sys.exit(f"{source} is already optimized (Strapi ids in {map_path(source)}), optimize the seed as built")
+    directory = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output)))
+    try:
+        work = os.path.join(directory, 'work.db')
+        shutil.copyfile(source, work)
+        before_sizes = table_sizes(source)
+        before = describe(source, 'before')
+
+        conn = sqlite3.connect(work)
+        id_map, report = remap_and_rebuild(conn)
+        conn.execute(f"PRAGMA application_id = {OPTIMIZED_ID}")
+        conn.close()
+        for line in report:
+            print(f"  {line}")
+
+        candidates = []
+        for page_size in PAGE_SIZES:
+            path = os.path.join(directory, f"page-{page_size}.db")
+            size = vacuum_at(work, path, page_size)
+            candidates.append((page_size, size, path))
+        smallest = min(size for _, size, _ in candidates)
+        close = [(page_size, path) for page_size, size, path in candidates if size <= smallest * 1.02]
+        timed = [(cold_open(path, runs=3)[1], page_size, path) for page_size, path in close]
+        print("  page sizes    " + ', '.join(f"{page_size}: {size / 1024:.0f} KB" for page_size, size, _ in candidates)
+              + f" -> {min(timed)[1]}")
+        best = min(timed)[2]
+
+        after_sizes = table_sizes(best)
+        after = describe(best, 'after')
+        changed = sorted(set(before_sizes) | set(after_sizes),
+                         key=lambda name: before_sizes.get(name, 0) - after_sizes.get(name, 0), reverse=True)
+        for name in changed[:8]:
+            print(f"  {name:<40} {before_sizes.get(name, 0) / 1024:7.0f} KB -> {after_sizes.get(name, 0) / 1024:7.0f} KB")
+        print(f"size {before[0] / 1024:.0f} KB -> {after[0] / 1024:.0f} KB ({(1 - after[0] / before[0]) * 100:.0f}% smaller), "
+              f"cold workload {before[1]:.2f} ms -> {after[1]:.2f} ms")
+
+        os.replace(best, output)
+        map_file = map_path(output)
+        previous = {}
+        if os.path.exists(map_file):
+            with open(map_file, encoding='utf-8') as f:
+                previous = json.load(f).get('tables', {})
+        if not id_map and previous:
+            # Dense ids already (a seed optimized before it was marked): the map of the first pass stays right
+            print(f"Optimized seed -> {output}, no ids remapped, {map_file} kept")
+            return
+        tmp = os.path.join(directory, 'idmap.json')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"format": MAP_FORMAT, "tables": id_map}, f, separators=(',', ':'))
+        os.replace(tmp, map_file)
+        print(f"Optimized seed -> {output}, id map -> {map_file}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['optimize']:
+        optimize(args[1] if len(args) > 1 else SEED_DB_PATH, args[2] if len(args) > 2 else None)
+    elif args[:1] == ['report']:
+        path = args[1] if len(args) > 1 else SEED_DB_PATH
+        describe(path, 'seed')
+        for name, size in sorted(table_sizes(path).items(), key=lambda item: -item[1]):
+            print(f"  {name:<40} {size / 1024:7.0f} KB")
+    else:
+        print("Usage: python3 seed_optimizer.py optimize [tablet-app.db] [output.db] | report [tablet-app.db]")
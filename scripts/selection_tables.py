@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Materialized selection tables for the tablet's brand -> model -> variant -> product flow.
+
+Every tap of a category flow used to join brands, models and the product
+tables (or unpack a JSON column) on the tablet. This seed stage prejoins
+each step at build time into one WITHOUT ROWID table per step and category,
+clustered on the key the next tap filters by, so that every screen is a
+single primary-key range read, already in display order:
+
+    sel_<category>_brands    (name, brand_slug, brand_id, logo_url, model_count)
+        SELECT * FROM sel_battery_brands
+    sel_<category>_models    (brand_slug, name, model_slug, model_id, variant_count)
+        SELECT * FROM sel_battery_models WHERE brand_slug = ?
+    sel_<category>_variants  (brand_slug, model_slug, sort, variant_id, label, fuel, start_date, end_date,
+                              detail, product_count)
+        SELECT * FROM sel_battery_variants WHERE brand_slug = ? AND model_slug = ?
+    sel_<category>_products  (variant_id, sort, group_name, position, ref, note)
+        SELECT * FROM sel_battery_products WHERE variant_id = ?
+
+Variants are the motorisations (battery), Valeo entries (wipers), lights
+products (type of conception and years) and engine variants (filters).
+Products are the refs of each variant: battery type and option, wiper
+position, light position, filter type.
+
+Sources:
+- battery: json_data/exide-battery-products.json, json_data/fulmen-battery-products.json
+- wipers:  wipers/wipers_database_janv2026.json
+- lights:  Strapi /api/lights-products (lightPositions)
+- filters: Strapi /api/filter-compatibilities (filters)
+Brands go through the alias table (brand_aliases.py) and take brand_id and
+logo_url from the seed's brands table; model_id comes from the seed's
+models by slug when there is one. A category whose source is missing or
+unreachable keeps its previous tables.
+
+    python3 selection_tables.py seed [tablet-app.db] [--categories battery,wipers]
+    python3 selection_tables.py --bench   # joins at query time vs selection tables
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import requests
+
+from battery_encoding import load_battery_products
+from brand_aliases import load_aliases
+from json_cache import load_json
+from names import slugify
+from run_metrics import RunMetrics
+from seed_db import open_seed, replace_table
+from strapi_import import wiper_positions
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+battery_products_files = [
+    os.path.join(script_dir, 'json_data', 'exide-battery-products.json'),
+    os.path.join(script_dir, 'json_data', 'fulmen-battery-products.json'),
+]
+wipers_database_file = os.path.join(script_dir, 'wipers', 'wipers_database_janv2026.json')
+
+CATEGORIES = ('battery', 'lights', 'wipers', 'filters')
+
+BATTERY_TYPES = {
+    'batteryAGM': 'AGM',
+    'batteryEFB': 'EFB',
+    'batteryPremium': 'Premium',
+    'batteryExcell': 'Excell',
+    'batteryClassic': 'Classic',
+}
+FILTER_TYPES = ('oil', 'air', 'diesel', 'cabin')
+
+
+# --- Sources ---------------------------------------------------------------------
+# Each source yields (brand, model, variant, products):
+#   variant  {"label", "fuel", "start", "end", "detail"}
+#   products [(group, position, ref, note)]
+
+def battery_vehicles(battery_products):
+    for product in battery_products:
+        for motorisation in product['motorisations']:
+            products = []
+            for field, battery_type in BATTERY_TYPES.items():
+                block = motorisation.get(field) or {}
+                for option in ('option1', 'option2', 'option3'):
+                    if block.get(option):
+                        products.append((battery_type, option, block[option], None))
+            variant = {"label": motorisation.get('motorisation'), "fuel": motorisation.get('fuel'),
+                       "start": motorisation.get('startDate'), "end": motorisation.get('endDate'), "detail": None}
+            yield product['brand'], product['model'], variant, products
+
+
+def wiper_vehicles(wipers_database):
+    for brand, entries in wipers_database.get('brands', {}).items():
+        for entry in entries:
+            years = entry.get('productionYears') or {}
+            label = ' '.join(part for part in (entry.get('picto1'), entry.get('picto2')) if part) or entry.get('model')
+            products = [(position['category'], position['position'], position['ref'], None)
+                        for position in wiper_positions(entry.get('wipers') or {})]
+            variant = {"label": label, "fuel": None, "start": years.get('start'), "end": years.get('end'),
+                       "detail": entry.get('direction')}
+            yield brand, entry.get('model'), variant, products
+
+
+def _relation_name(entry, key):
+    relation = entry.get(key)
+    if isinstance(relation, dict):
+        relation = relation.get('data', relation)
+        return (relation.get('attributes') or relation).get('name') if relation else None
+    return None
+
+
+def lights_vehicles(entries):
+    for entry in entries:
+        if entry.get('isActive') is False:
+            continue
+        products = [(position.get('category'), position.get('position'), position.get('ref'), None)
+                    for position in entry.get('lightPositions') or [] if position.get('ref')]
+        variant = {"label": entry.get('typeConception') or entry.get('name'), "fuel": None,
+                   "start": entry.get('constructionYearStart') or None,
+                   "end": entry.get('constructionYearEnd') or None, "detail": entry.get('partNumber') or None}
+        yield _relation_name(entry, 'brand'), _relation_name(entry, 'model'), variant, products
+
+
+def filter_vehicles(entries):
+    for entry in entries:
+        filters = entry.get('filters') or {}
+        products = [(filter_type, None, item['ref'], '; '.join(item.get('notes') or []) or None)
+                    for filter_type in FILTER_TYPES for item in filters.get(filter_type) or [] if item.get('ref')]
+        variant = {"label": entry.get('vehicleVariant') or entry.get('vehicleModel'), "fuel": None,
+                   "start": entry.get('productionStart') or None, "end": entry.get('productionEnd') or None,
+                   "detail": ' '.join(part for part in (entry.get('engineCode'), entry.get('power') and
+                                                        f"{entry['power']} ch") if part) or None}
+        yield _relation_name(entry, 'brand'), _relation_name(entry, 'model'), variant, products
+
+
+def local_source(category):
+    """(brand, model, variant, products) of a local category source, None when its files are missing"""
+    if category == 'battery':
+        paths = [path for path in battery_products_files if os.path.exists(path)]
+        if not paths:
+            return None
+        return (vehicle for path in paths for vehicle in battery_vehicles(load_battery_products(path)))
+    if category == 'wipers':
+        if not os.path.exists(wipers_database_file):
+            return None
+        return wiper_vehicles(load_json(wipers_database_file))
+    return None
+
+
+def strapi_source(category):
+    """Lights / filters entries from Strapi (conditional GETs through the HTTP cache), None when unreachable"""
+    from http_cache import HttpCache
+    from strapi_import import StrapiClient
+    collection, reader = {'lights': ('lights-products', lights_vehicles),
+                          'filters': ('filter-compatibilities', filter_vehicles)}[category]
+    client = StrapiClient(workers=1, cache=HttpCache())
+    try:
+        entries = list(client.iter_entries(collection, populate='*'))
+    except requests.exceptions.RequestException as e:
+        print(f"  {category}: Strapi unreachable ({e.__class__.__name__}), tables kept as they are")
+        return None
+    return reader(entries)
+
+
+# --- Tables --------------------------------------------------------------------------
+
+def table_sql(category):
+    """CREATE statements of the four selection tables of a category"""
+    return {
+        'brands': f"""CREATE TABLE sel_{category}_brands (
+  name TEXT NOT NULL,
+  brand_slug TEXT NOT NULL,
+  brand_id INTEGER,
+  logo_url TEXT,
+  model_count INTEGER NOT NULL,
+  PRIMARY KEY (name, brand_slug)
+) WITHOUT ROWID""",
+        'models': f"""CREATE TABLE sel_{category}_models (
+  brand_slug TEXT NOT NULL,
+  name TEXT NOT NULL,
+  model_slug TEXT NOT NULL,
+  model_id INTEGER,
+  variant_count INTEGER NOT NULL,
+  PRIMARY KEY (brand_slug, name, model_slug)
+) WITHOUT ROWID""",
+        'variants': f"""CREATE TABLE sel_{category}_variants (
+  brand_slug TEXT NOT NULL,
+  model_slug TEXT NOT NULL,
+  sort INTEGER NOT NULL,
+  variant_id INTEGER NOT NULL,
+  label TEXT,
+  fuel TEXT,
+  start_date TEXT,
+  end_date TEXT,
+  detail TEXT,
+  product_count INTEGER NOT NULL,
+  PRIMARY KEY (brand_slug, model_slug, sort)
+) WITHOUT ROWID""",
+        'products': f"""CREATE TABLE sel_{category}_products (
+  variant_id INTEGER NOT NULL,
+  sort INTEGER NOT NULL,
+  group_name TEXT,
+  position TEXT,
+  ref TEXT NOT NULL,
+  note TEXT,
+  PRIMARY KEY (variant_id, sort)
+) WITHOUT ROWID""",
+    }
+
+
+def _sort_key(text):
+    return (text or '').casefold()
+
+
+def build_rows(vehicles, seed_brands=None, seed_models=None):
+    """Rows of the four tables from (brand, model, variant, products) tuples
+
+    Identical variants of a model (same label, dates and refs, e.g. a
+    motorisation listed by two suppliers) are kept once.
+    """
+    aliases = load_aliases()
+    seed_brands = seed_brands or {}
+    seed_models = seed_models or {}
+    brands = {}  # brand_slug -> name
+    models = {}  # (brand_slug, model_slug) -> name
+    variants = {}  # (brand_slug, model_slug) -> {variant key: (variant, products)}
+    for brand, model, variant, products in vehicles:
+        if not brand or not model or not products:
+            continue
+        brand_slug = aliases.slug(brand)
+        brands.setdefault(brand_slug, aliases.canonical_name(brand))
+        model_slug = slugify(model)
+        models.setdefault((brand_slug, model_slug), model.strip())
+        key = (variant['label'], variant['fuel'], variant['start'], variant['end'], variant['detail'], tuple(products))
+        variants.setdefault((brand_slug, model_slug), {}).setdefault(key, (variant, products))
+
+    model_counts = {}
+    for brand_slug, _ in models:
+        model_counts[brand_slug] = model_counts.get(brand_slug, 0) + 1
+    brand_rows = [(name, brand_slug, *(seed_brands.get(brand_slug) or (None, None)), model_counts[brand_slug])
+                  for brand_slug, name in brands.items()]
+    model_rows = [(brand_slug, name, model_slug, seed_models.get(model_slug), len(variants[brand_slug, model_slug]))
+                  for (brand_slug, model_slug), name in models.items()]
+
+    variant_rows, product_rows = [], []
+    for (brand_slug, model_slug), model_variants in sorted(variants.items()):
+        ordered = sorted(model_variants.values(),
+                         key=lambda item: (_sort_key(item[0]['label']), item[0]['start'] or '', item[0]['end'] or ''))
+        for sort, (variant, products) in enumerate(ordered):
+            variant_id = len(variant_rows) + 1
+            variant_rows.append((brand_slug, model_slug, sort, variant_id, variant['label'], variant['fuel'],
+                                 variant['start'], variant['end'], variant['detail'], len(products)))
+            product_rows.extend((variant_id, position, *product) for position, product in enumerate(products))
+    return {'brands': brand_rows, 'models': model_rows, 'variants': variant_rows, 'products': product_rows}
+
+
+def _seed_lookups(conn):
+    """brand slug -> (id, logo_url) and model slug -> id of the seed's Strapi tables"""
+    brands = {slug: (brand_id, logo) for brand_id, slug, logo in
+              conn.execute("SELECT id, slug, logo_url FROM brands WHERE slug IS NOT NULL")}
+    models = {slug: model_id for model_id, slug in conn.execute("SELECT id, slug FROM models WHERE slug IS NOT NULL")}
+    return brands, models
+
+
+def write_tables(conn, category, rows):
+    statements = table_sql(category)
+    return {step: replace_table(conn, f"sel_{category}_{step}", statements[step], rows[step])
+            for step in ('brands', 'models', 'variants', 'products')}
+
+
+def export_to_seed(db_path=None, categories=CATEGORIES):
+    conn = open_seed(db_path)
+    seed_brands, seed_models = _seed_lookups(conn)
+    counts = {}
+    for category in categories:
+        vehicles = local_source(category) if category in ('battery', 'wipers') else strapi_source(category)
+        if vehicles is None:
+            if category in ('battery', 'wipers'):
+                print(f"  {category}: no source file, tables kept as they are")
+            continue
+        rows = build_rows(vehicles, seed_brands, seed_models)
+        with conn:
+            counts[category] = write_tables(conn, category, rows)
+        print(f"  {category}: " + ', '.join(f"{count} {step}" for step, count in counts[category].items()))
+    conn.close()
+    load_aliases().print_unresolved()
+    return counts
+
+
+# --- Bench -------------------------------------------------------------------------
+
+FLOW_QUERIES = [
+    ('brands', "SELECT name, brand_slug, model_count FROM sel_{c}_brands", (),
+     "SELECT b.name, b.slug, COUNT(DISTINCT m.id) FROM compat c JOIN models m ON m.id = c.model_id "
+     "JOIN brands b ON b.id = m.brand_id GROUP BY b.id ORDER BY b.name", ()),
+    ('models', "SELECT name, model_slug, variant_count FROM sel_{c}_models WHERE brand_slug = ?", ('brand',),
+     "SELECT m.name, m.slug, COUNT(DISTINCT c.variant) FROM compat c JOIN models m ON m.id = c.model_id "
+     "JOIN brands b ON b.id = m.brand_id WHERE b.slug = ? GROUP BY m.id ORDER BY m.name", ('brand',)),
+    ('variants', "SELECT * FROM sel_{c}_variants WHERE brand_slug = ? AND model_slug = ?", ('brand', 'model'),
+     "SELECT c.variant, c.start_date, c.end_date, COUNT(*) FROM compat c JOIN models m ON m.id = c.model_id "
+     "JOIN brands b ON b.id = m.brand_id WHERE b.slug = ? AND m.slug = ? "
+     "GROUP BY c.variant, c.start_date, c.end_date ORDER BY c.variant", ('brand', 'model')),
+    ('products', "SELECT * FROM sel_{c}_products WHERE variant_id = ?", ('variant_id',),
+     "SELECT c.group_name, c.position, c.ref FROM compat c JOIN models m ON m.id = c.model_id "
+     "JOIN brands b ON b.id = m.brand_id WHERE b.slug = ? AND m.slug = ? AND c.variant = ? AND c.start_date IS ?",
+     ('brand', 'model', 'variant', 'start')),
+]
+
+
+def _join_db(path, rows):
+    """The same data laid out the usual way: brands, models and one compatibility row per ref"""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE brands (id INTEGER PRIMARY KEY, name TEXT, slug TEXT UNIQUE);
+        CREATE TABLE models (id INTEGER PRIMARY KEY, name TEXT, slug TEXT, brand_id INTEGER);
+        CREATE TABLE compat (id INTEGER PRIMARY KEY, model_id INTEGER, variant TEXT, start_date TEXT,
+                             end_date TEXT, group_name TEXT, position TEXT, ref TEXT);
+        CREATE INDEX idx_models_brand_id ON models(brand_id);
+        CREATE INDEX idx_compat_model_id ON compat(model_id);
+    """)
+    brand_ids = {row[1]: i for i, row in enumerate(rows['brands'], 1)}
+    conn.executemany("INSERT INTO brands VALUES (?, ?, ?)", ((i, row[0], row[1]) for row in rows['brands']
+                                                                for i in [brand_ids[row[1]]]))
+    model_ids = {(row[0], row[2]): i for i, row in enumerate(rows['models'], 1)}
+    conn.executemany("INSERT INTO models VALUES (?, ?, ?, ?)",
+                     ((model_ids[row[0], row[2]], row[1], row[2], brand_ids[row[0]]) for row in rows['models']))
+    variants = {row[3]: row for row in rows['variants']}
+    conn.executemany("INSERT INTO compat (model_id, variant, start_date, end_date, group_name, position, ref) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     ((model_ids[v[0], v[1]], v[4], v[6], v[7], p[2], p[3], p[4])
+                      for p in rows['products'] for v in [variants[p[0]]]))
+    conn.commit()
+    conn.close()
+
+
+def bench(repeat=300):
+    """Per-tap latency of the flow: joins and GROUP BY at query time vs the selection tables"""
+    from catalog_records import _motorisation_record, _synthetic_exide_vehicles, json_default
+    motorisations = [_motorisation_record(v) for v in _synthetic_exide_vehicles(60000)]
+    battery_products = json.loads(json.dumps(
+        [{"brand": f"BRAND {i // 40}", "model": f"MODEL {i}", "motorisations": motorisations[i * 12:(i + 1) * 12]}
+         for i in range(5000)], default=json_default))
+    sources = {'battery (synthetic, 60k motorisations)': battery_vehicles(battery_products)}
+    if os.path.exists(wipers_database_file):
+        sources['wipers (Valeo janv2026)'] = wiper_vehicles(load_json(wipers_database_file))
+    directory = tempfile.mkdtemp()
+    for label, vehicles in sources.items():
+        category = 'battery' if label.startswith('battery') else 'wipers'
+        rows = build_rows(vehicles)
+        selection_db, join_db = os.path.join(directory, 'selection.db'), os.path.join(directory, 'join.db')
+        conn = sqlite3.connect(selection_db)
+        with conn:
+            write_tables(conn, category, rows)
+        conn.close()
+        _join_db(join_db, rows)
+        # A model with many variants, and its first variant
+        variant = max(rows['variants'], key=lambda row: (row[2], -row[3]))
+        first = next(row for row in rows['variants'] if row[:2] == variant[:2] and row[2] == 0)
+        params = {'brand': first[0], 'model': first[1], 'variant_id': first[3], 'variant': first[4], 'start': first[6]}
+        print(f"{label}: {len(rows['brands'])} brands, {len(rows['models'])} models, "
+              f"{len(rows['variants'])} variants, {len(rows['products'])} refs")
+        for step, selection_sql, selection_params, join_sql, join_params in FLOW_QUERIES:
+            timings = []
+            for path, sql, names in ((join_db, join_sql, join_params),
+                                     (selection_db, selection_sql.format(c=category), selection_params)):
+                conn = sqlite3.connect(path)
+                args = [params[name] for name in names]
+                plan = ' / '.join(row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, args))
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    result = conn.execute(sql, args).fetchall()
+                timings.append(((time.perf_counter() - start) / repeat, len(result), plan))
+                conn.close()
+            (join_time, join_count, join_plan), (sel_time, sel_count, sel_plan) = timings
+            print(f"  {step:<9} joins {join_time * 1e6:9.1f} µs ({join_count:>4} rows)   "
+                  f"selection {sel_time * 1e6:7.1f} µs ({sel_count:>4} rows)  x{join_time / sel_time:.0f}")
+            print(f"            {sel_plan}")
+        for path in (selection_db, join_db):
+            os.unlink(path)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    categories = CATEGORIES
+    if '--categories' in args:
+        i = args.index('--categories')
+        categories = tuple(c for c in args[i + 1].split(',') if c in CATEGORIES) if i + 1 < len(args) else ()
+        args = args[:i] + args[i + 2:]
+    if args[:1] == ['seed']:
+        with RunMetrics('selection-tables-seed') as metrics:
+            metrics.stage('seed')
+            counts = export_to_seed(args[1] if len(args) > 1 else None, categories)
+            for category, steps in counts.items():
+                for step, count in steps.items():
+                    metrics.count(f"{category}_{step}", count)
+            metrics.count('rows_out', sum(steps['variants'] for steps in counts.values()))
+    elif args[:1] == ['--bench']:
+        bench()
+    else:
+        print("Usage: python3 selection_tables.py seed [tablet-app.db] [--categories battery,lights,wipers,filters]"
+              " | --bench")
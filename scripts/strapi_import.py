@@ -0,0 +1,795 @@
+#!/usr/bin/env python3
+"""
+Bulk importer: upserts pipeline output into Strapi over the REST API.
+
+    python3 strapi_import.py battery   [--workers 8] [--rate 40] [--batch 100] [--restart]
+    python3 strapi_import.py fulmen    ...
+    python3 strapi_import.py wipers    ...
+    python3 strapi_import.py <source> --changeset
+    python3 strapi_import.py --bench   [records]
+
+Sources:
+- battery: json_data/exide-battery-products.json  -> /api/battery-products
+- fulmen:  json_data/fulmen-battery-products.json -> /api/battery-products
+- wipers:  wipers/wipers_database_janv2026.json   -> /api/wipers-products
+
+Records are keyed the way the JavaScript importers key them: battery
+products by slug, wipers products by ref (one product per Strapi model,
+WIPERS-<brand slug>-<model slug>, as import-wipers-products.js). Both carry
+the brand / model relations, resolved once against the Strapi brands and
+models (Catalog). Existing entries of the source are listed once (key ->
+entry, scoped by batteryBrand / category since battery and fulmen share a
+collection) and updated with PUT /api/<collection>/<documentId>, new ones
+are created with POST. An update keeps what the JavaScript importers keep
+(MERGES): the motorisations already on a battery product, the positions
+other suppliers (IMDICAR) added to a wipers product. Battery product slugs
+carry the battery brand ("peugeot-208-fulmen-endurance"), except Exide's,
+which keep the slug import-battery-products.js gave them.
+Requests run on a bounded thread pool sharing one keep-alive connection
+pool, go through a token-bucket rate limiter and are retried with
+exponential backoff on connection errors, 429 and 5xx (Retry-After is
+honoured). A POST is only resent on 429/503; after a dropped connection
+the key is looked up first, since the entry may already exist.
+
+Progress is journaled per source in scripts/.cache/strapi-import/<source>.jsonl
+(one line per written or deleted record: key, content hash, documentId),
+flushed after every batch. Re-running an interrupted import skips every
+record whose journaled hash is unchanged; --restart ignores the journal.
+The journal only serves resuming: it is cleared once an import completes
+without errors, so the next import writes everything again and corrects
+whatever changed on the Strapi side meanwhile.
+
+--changeset applies json_data/changesets/<source>.json (see changeset.py)
+instead of the whole source: only its creates, updates and deletes are sent.
+A change set has its own journal (<source>.changeset-<hash>.jsonl), so only
+a resumed run of that same change set skips records; applying it also
+drops the source journal, which no longer reflects Strapi.
+
+--bench runs the importer against a local stand-in Strapi (latency and
+transient 429/503 injected), interrupts it halfway, resumes it and reports
+records per minute.
+
+Environment variables:
+  STRAPI_URL - Strapi server URL (default: http://localhost:1338)
+  STRAPI_API_TOKEN - API token for authentication (optional)
+"""
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from battery_encoding import load_battery_products
+from catalog_records import Motorisation
+from json_cache import load_json
+from names import slugify
+from run_metrics import RunMetrics
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+journal_dir = os.path.join(script_dir, '.cache', 'strapi-import')
+
+STRAPI_URL = os.environ.get('STRAPI_URL', 'http://localhost:1338')
+API_TOKEN = os.environ.get('STRAPI_API_TOKEN', '')
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Statuses telling that a non-idempotent request (POST) was not processed
+REJECTED_STATUSES = {429, 503}
+MAX_RETRIES = 5
+
+
+# --- Records -------------------------------------------------------------------
+
+def battery_product_slug(brand, model, battery_brand):
+    """Unique slug of a battery product: Exide keeps the slug of import-battery-products.js,
+    other battery brands of the same vehicle get their own"""
+    if battery_brand == "Exide":
+        return slugify(f"{brand} {model}")
+    return slugify(f"{brand} {model} {battery_brand}")
+
+
+class Catalog:
+    """Strapi brands and models (documentId, name, slug) for the brand / model relations of the products"""
+
+    def __init__(self, brands, models):
+        self.brands_by_name, self.brands_by_slug = {}, {}
+        for brand in brands:
+            self.brands_by_name.setdefault(brand['name'].strip().upper(), brand)
+            self.brands_by_slug.setdefault(brand['slug'], brand)
+        self.models_by_name, self.models_by_slug = {}, {}
+        for model in models:
+            brand = model.get('brand')
+            if not brand:
+                continue
+            self.models_by_name.setdefault((brand['documentId'], model['name'].strip().upper()), model)
+            self.models_by_slug.setdefault((brand['documentId'], model['slug']), model)
+        self.unresolved = set()
+
+    @classmethod
+    def fetch(cls, client):
+        print("Listing Strapi brands and models for the relations...")
+        brands = list(client.iter_entries('brands', fields=['name', 'slug']))
+        models = list(client.iter_entries('models', fields=['name', 'slug'], populate='brand'))
+        print(f"  {len(brands)} brands, {len(models)} models")
+        return cls(brands, models)
+
+    def brand(self, name, slug=None):
+        """Strapi brand by upper-case name (as import-wipers-products.js), else by slug"""
+        brand = self.brands_by_name.get(name.strip().upper()) or self.brands_by_slug.get(slug or slugify(name))
+        if brand is None:
+            self.unresolved.add(name)
+        return brand
+
+    def model(self, brand, name, slug=None):
+        """Strapi model of `brand` by upper-case name, else by slug"""
+        model = (self.models_by_name.get((brand['documentId'], name.strip().upper()))
+                 or self.models_by_slug.get((brand['documentId'], slug or slugify(name))))
+        if model is None:
+            self.unresolved.add(f"{brand['name']} {name}")
+        return model
+
+
+def battery_product_records(path, battery_brand, catalog):
+    """(slug, payload) for every product of a battery-products file (same fields as import-battery-products.js,
+    plus the brand / model relations when Strapi has them)"""
+    for product in load_battery_products(path):
+        name = f"{product['brand']} {product['model']}"
+        slug = battery_product_slug(product['brand'], product['model'], battery_brand)
+        payload = {
+            "name": name,
+            "slug": slug,
+            "brandName": product['brand'],
+            "brandSlug": product['brandSlug'],
+            "modelName": product['model'],
+            "modelSlug": product['modelSlug'],
+            "motorisations": product['motorisations'],
+            "isActive": True,
+            "category": "battery",
+            "batteryBrand": battery_brand,
+        }
+        brand = catalog.brand(product['brand'], product['brandSlug'])
+        model = catalog.model(brand, product['model'], product['modelSlug']) if brand else None
+        if model:
+            payload.update(brand=brand['documentId'], model=model['documentId'])
+        yield slug, payload
+
+
+_PARENTHESES = re.compile(r'\s*\([^)]*\)')
+
+
+def motorisation_key(motorisation):
+    """What makes two motorisations equal for import-battery-products.js (motorisationsAreEqual)"""
+    name = _PARENTHESES.sub('', motorisation.get('motorisation') or '')
+    name = name.split('(', 1)[0].strip()
+    return (name, motorisation.get('startDate'), motorisation.get('endDate'), motorisation.get('fuel'),
+            tuple((motorisation.get(field) or {}).get(option) for field in Motorisation.BATTERY_FIELDS
+                  for option in ('option1', 'option2', 'option3')))
+
+
+def merge_motorisations(entry, payload):
+    """Payload to write over an existing battery product: its motorisations first, then the new ones,
+    duplicates dropped (import-battery-products.js merges, it never replaces them)"""
+    merged = {}
+    for motorisation in (entry.get('motorisations') or []) + list(payload['motorisations']):
+        merged.setdefault(motorisation_key(motorisation), motorisation)
+    return dict(payload, motorisations=list(merged.values()))
+
+
+def wiper_positions(wipers):
+    """Valeo wipers block -> wipersPositions array (same rules as import-wipers-products.js)"""
+    positions = []
+    if wipers.get('arriere') and isinstance(wipers['arriere'], str):
+        positions.append({"position": "Arrière", "ref": wipers['arriere'], "category": "arriere"})
+    names = {
+        "kitAvant": "Kit Avant",
+        "coteConducteur": "Côté Conducteur",
+        "monoBalais": "Mono Balais",
+        "cotePassager": "Côté Passager",
+    }
+    for category in ('multiconnexion', 'standard'):
+        for key, ref in (wipers.get(category) or {}).items():
+            if ref and isinstance(ref, str):
+                positions.append({"position": names.get(key, key), "ref": ref, "category": category})
+    return positions
+
+
+def _month(value):
+    """'MM/YYYY' -> (YYYY, MM) for comparisons"""
+    month, _, year = value.partition('/')
+    return int(year or 0), int(month or 0)
+
+
+def wiper_product_records(path, catalog, source_name="Database_PerfectVision_Janv2026.csv"):
+    """(ref, payload) per Strapi model with Valeo wipers, keyed like import-wipers-products.js:
+    one product per model, brand / model relations, ref WIPERS-<brand slug>-<model slug>.
+
+    The positions of every Valeo entry of a model are merged, each tagged with
+    the validFrom / validTo of its entry as merge-strapi-wipers-by-model.js
+    does. Entries whose brand or model is not in Strapi are skipped
+    (catalog.unresolved).
+    """
+    products = {}
+    for brand_name, entries in load_json(path).get('brands', {}).items():
+        brand = catalog.brand(brand_name)
+        if brand is None:
+            continue
+        for entry in entries:
+            positions = wiper_positions(entry.get('wipers') or {})
+            if not entry.get('model') or not positions:
+                continue
+            model = catalog.model(brand, entry['model'])
+            if model is None:
+                continue
+            years = entry.get('productionYears') or {}
+            start, end = years.get('start'), years.get('end')
+            ref = f"WIPERS-{brand['slug']}-{model['slug']}"
+            product = products.get(ref)
+            if product is None:
+                product = products[ref] = {
+                    "name": f"{brand['name']} {model['name']} - Wipers",
+                    "ref": ref,
+                    "description": f"Wipers for {brand['name']} {model['name']}",
+                    "brand": brand['documentId'],
+                    "model": model['documentId'],
+                    "wipersPositions": [],
+                    "constructionYearStart": start,
+                    "constructionYearEnd": end,
+                    "direction": entry.get('direction'),
+                    "source": source_name,
+                    "category": "wipers",
+                    "isActive": True,
+                }
+            else:
+                if start and (not product['constructionYearStart']
+                              or _month(start) < _month(product['constructionYearStart'])):
+                    product['constructionYearStart'] = start
+                if not end or not product['constructionYearEnd']:
+                    product['constructionYearEnd'] = None  # an entry still in production keeps the end open
+                elif _month(end) > _month(product['constructionYearEnd']):
+                    product['constructionYearEnd'] = end
+            for position in positions:
+                tagged = dict(position, **{key: value for key, value in (('validFrom', start), ('validTo', end))
+                                           if value})
+                if tagged not in product['wipersPositions']:
+                    product['wipersPositions'].append(tagged)
+    yield from products.items()
+
+
+def foreign_positions(entry):
+    """Positions other suppliers added to a wipers product (IMDICAR imports tag theirs with a `brand`)"""
+    return [position for position in entry.get('wipersPositions') or [] if position.get('brand')]
+
+
+def merge_wiper_positions(entry, payload):
+    """Payload to write over an existing wipers product: the Valeo positions are replaced,
+    those of other suppliers are kept"""
+    kept = foreign_positions(entry)
+    return dict(payload, wipersPositions=payload['wipersPositions'] + kept) if kept else payload
+
+
+SOURCES = {
+    'battery': ('battery-products', os.path.join(script_dir, 'json_data', 'exide-battery-products.json'),
+                lambda path, catalog: battery_product_records(path, "Exide", catalog)),
+    'fulmen': ('battery-products', os.path.join(script_dir, 'json_data', 'fulmen-battery-products.json'),
+               lambda path, catalog: battery_product_records(path, "Fulmen Endurance", catalog)),
+    'wipers': ('wipers-products', os.path.join(script_dir, 'wipers', 'wipers_database_janv2026.json'),
+               wiper_product_records),
+}
+
+# Upsert key of the entries of a source
+KEYS = {
+    'battery': 'slug',
+    'fulmen': 'slug',
+    'wipers': 'ref',
+}
+
+# Entries that belong to a source (battery and fulmen share a collection)
+SCOPES = {
+    'battery': ('batteryBrand', 'Exide'),
+    'fulmen': ('batteryBrand', 'Fulmen Endurance'),
+    'wipers': ('category', 'wipers'),
+}
+
+# Collection -> (field, merge): an update combines the entry's current `field` with the payload
+MERGES = {
+    'battery-products': ('motorisations', merge_motorisations),
+    'wipers-products': ('wipersPositions', merge_wiper_positions),
+}
+
+
+def content_hash(payload):
+    """Stable hash of a payload (key order independent)"""
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
+
+
+# --- Transport -----------------------------------------------------------------
+
+class RateLimiter:
+    """Token bucket shared by all workers: `rate` requests per second, bursts up to `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class StrapiClient:
+    """REST client with a keep-alive connection pool sized for the worker pool"""
+
+    def __init__(self, base_url=STRAPI_URL, token=API_TOKEN, workers=8, rate=40, cache=None):
+        """`cache`: http_cache.HttpCache making GETs conditional (If-None-Match / If-Modified-Since)"""
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Content-Type'] = 'application/json'
+        if token:
+            self.session.headers['Authorization'] = f"Bearer {token}"
+        self.limiter = RateLimiter(rate)
+        self.retries = 0
+
+    def request(self, method, endpoint, payload=None):
+        """Send a request, retrying transient failures; a POST is only retried when Strapi rejected it
+        (429/503): a dropped connection or another 5xx may come after the entry was created"""
+        url = f"{self.base_url}/api{endpoint}"
+        cached = self.cache is not None and method == 'GET'
+        idempotent = method != 'POST'
+        retry_statuses = RETRY_STATUSES if idempotent else REJECTED_STATUSES
+        for attempt in range(MAX_RETRIES + 1):
+            self.limiter.acquire()
+            try:
+                response = self.session.request(method, url, json=payload, timeout=30,
+                                                headers=self.cache.conditional_headers(url) if cached else None)
+            except requests.exceptions.ConnectionError:
+                if attempt == MAX_RETRIES or not idempotent:
+                    raise
+                response = None
+            if response is not None and response.status_code not in retry_statuses:
+                if response.status_code == 304 and cached:
+                    return json.loads(self.cache.body(url))
+                response.raise_for_status()
+                if cached:
+                    self.cache.store(url, response)
+                return response.json() if response.content else {}
+            if attempt == MAX_RETRIES:
+                response.raise_for_status()
+            self.retries += 1
+            delay = 0.2 * 2 ** attempt * (1 + random.random())
+            if response is not None and response.headers.get('Retry-After', '').isdigit():
+                delay = max(delay, int(response.headers['Retry-After']))
+            time.sleep(delay)
+
+    def iter_entries(self, collection, fields=None, page_size=100, populate=None, filters=None):
+        """Every entry of a collection, page by page (only `fields` when given, `filters`: field -> value)"""
+        query = ''.join(f"fields[{i}]={field}&" for i, field in enumerate(fields or ()))
+        query += ''.join(f"filters[{field}][$eq]={quote(str(value))}&" for field, value in (filters or {}).items())
+        if populate:
+            query += f"populate={populate}&"
+        page = 1
+        while True:
+            data = self.request('GET', f"/{collection}?{query}pagination[page]={page}"
+                                       f"&pagination[pageSize]={page_size}")
+            yield from data.get('data', [])
+            pagination = data.get('meta', {}).get('pagination', {})
+            if pagination.get('page', page) >= pagination.get('pageCount', 1):
+                return
+            page += 1
+
+    def fetch_index(self, collection, scope=None, key='slug', fields=()):
+        """key -> entry ({documentId, key, *fields}) for every existing entry of a collection
+        (of one source: scope = (field, value))"""
+        filters = dict([scope]) if scope else None
+        index = {}
+        for item in self.iter_entries(collection, fields=[key, *fields], filters=filters):
+            if item.get(key):
+                index[item[key]] = dict(item, documentId=item.get('documentId') or item.get('id'))
+        return index
+
+    def find_document(self, collection, value, key='slug'):
+        """documentId of the entry whose `key` field is `value`, None when there is none"""
+        data = self.request('GET', f"/{collection}?fields[0]={key}&filters[{key}][$eq]={quote(value)}")
+        items = data.get('data') or []
+        return (items[0].get('documentId') or items[0].get('id')) if items else None
+
+    def upsert(self, collection, value, payload, document_id=None, key='slug'):
+        """PUT when the entry (its documentId) is known, POST otherwise; returns (action, documentId)"""
+        if document_id:
+            data = self.request('PUT', f"/{collection}/{document_id}", {"data": payload})
+            return 'updated', (data.get('data') or {}).get('documentId', document_id)
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                data = self.request('POST', f"/{collection}", {"data": payload})
+                return 'created', (data.get('data') or {}).get('documentId')
+            except requests.exceptions.ConnectionError:
+                if attempt == MAX_RETRIES:
+                    raise
+            # The connection dropped: the POST may have been processed, look before posting again
+            time.sleep(0.2 * 2 ** attempt * (1 + random.random()))
+            document_id = self.find_document(collection, value, key)
+            if document_id:
+                return 'created', document_id
+            self.retries += 1
+
+    def delete(self, collection, document_id):
+        """DELETE an entry; an entry already gone (404) counts as deleted"""
+        try:
+            self.request('DELETE', f"/{collection}/{document_id}")
+        except requests.exceptions.HTTPError as e:
+            if e.response is None or e.response.status_code != 404:
+                raise
+        return 'deleted', document_id
+
+
+# --- Journal -------------------------------------------------------------------
+
+class Journal:
+    """Append-only JSON-lines log of written records: {"key", "hash", "documentId", "action"}
+    (key: the upsert key of the source, see KEYS); a "deleted" line forgets the key"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line of an interrupted run
+                    self._record(entry)
+
+    def _record(self, entry):
+        if entry['action'] == 'deleted':
+            self.done.pop(entry['key'], None)
+        else:
+            self.done[entry['key']] = entry
+
+    def is_done(self, key, digest):
+        entry = self.done.get(key)
+        return entry is not None and entry['hash'] == digest
+
+    def append(self, entries):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                self._record(entry)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def reset(self):
+        self.done = {}
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+# --- Import --------------------------------------------------------------------
+
+def run_import(client, collection, records, journal, workers=8, batch_size=100, stop_after=None, existing=None,
+               scope=None, key='slug'):
+    """Upsert `records` ((key, payload) pairs) batch by batch; returns the stats dict
+
+    `existing` (key -> entry with its documentId) defaults to a listing of the
+    collection, restricted to the source's entries by `scope` ((field, value),
+    see SCOPES). An update is merged with the entry's current content first
+    (MERGES); the journal keeps the hash of the source payload.
+    """
+    stats = dict.fromkeys(('created', 'updated', 'deleted', 'skipped', 'duplicates', 'errors'), 0)
+    merge_field, merge = MERGES.get(collection, (None, None))
+    if existing is None:
+        print(f"Listing existing {collection}...")
+        existing = client.fetch_index(collection, scope, key, [merge_field] if merge_field else [])
+        print(f"  {len(existing)} existing entries")
+
+    def write(value, payload, digest):
+        entry = existing.get(value) or journal.done.get(value)
+        if entry and merge:
+            payload = merge(entry, payload)
+        action, document_id = client.upsert(collection, value, payload, entry and entry['documentId'], key)
+        return {"key": value, "hash": digest, "documentId": document_id, "action": action}
+
+    start = time.perf_counter()
+    written = 0
+    batch = []
+    queued = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def flush():
+            nonlocal written
+            futures = [(value, executor.submit(write, value, payload, digest)) for value, payload, digest in batch]
+            entries = []
+            for value, future in futures:
+                try:
+                    entries.append(future.result())
+                except requests.exceptions.RequestException as e:
+                    stats['errors'] += 1
+                    print(f"  Error upserting {value}: {e}")
+            journal.append(entries)
+            for entry in entries:
+                stats[entry['action']] += 1
+            written += len(entries)
+            batch.clear()
+            elapsed = time.perf_counter() - start
+            print(f"  {written} written, {stats['skipped']} unchanged, {stats['errors']} errors "
+                  f"({written / elapsed * 60:,.0f} records/min)")
+
+        for value, payload in records:
+            # Same key twice in the source: concurrent POSTs would create two entries, first one wins
+            if value in queued:
+                stats['duplicates'] += 1
+                continue
+            queued.add(value)
+            digest = content_hash(payload)
+            if journal.is_done(value, digest):
+                stats['skipped'] += 1
+                continue
+            batch.append((value, payload, digest))
+            if len(batch) >= batch_size:
+                flush()
+                if stop_after is not None and written >= stop_after:
+                    print("  Stopping early (simulated interruption)")
+                    break
+        else:
+            if batch:
+                flush()
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['retries'] = client.retries
+    return stats
+
+
+def apply_changeset(client, changeset, journal, workers=8, batch_size=100):
+    """Write only a change set computed by changeset.py: creates, updates, then deletes
+    (update payloads are already merged with the snapshot entries)"""
+    collection = changeset['collection']
+    existing = {item['key']: {"documentId": item['documentId']} for item in changeset['update']}
+    records = [(item['key'], item['payload']) for item in changeset['create'] + changeset['update']]
+    stats = run_import(client, collection, records, journal, workers, batch_size, existing=existing,
+                       key=changeset['keyField'])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [(item['key'], executor.submit(client.delete, collection, item['documentId']))
+                   for item in changeset['delete']]
+        entries = []
+        for value, future in futures:
+            try:
+                action, document_id = future.result()
+                entries.append({"key": value, "hash": None, "documentId": document_id, "action": action})
+                stats['deleted'] += 1
+            except requests.exceptions.RequestException as e:
+                stats['errors'] += 1
+                print(f"  Error deleting {value}: {e}")
+        journal.append(entries)
+    stats['seconds'] += time.perf_counter() - start
+    stats['retries'] = client.retries
+    return stats
+
+
+def print_stats(stats):
+    written = stats['created'] + stats['updated'] + stats['deleted']
+    rate = written / stats['seconds'] * 60 if stats['seconds'] else 0
+    print(f"\nCreated: {stats['created']}  Updated: {stats['updated']}  Deleted: {stats['deleted']}  "
+          f"Unchanged (journal): {stats['skipped']}  "
+          f"Duplicate keys: {stats['duplicates']}  Errors: {stats['errors']}  Retries: {stats['retries']}")
+    print(f"Throughput: {rate:,.0f} records/min ({stats['seconds']:.1f}s)")
+
+
+def finish(journal, stats):
+    """Clear the journal of a completed import; keep it for a resume when records failed"""
+    if stats['errors']:
+        print(f"Journal kept for a resume: {os.path.relpath(journal.path, script_dir)}")
+    else:
+        journal.reset()
+
+
+# --- Stand-in server for --bench -----------------------------------------------
+
+def start_stand_in_server(latency=0.02, failure_rate=0.02):
+    """Minimal in-memory Strapi REST look-alike on a free local port (keep-alive, injected errors)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    store = {}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body=None, headers=()):
+            data = json.dumps(body).encode('utf-8') if body is not None else b''
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def _handle(self, method):
+            time.sleep(latency)
+            body = self._body() if method in ('POST', 'PUT') else None
+            if method != 'GET' and random.random() < failure_rate:
+                return self._send(random.choice((429, 503)), {"error": "transient"}, [('Retry-After', '0')])
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/')  # api, collection[, documentId]
+            collection = store.setdefault(parts[1], {})
+            with lock:
+                if method == 'GET':
+                    query = parse_qs(url.query)
+                    page = int(query.get('pagination[page]', ['1'])[0])
+                    size = int(query.get('pagination[pageSize]', ['25'])[0])
+                    filters = {key[len('filters['):-len('][$eq]')]: values[0] for key, values in query.items()
+                               if key.startswith('filters[') and key.endswith('][$eq]')}
+                    items = [item for item in collection.values()
+                             if all(str(item.get(field)) == value for field, value in filters.items())]
+                    page_count = max(1, -(-len(items) // size))
+                    body = {"data": items[(page - 1) * size:page * size],
+                            "meta": {"pagination": {"page": page, "pageCount": page_count}}}
+                    # Same validator as src/middlewares/conditional-get.ts: weak ETag, sha1 of the JSON body
+                    digest = hashlib.sha1(json.dumps(body, separators=(',', ':')).encode('utf-8')).digest()
+                    etag = 'W/"%s"' % base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+                    if self.headers.get('If-None-Match') == etag:
+                        return self._send(304, headers=[('ETag', etag)])
+                    return self._send(200, body, [('ETag', etag)])
+                if method == 'POST':
+                    document_id = f"doc{len(collection) + 1:06d}"
+                    collection[document_id] = dict(body['data'], documentId=document_id)
+                    return self._send(201, {"data": collection[document_id]})
+                if len(parts) < 3 or parts[2] not in collection:
+                    return self._send(404, {"error": "not found"})
+                if method == 'DELETE':
+                    del collection[parts[2]]
+                    return self._send(204)
+                collection[parts[2]].update(body['data'])
+                return self._send(200, {"data": collection[parts[2]]})
+
+        def do_GET(self):
+            self._handle('GET')
+
+        def do_POST(self):
+            self._handle('POST')
+
+        def do_PUT(self):
+            self._handle('PUT')
+
+        def do_DELETE(self):
+            self._handle('DELETE')
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, store
+
+
+def _bench_records(count):
+    for i in range(count):
+        name = f"BRAND{i % 50} MODEL {i}"
+        yield slugify(name), {"name": name, "slug": slugify(name), "brandName": f"BRAND{i % 50}",
+                              "modelName": f"MODEL {i}", "motorisations": [{"motorisation": f"{i % 30} TDI"}]}
+
+
+def bench(count=3000, workers=16, rate=0):
+    server, store = start_stand_in_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    journal = Journal(os.path.join(journal_dir, 'bench.jsonl'))
+    journal.reset()
+    print(f"Stand-in Strapi at {url} (20 ms latency, 2% transient 429/503)")
+
+    print(f"\n1. Import interrupted after half of {count} records")
+    stats = run_import(StrapiClient(url, workers=workers, rate=rate), 'battery-products',
+                       _bench_records(count), journal, workers=workers, stop_after=count // 2)
+    print_stats(stats)
+
+    print("\n2. Resumed import")
+    journal = Journal(journal.path)
+    stats = run_import(StrapiClient(url, workers=workers, rate=rate), 'battery-products',
+                       _bench_records(count), journal, workers=workers)
+    print_stats(stats)
+
+    print(f"\nStand-in store: {len(store['battery-products'])} entries (expected {count})")
+    journal.reset()
+    server.shutdown()
+
+
+def main(args):
+    options = {'--workers': 8, '--rate': 40, '--batch': 100}
+    name = args[0] if args else None
+    for i, arg in enumerate(args):
+        if arg in options and i + 1 < len(args):
+            options[arg] = int(args[i + 1])
+
+    if name == '--bench':
+        count = int(args[1]) if len(args) > 1 and args[1].isdigit() else 3000
+        bench(count)
+        return
+    if name not in SOURCES:
+        print("Usage: python3 strapi_import.py battery|fulmen|wipers [--workers N] [--rate N] [--batch N] [--restart]"
+              " [--changeset] | --bench [records]")
+        return
+
+    with RunMetrics(f"strapi-import-{name}") as metrics:
+        metrics.stage('import')
+        if '--changeset' in args:
+            from changeset import changeset_file
+            path = changeset_file(name)
+            if not os.path.exists(path):
+                sys.exit(f"{path} not found, run 'python3 changeset.py diff {name}' first")
+            changeset = load_json(path, use_cache=False)
+            journal = Journal(os.path.join(journal_dir, f"{name}.changeset-{content_hash(changeset)[:12]}.jsonl"))
+            if journal.done:
+                print(f"Resuming: {len(journal.done)} records of this change set already written")
+            client = StrapiClient(workers=options['--workers'], rate=options['--rate'])
+            print(f"Applying {os.path.basename(path)} to {STRAPI_URL}/api/{changeset['collection']}: "
+                  f"{len(changeset['create'])} creates, {len(changeset['update'])} updates, "
+                  f"{len(changeset['delete'])} deletes")
+            stats = apply_changeset(client, changeset, journal, options['--workers'], options['--batch'])
+            print_stats(stats)
+            Journal(os.path.join(journal_dir, f"{name}.jsonl")).reset()
+            finish(journal, stats)
+            metrics.counts(stats)
+            metrics.count('rows_in', sum(len(changeset[kind]) for kind in ('create', 'update', 'delete')))
+            metrics.count('rows_out', stats['created'] + stats['updated'] + stats['deleted'])
+            return
+
+        collection, path, records = SOURCES[name]
+        if not os.path.exists(path):
+            sys.exit(f"{path} not found")
+        journal = Journal(os.path.join(journal_dir, f"{name}.jsonl"))
+        if '--restart' in args:
+            journal.reset()
+        elif journal.done:
+            print(f"Resuming: {len(journal.done)} records already in the journal")
+
+        client = StrapiClient(workers=options['--workers'], rate=options['--rate'])
+        print(f"Importing {os.path.basename(path)} into {STRAPI_URL}/api/{collection} "
+              f"({options['--workers']} workers, {options['--rate']} req/s)")
+        catalog = Catalog.fetch(client)
+        stats = run_import(client, collection, records(path, catalog), journal, workers=options['--workers'],
+                           batch_size=options['--batch'], scope=SCOPES[name], key=KEYS[name])
+        print_stats(stats)
+        if catalog.unresolved:
+            print(f"Not in Strapi ({len(catalog.unresolved)}, imported without relations or skipped): "
+                  + ', '.join(sorted(catalog.unresolved)[:20]) + (' ...' if len(catalog.unresolved) > 20 else ''))
+        finish(journal, stats)
+        metrics.counts(stats)
+        metrics.count('rows_in', sum(stats[key] for key in ('created', 'updated', 'skipped', 'duplicates', 'errors')))
+        metrics.count('rows_out', stats['created'] + stats['updated'])
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Constant-memory Strapi exports for fetch_brands.py, fetch_models.py and
+fetch_models_without_brand.py.
+
+Entries are written as each page arrives instead of being collected in a
+list first. Output goes to a temp file next to the target and is renamed
+over it (after fsync) only once the last page is in, so an interrupted or
+failed fetch leaves the previous export untouched.
+
+Two formats:
+- JsonDocumentWriter: the usual {"data": [...], "meta": {...}} document, byte
+  for byte what json.dump(..., indent=2) produced, so load_json readers are
+  unchanged;
+- NdjsonWriter (--ndjson): one entry per line, read back with iter_ndjson().
+
+    python3 stream_fetch.py --bench [entries]   # peak memory vs collection size
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def _umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+class _AtomicWriter:
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+        self._tmp = None
+
+    def __enter__(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, self._tmp = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.path)}.", suffix='.tmp')
+        self._file = os.fdopen(fd, 'w', encoding='utf-8')
+        self.begin()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.end()
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self._file.close()
+            if exc_type is None:
+                os.chmod(self._tmp, 0o666 & ~_umask())  # mkstemp creates 0600 files
+                os.replace(self._tmp, self.path)
+        finally:
+            if os.path.exists(self._tmp):
+                os.unlink(self._tmp)
+        return False
+
+    def write_all(self, entries):
+        for entry in entries:
+            self.write(entry)
+        return self.count
+
+    def begin(self):
+        pass
+
+    def end(self):
+        pass
+
+
+class NdjsonWriter(_AtomicWriter):
+    def write(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False))
+        self._file.write('\n')
+        self.count += 1
+
+
+class JsonDocumentWriter(_AtomicWriter):
+    """{"data": [entries], "meta": meta} laid out exactly like json.dump(indent=2)"""
+
+    def __init__(self, path, meta=None):
+        """`meta`: extra fields written in "meta" after the entry count"""
+        super().__init__(path)
+        self.meta = meta or {}
+
+    def begin(self):
+        self._file.write('{\n  "data": [')
+
+    def write(self, entry):
+        self._file.write(',\n    ' if self.count else '\n    ')
+        self._file.write(json.dumps(entry, indent=2, ensure_ascii=False).replace('\n', '\n    '))
+        self.count += 1
+
+    def end(self):
+        meta = dict({"total": self.count}, **self.meta)
+        self._file.write('\n  ],\n' if self.count else '],\n')
+        self._file.write('  "meta": ' + json.dumps(meta, indent=2, ensure_ascii=False).replace('\n', '\n  '))
+        self._file.write('\n}')
+
+
+def iter_ndjson(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def bench(count=50000):
+    """Peak traced memory of a streamed export against a list + json.dump export"""
+    def entries():
+        for i in range(count):
+            yield {"id": i, "documentId": f"doc{i:08d}", "name": f"MODEL {i}", "slug": f"model-{i}",
+                   "isActive": True, "brand": {"id": i % 300, "name": f"BRAND {i % 300}"}}
+
+    directory = tempfile.mkdtemp()
+    results = {}
+    for label in ('list + json.dump', 'JsonDocumentWriter', 'NdjsonWriter'):
+        path = os.path.join(directory, label.split()[0] + '.json')
+        tracemalloc.start()
+        start = time.perf_counter()
+        if label == 'list + json.dump':
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({"data": list(entries()), "meta": {"total": count}}, f, indent=2, ensure_ascii=False)
+        else:
+            with (JsonDocumentWriter if label == 'JsonDocumentWriter' else NdjsonWriter)(path) as writer:
+                writer.write_all(entries())
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[label] = path
+        print(f"{label:<20} {count:,} entries: peak {peak / 1024 / 1024:7.1f} MB, {elapsed:.2f}s, "
+              f"{os.path.getsize(path) / 1024 / 1024:.1f} MB on disk")
+    with open(results['list + json.dump'], 'rb') as a, open(results['JsonDocumentWriter'], 'rb') as b:
+        print(f"Streamed document identical to json.dump output: {a.read() == b.read()}")
+    for path in results.values():
+        os.unlink(path)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['--bench']:
+        bench(int(args[1]) if len(args) > 1 else 50000)
+    else:
+        print("Usage: python3 stream_fetch.py --bench [entries]")
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Compiled record validators for the pipeline outputs.
+
+Shapes are declared once below (Text / Obj / ListOf nodes) and turned into
+plain Python functions by generating their source and compiling it: no
+per-record schema walking, only straight-line isinstance checks, precompiled
+regex matches and direct key lookups. A valid record costs one function call
+and returns None; an invalid one returns [(field path, rule), ...].
+
+Shapes:
+- battery-product, battery-product-header, motorisation (Exide transform / Fulmen ingestion)
+- wiper-entry (Valeo wipers database; WiperEntry records are checked through to_json())
+- brand, model (Strapi exports json_data/brands.json / models.json)
+
+Producers validate inline while they stream (ValidationReport.check with a
+provenance string such as "vehicles[1234]" or "CSV line 57") and write a
+compact report under json_data/validation-reports/: per rule counts plus the
+first samples with their provenance.
+
+    python3 validators.py [file ...]     # validate existing outputs
+    python3 validators.py --bench [n]    # n synthetic records (default 1,000,000)
+    python3 validators.py --source <shape>
+    python3 validators.py --check        # known invalid records (nested objects included)
+"""
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+from battery_encoding import load_battery_products
+from json_cache import load_json
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+reports_dir = os.path.join(script_dir, 'json_data', 'validation-reports')
+
+SLUG = r'[a-z0-9]+(?:-[a-z0-9]+)*\Z'
+ISO_MONTH = r'\d{4}-(?:0[1-9]|1[0-2])-01\Z'           # convert_date output
+VALEO_MONTH = r'(?:0?[1-9]|1[0-2])?/\d{4}\Z'          # productionYears start/end
+
+
+class Text:
+    """String field. required: key present and not None; allow_empty: '' accepted"""
+
+    def __init__(self, required=True, allow_empty=False, pattern=None, nullable=False):
+        self.required = required
+        self.allow_empty = allow_empty
+        self.pattern = pattern
+        self.nullable = nullable
+
+
+class Obj:
+    """Dict field; `checks` are (rule name, python expression on `r`) evaluated when the fields are valid"""
+
+    def __init__(self, fields, checks=()):
+        self.fields = fields
+        self.checks = checks
+
+
+class ListOf:
+    """List field; items are validated with `item` (None: only the list itself is checked)"""
+
+    def __init__(self, item=None, min_items=0):
+        self.item = item
+        self.min_items = min_items
+
+
+BATTERY = Obj({
+    'option1': Text(allow_empty=True),
+    'option2': Text(allow_empty=True),
+    'option3': Text(allow_empty=True),
+})
+
+MOTORISATION = Obj({
+    'motorisation': Text(),
+    'fuel': Text(),
+    'startDate': Text(pattern=ISO_MONTH),
+    'endDate': Text(allow_empty=True, pattern=ISO_MONTH),
+    'batteryAGM': BATTERY,
+    'batteryEFB': BATTERY,
+    'batteryPremium': BATTERY,
+    'batteryExcell': BATTERY,
+    'batteryClassic': BATTERY,
+}, checks=[
+    ('endDate before startDate', "not r['endDate'] or r['startDate'] <= r['endDate']"),
+])
+
+_PRODUCT_FIELDS = {
+    'brand': Text(),
+    'brandSlug': Text(pattern=SLUG),
+    'model': Text(),
+    'modelSlug': Text(pattern=SLUG),
+}
+BATTERY_PRODUCT_HEADER = Obj(dict(_PRODUCT_FIELDS, motorisations=ListOf(min_items=1)))
+BATTERY_PRODUCT = Obj(dict(_PRODUCT_FIELDS, motorisations=ListOf(MOTORISATION, min_items=1)))
+
+REF = Text(required=False, nullable=True)
+WIPER_ENTRY = Obj({
+    'id': Text(),
+    'model': Text(),
+    'picto1': Text(allow_empty=True),
+    'picto2': Text(allow_empty=True),
+    'direction': Text(allow_empty=True),
+    'productionYears': Obj({
+        'start': Text(nullable=True, pattern=VALEO_MONTH),
+        'end': Text(required=False, nullable=True, pattern=VALEO_MONTH),
+    }),
+    'wipers': Obj({
+        'multiconnexion': Obj({'kitAvant': REF, 'coteConducteur': REF, 'monoBalais': REF, 'cotePassager': REF}),
+        'standard': Obj({'coteConducteur': REF, 'monoBalais': REF, 'cotePassager': REF}),
+        'arriere': REF,
+    }, checks=[
+        ('no wiper ref', "any(r['multiconnexion'].values()) or any(r['standard'].values()) or r['arriere']"),
+    ]),
+})
+
+BRAND = Obj({'name': Text(), 'slug': Text(pattern=SLUG)})
+MODEL = Obj({'name': Text(), 'slug': Text(pattern=SLUG)})
+
+SHAPES = {
+    'battery-product': BATTERY_PRODUCT,
+    'battery-product-header': BATTERY_PRODUCT_HEADER,
+    'motorisation': MOTORISATION,
+    'wiper-entry': WIPER_ENTRY,
+    'brand': BRAND,
+    'model': MODEL,
+}
+
+
+# --- Code generation -----------------------------------------------------------
+
+class _Generator:
+    def __init__(self):
+        self.lines = []
+        self.patterns = {}
+        self.depth = 0
+
+    def pattern(self, regex):
+        if regex not in self.patterns:
+            self.patterns[regex] = f"_p{len(self.patterns)}"
+        return self.patterns[regex]
+
+    def emit(self, indent, line):
+        self.lines.append('    ' * indent + line)
+
+    def error(self, indent, path, rule):
+        self.emit(indent, f"e.append(({path}, {rule!r}))")
+
+    def obj(self, node, var, path, indent):
+        """Checks for dict `var`; `path` is a python expression giving its field path prefix"""
+        self.emit(indent, f"if hasattr({var}, 'to_json'): {var} = {var}.to_json()")
+        self.emit(indent, f"if not isinstance({var}, dict):")
+        self.error(indent + 1, path or "''", 'not an object')
+        self.emit(indent, "else:")
+        # One error-count marker per nesting level: a nested Obj must not reset its parent's
+        mark = f"n{self.depth}"
+        self.emit(indent + 1, f"{mark} = len(e)")
+        for name, child in node.fields.items():
+            child_path = f"{path} + '.{name}'" if path else repr(name)
+            self.depth += 1
+            value = f"v{self.depth}"
+            self.emit(indent + 1, f"{value} = {var}.get({name!r})")
+            self.field(child, value, child_path, indent + 1)
+            self.depth -= 1
+        if node.checks:
+            self.emit(indent + 1, f"if len(e) == {mark}:")
+            self.emit(indent + 2, f"r = {var}")
+            for rule, expression in node.checks:
+                self.emit(indent + 2, f"if not ({expression}):")
+                self.error(indent + 3, path or "''", rule)
+
+    def field(self, node, var, path, indent):
+        if isinstance(node, Text):
+            self.text(node, var, path, indent)
+        elif isinstance(node, Obj):
+            self.emit(indent, f"if {var} is None:")
+            self.error(indent + 1, path, 'missing')
+            self.emit(indent, "else:")
+            self.obj(node, var, path, indent + 1)
+        elif isinstance(node, ListOf):
+            self.emit(indent, f"if not isinstance({var}, list):")
+            self.error(indent + 1, path, 'not a list')
+            if node.min_items:
+                self.emit(indent, f"elif len({var}) < {node.min_items}:")
+                self.error(indent + 1, path, 'empty list' if node.min_items == 1 else f'fewer than {node.min_items} items')
+            if node.item is not None:
+                self.emit(indent, "else:")
+                index = f"i{self.depth}"
+                item = f"x{self.depth}"
+                self.emit(indent + 1, f"for {index}, {item} in enumerate({var}):")
+                self.depth += 1
+                self.obj(node.item, item, f"{path} + '[' + str({index}) + ']'", indent + 2)
+                self.depth -= 1
+
+    def text(self, node, var, path, indent):
+        self.emit(indent, f"if {var} is None:")
+        if node.required and not node.nullable:
+            self.error(indent + 1, path, 'missing')
+        else:
+            self.emit(indent + 1, "pass")
+        self.emit(indent, f"elif not isinstance({var}, str):")
+        self.error(indent + 1, path, 'not a string')
+        self.emit(indent, f"elif not {var}.strip():")
+        if node.allow_empty or node.nullable:
+            self.emit(indent + 1, "pass")
+        else:
+            self.error(indent + 1, path, 'empty')
+        if node.pattern:
+            self.emit(indent, f"elif not {self.pattern(node.pattern)}({var}):")
+            self.error(indent + 1, path, 'bad format')
+
+
+def compile_validator(node, name='validate'):
+    """Generate and compile `validate(record) -> None | [(path, rule), ...]` for a shape"""
+    generator = _Generator()
+    generator.obj(node, 'rec', '', 1)
+    body = generator.lines
+    source = '\n'.join([f"def {name}(rec):", "    e = []"] + body + ["    return e or None"])
+    namespace = {f"{var}": re.compile(regex).match for regex, var in generator.patterns.items()}
+    exec(compile(source, f"<validator {name}>", 'exec'), namespace)
+    validator = namespace[name]
+    validator.source = source
+    return validator
+
+
+VALIDATORS = {name: compile_validator(node, 'validate_' + name.replace('-', '_')) for name, node in SHAPES.items()}
+
+
+# --- Report --------------------------------------------------------------------
+
+class ValidationReport:
+    """Per-rule error counts with the first `samples` occurrences (provenance + value) per rule"""
+
+    def __init__(self, stage, samples=20):
+        self.stage = stage
+        self.samples = samples
+        self.checked = Counter()
+        self.invalid = Counter()
+        self.errors = Counter()
+        self.examples = {}
+
+    def check(self, shape, record, where=None):
+        """Validate one record; returns True when valid (records are never modified or dropped)"""
+        self.checked[shape] += 1
+        errors = VALIDATORS[shape](record)
+        if errors is None:
+            return True
+        self.invalid[shape] += 1
+        for path, rule in errors:
+            key = f"{shape}: {path}: {rule}"
+            self.errors[key] += 1
+            examples = self.examples.setdefault(key, [])
+            if len(examples) < self.samples:
+                examples.append({"where": where, "value": _value_at(record, path)})
+        return False
+
+    def stream(self, shape, records, where=None):
+        """Yield `records` unchanged while validating them; `where(index, record)` gives provenance"""
+        check = self.check
+        for index, record in enumerate(records):
+            check(shape, record, where(index, record) if where else index)
+            yield record
+
+    def to_json(self):
+        return {
+            "stage": self.stage,
+            "checked": dict(self.checked),
+            "invalid": dict(self.invalid),
+            "errors": [{"rule": key, "count": count, "samples": self.examples[key]}
+                       for key, count in self.errors.most_common()],
+        }
+
+    def write(self):
+        os.makedirs(reports_dir, exist_ok=True)
+        path = os.path.join(reports_dir, f"{self.stage}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_json(), f, indent=2, ensure_ascii=False)
+        return path
+
+    def print_summary(self):
+        for shape, count in self.checked.items():
+            print(f"Validation [{shape}]: {count} checked, {self.invalid[shape]} invalid")
+        for key, count in self.errors.most_common(10):
+            first = self.examples[key][0]
+            print(f"  {count:>6} x {key}  (first: {first['where']}, value {first['value']!r})")
+
+
+def _value_at(record, path):
+    """Value of a field path such as motorisations[3].startDate (for report samples)"""
+    value = record.to_json() if hasattr(record, 'to_json') else record
+    for part in re.findall(r'[^.\[\]]+|\[\d+\]', path):
+        if hasattr(value, 'to_json'):
+            value = value.to_json()
+        try:
+            value = value[int(part[1:-1])] if part.startswith('[') else value.get(part)
+        except (AttributeError, IndexError, TypeError):
+            return None
+    return value if isinstance(value, (str, int, float, bool, type(None))) else type(value).__name__
+
+
+# --- CLI -----------------------------------------------------------------------
+
+DEFAULT_FILES = [
+    ('battery-product', os.path.join(script_dir, 'json_data', 'exide-battery-products.json')),
+    ('battery-product', os.path.join(script_dir, 'json_data', 'fulmen-battery-products.json')),
+    ('wiper-entry', os.path.join(script_dir, 'wipers', 'wipers_database_janv2026.json')),
+    ('brand', os.path.join(script_dir, 'json_data', 'brands.json')),
+    ('model', os.path.join(script_dir, 'json_data', 'models.json')),
+]
+
+
+def iter_file_records(shape, data):
+    """(provenance, record) pairs of a loaded output file"""
+    if shape == 'wiper-entry':
+        for brand, entries in data.get('brands', {}).items():
+            for index, entry in enumerate(entries):
+                yield f"brands[{brand}][{index}]", entry
+    elif isinstance(data, dict):
+        for index, item in enumerate(data.get('data', [])):
+            yield f"data[{index}]", item
+    else:
+        for index, item in enumerate(data):
+            yield f"[{index}]", item
+
+
+def validate_files(files):
+    report = ValidationReport('outputs')
+    for shape, path in files:
+        if not os.path.exists(path):
+            continue
+        print(f"Validating {os.path.relpath(path, script_dir)} as {shape}...")
+        data = load_battery_products(path) if shape == 'battery-product' else load_json(path)
+        for where, record in iter_file_records(shape, data):
+            report.check(shape, record, f"{os.path.basename(path)} {where}")
+    report.print_summary()
+    print(f"Report saved to {report.write()}")
+
+
+def _bench_records(count):
+    good = {
+        "brand": "VOLKSWAGEN", "brandSlug": "volkswagen", "model": "GOLF VII", "modelSlug": "golf-vii",
+        "motorisations": [{
+            "motorisation": "1.6 TDI", "fuel": "Diesel", "startDate": "2012-08-01", "endDate": "2019-12-01",
+            "batteryAGM": {"option1": "EK700", "option2": "", "option3": ""},
+            "batteryEFB": {"option1": "EL752", "option2": "", "option3": ""},
+            "batteryPremium": {"option1": "", "option2": "", "option3": ""},
+            "batteryExcell": {"option1": "", "option2": "", "option3": ""},
+            "batteryClassic": {"option1": "EB740", "option2": "", "option3": ""},
+        }],
+    }
+    bad = json.loads(json.dumps(good))
+    bad["modelSlug"] = ""
+    bad["motorisations"][0]["startDate"] = ""
+    for i in range(count):
+        yield bad if i % 1000 == 0 else good
+
+
+# Records whose errors are known: nested invalid input must be reported, never crash the checks
+SELF_CHECKS = [
+    ('wiper-entry', {"id": "1", "model": "Golf", "picto1": "", "picto2": "", "direction": "LHD",
+                     "productionYears": {"start": "01/2012", "end": None},
+                     "wipers": {"multiconnexion": None, "standard": {"coteConducteur": "VS 32"}, "arriere": None}},
+     [('wipers.multiconnexion', 'missing')]),
+    ('wiper-entry', {"id": "1", "model": "Golf", "picto1": "", "picto2": "", "direction": "LHD",
+                     "productionYears": {"start": "01/2012"},
+                     "wipers": {"multiconnexion": {}, "standard": "VS 32", "arriere": None}},
+     [('wipers.standard', 'not an object')]),
+    ('wiper-entry', {"id": "1", "model": "Golf", "picto1": "", "picto2": "", "direction": "LHD",
+                     "productionYears": {"start": "01/2012"},
+                     "wipers": {"multiconnexion": {}, "standard": {}, "arriere": None}},
+     [('wipers', 'no wiper ref')]),
+    ('battery-product', {"brand": "VW", "brandSlug": "vw", "model": "Golf", "modelSlug": "golf",
+                         "motorisations": [{"motorisation": "1.6 TDI", "fuel": "Diesel", "startDate": "2012-08-01",
+                                            "endDate": "2010-01-01", "batteryAGM": None,
+                                            **{slot: {"option1": "", "option2": "", "option3": ""} for slot in
+                                               ('batteryEFB', 'batteryPremium', 'batteryExcell', 'batteryClassic')}}]},
+     [('motorisations[0].batteryAGM', 'missing')]),
+]
+
+
+def self_check():
+    """Run SELF_CHECKS; exits non-zero when a validator disagrees"""
+    failures = 0
+    for shape, record, expected in SELF_CHECKS:
+        try:
+            errors = VALIDATORS[shape](record) or []
+        except Exception as e:
+            errors = [('<raised>', repr(e))]
+        if sorted(errors) != sorted(expected):
+            failures += 1
+            print(f"  {shape}: expected {expected}, got {errors}")
+    print(f"{len(SELF_CHECKS) - failures}/{len(SELF_CHECKS)} self checks passed")
+    if failures:
+        sys.exit(1)
+
+
+def bench(count=1000000):
+    report = ValidationReport('bench')
+    records = list(_bench_records(count))
+    start = time.perf_counter()
+    for _ in report.stream('battery-product', records):
+        pass
+    elapsed = time.perf_counter() - start
+    print(f"battery-product: {count:,} records in {elapsed:.2f}s "
+          f"({elapsed / count * 1e5:.3f}s per 100k, {elapsed / count * 1e6:.2f} µs/record)")
+    report.print_summary()
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['--bench']:
+        bench(int(args[1]) if len(args) > 1 else 1000000)
+    elif args[:1] == ['--check']:
+        self_check()
+    elif args[:1] == ['--source'] and len(args) == 2:
+        print(VALIDATORS[args[1]].source)
+    elif args:
+        validate_files([(next((s for s, p in DEFAULT_FILES if os.path.basename(p) == os.path.basename(a)),
+                              'battery-product'), a) for a in args])
+    else:
+        validate_files(DEFAULT_FILES)
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Watch mode: rebuild the outputs affected by new supplier files.
+
+Operators drop deliveries into liste_affectation/ (Valeo CSV, Exide CSV or
+exide-vehicles-by-brand.json, Fulmen workbook) and Strapi snapshots land in
+json_data/. This process watches those directories (inotify, or stat
+polling where inotify is not available), waits until a burst of changes
+has been quiet for --debounce seconds (a copy in progress keeps writing),
+then runs the STAGES whose inputs changed, in order:
+
+    parse      valeo-parse, exide-csv, exide-by-brand, exide-brands, exide-transform, fulmen-ingest
+    reports    brand-reconciliation, part-index
+    diff       diff-battery, diff-fulmen, diff-wipers   (changeset.py against the Strapi snapshots)
+    seed       seed-engines, seed-wipers, seed-intervals, seed-selection
+
+A stage is stale when the content of one of its inputs differs from its
+last successful run (size and mtime first, blake2b of the content when they
+moved), so a stage whose output comes out identical does not wake up the
+stages downstream. Fingerprints are kept in scripts/.cache/watch-state.json.
+A failed stage is retried on the next change; stages missing a required
+input are skipped.
+
+    python3 watch_pipeline.py [--seed tablet-app.db] [--debounce 2] [--poll [seconds]]
+    python3 watch_pipeline.py once      # run the stale stages and exit
+    python3 watch_pipeline.py status    # stale stages and why
+    python3 watch_pipeline.py adopt     # record the current inputs as built, without running anything
+
+seed_optimizer.py is not part of the watch: it rewrites ids and belongs to
+the release build, after the last seed stage.
+"""
+import ctypes
+import ctypes.util
+import glob
+import hashlib
+import json
+import os
+import select
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+from seed_db import SEED_DB_PATH
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+state_file = os.path.join(script_dir, '.cache', 'watch-state.json')
+
+PYTHON = sys.executable
+SEED = '{seed}'
+NEWEST = '{newest}'
+
+IGNORED_PREFIXES = ('.', '~$')  # temp files of the writers, Office lock files
+IGNORED_SUFFIXES = ('.tmp', '.part', '.swp', '.crdownload')
+
+
+class Stage:
+    """A pipeline step: `command` is run in scripts/ when one of `inputs` (globs) changed
+
+    `optional` inputs are fingerprinted but not required to exist. In the
+    command, {seed} is the seed DB path and {newest} the most recent file
+    matching the first input.
+    """
+
+    def __init__(self, name, inputs, command, optional=(), outputs=()):
+        self.name = name
+        self.inputs = list(inputs)
+        self.optional = list(optional)
+        self.command = command
+        self.outputs = list(outputs)
+
+
+EXIDE_PRODUCTS = 'json_data/exide-battery-products.json'
+FULMEN_PRODUCTS = 'json_data/fulmen-battery-products.json'
+VALEO_DATABASE = 'wipers/wipers_database_janv2026.json'
+ENGINES = 'json_data/exide-motorisation-engines.json'
+EXIDE_VEHICLES = 'liste_affectation/exide-vehicles.json'
+EXIDE_BY_BRAND = 'liste_affectation/exide-vehicles-by-brand.json'
+EXIDE_BRANDS = 'json_data/exide-brands.json'
+
+STAGES = [
+    # parse / transform
+    Stage('valeo-parse', ['liste_affectation/*VALEO*.csv'],
+          [PYTHON, 'wipers/parse_valeo_janv2026.py', NEWEST], outputs=[VALEO_DATABASE]),
+    Stage('exide-csv', ['liste_affectation/Exide*.csv'],
+          ['node', 'convert-exide-csv-to-json.js'], outputs=[EXIDE_VEHICLES]),
+    Stage('exide-by-brand', [EXIDE_VEHICLES],
+          ['node', 'reorganize-exide-by-brand.js'], outputs=[EXIDE_BY_BRAND]),
+    Stage('exide-brands', [EXIDE_BY_BRAND],
+          [PYTHON, 'extract_brands_from_exide.py'], outputs=[EXIDE_BRANDS]),
+    Stage('exide-transform', [EXIDE_VEHICLES],
+          [PYTHON, 'transform-exide-to-battery-products.py'], outputs=[EXIDE_PRODUCTS, ENGINES]),
+    Stage('fulmen-ingest', ['liste_affectation/*FULMEN*.xlsx'],
+          [PYTHON, 'ingest_fulmen.py', NEWEST], outputs=[FULMEN_PRODUCTS]),
+    # reports
+    Stage('brand-reconciliation', ['json_data/brands.json'],
+          [PYTHON, 'brand_reconciliation.py'],
+          optional=[EXIDE_BY_BRAND, EXIDE_BRANDS, 'json_data/models.json', VALEO_DATABASE, FULMEN_PRODUCTS]),
+    Stage('part-index', [VALEO_DATABASE], [PYTHON, 'part_index.py', 'build'],
+          optional=[EXIDE_PRODUCTS, FULMEN_PRODUCTS]),
+    # diff against the Strapi snapshots (changeset.py fetch ...)
+    Stage('diff-battery', [EXIDE_PRODUCTS, 'json_data/strapi-battery-products.json'],
+          [PYTHON, 'changeset.py', 'diff', 'battery']),
+    Stage('diff-fulmen', [FULMEN_PRODUCTS, 'json_data/strapi-battery-products.json'],
+          [PYTHON, 'changeset.py', 'diff', 'fulmen']),
+    Stage('diff-wipers', [VALEO_DATABASE, 'json_data/strapi-wipers-products.json'],
+          [PYTHON, 'changeset.py', 'diff', 'wipers']),
+    # seed tables
+    Stage('seed-engines', [ENGINES], [PYTHON, 'motorisation_parser.py', 'seed', SEED]),
+    Stage('seed-wipers', [VALEO_DATABASE], [PYTHON, 'wiper_sets.py', 'seed', SEED]),
+    Stage('seed-intervals', [], [PYTHON, 'date_index.py', 'seed', SEED],
+          optional=[EXIDE_PRODUCTS, VALEO_DATABASE]),
+    Stage('seed-selection', [], [PYTHON, 'selection_tables.py', 'seed', SEED, '--categories', 'battery,wipers'],
+          optional=[EXIDE_PRODUCTS, FULMEN_PRODUCTS, VALEO_DATABASE]),
+]
+
+
+# --- Fingerprints ---------------------------------------------------------------
+
+def _matches(pattern):
+    return sorted(path for path in glob.glob(os.path.join(script_dir, pattern)) if os.path.isfile(path))
+
+
+def _digest(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fingerprint(stage, previous=None):
+    """{relative path: [size, mtime_ns, digest]} of the stage inputs; None when a required input is missing"""
+    previous = previous or {}
+    files = []
+    for pattern in stage.inputs:
+        matches = _matches(pattern)
+        if not matches:
+            return None
+        files.extend(matches)
+    for pattern in stage.optional:
+        files.extend(_matches(pattern))
+    if not files:
+        return None
+    result = {}
+    for path in files:
+        key = os.path.relpath(path, script_dir)
+        stat = os.stat(path)
+        known = previous.get(key)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            result[key] = known
+        else:
+            result[key] = [stat.st_size, stat.st_mtime_ns, _digest(path)]
+    return result
+
+
+def changed_inputs(current, previous):
+    """Inputs added, removed or with a different content since `previous`"""
+    if previous is None:
+        return sorted(current)
+    changed = [path for path, (_, _, digest) in current.items()
+               if path not in previous or previous[path][2] != digest]
+    return sorted(changed + [path for path in previous if path not in current])
+
+
+def load_state():
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state):
+    os.makedirs(os.path.dirname(state_file), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(state_file), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, state_file)
+
+
+# --- Runner ------------------------------------------------------------------------
+
+def _log(message):
+    print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+
+def command_line(stage, seed):
+    newest = None
+    if NEWEST in stage.command:
+        newest = max(_matches(stage.inputs[0]), key=os.path.getmtime)
+    return [seed if part == SEED else newest if part == NEWEST else part for part in stage.command]
+
+
+def run_stage(stage, seed):
+    """Run one stage with its output prefixed; True when it exited with 0"""
+    command = command_line(stage, seed)
+    if shutil.which(command[0]) is None and not os.path.exists(command[0]):
+        _log(f"{stage.name}: {command[0]} not found, skipped")
+        return False
+    process = subprocess.Popen(command, cwd=script_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, errors='replace')
+    for line in process.stdout:
+        print(f"    {stage.name} | {line.rstrip()}", flush=True)
+    return process.wait() == 0
+
+
+def run_pending(state, seed, dry_run=False):
+    """One pass over STAGES in order (upstream outputs are fingerprinted when their consumers come up)
+
+    Returns (stages run, stages failed).
+    """
+    ran = failed = 0
+    for stage in STAGES:
+        previous = state.get(stage.name)
+        current = fingerprint(stage, previous)
+        if current is None:
+            continue
+        changed = changed_inputs(current, previous)
+        if not changed:
+            continue
+        _log(f"{stage.name}: {', '.join(changed[:3])}{' ...' if len(changed) > 3 else ''} changed")
+        if dry_run:
+            continue
+        start = time.perf_counter()
+        if run_stage(stage, seed):
+            state[stage.name] = current
+            save_state(state)
+            _log(f"{stage.name}: done in {time.perf_counter() - start:.1f}s")
+        else:
+            _log(f"{stage.name}: failed after {time.perf_counter() - start:.1f}s, retried on the next change")
+            failed += 1
+        ran += 1
+    return ran, failed
+
+
+# --- Watchers ----------------------------------------------------------------------
+
+def watched_directories():
+    """Directories of the inputs no stage produces (supplier drops and Strapi snapshots)"""
+    produced = {os.path.normpath(output) for stage in STAGES for output in stage.outputs}
+    directories = set()
+    for stage in STAGES:
+        for pattern in stage.inputs + stage.optional:
+            if os.path.normpath(pattern) not in produced:
+                directories.add(os.path.join(script_dir, os.path.dirname(pattern)))
+    return sorted(directory for directory in directories if os.path.isdir(directory))
+
+
+def _relevant(name):
+    return not name.startswith(IGNORED_PREFIXES) and not name.endswith(IGNORED_SUFFIXES)
+
+
+class InotifyWatcher:
+    IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = \
+        0x2, 0x8, 0x40, 0x80, 0x100, 0x200
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_MOVED_FROM | self.IN_CREATE | self.IN_DELETE \
+            | self.IN_MODIFY
+        for directory in directories:
+            if libc.inotify_add_watch(self.fd, directory.encode(), mask) < 0:
+                raise OSError(ctypes.get_errno(), f'inotify_add_watch {directory}')
+
+    def wait(self, timeout):
+        """Names changed within `timeout` seconds (None: block), empty set on timeout"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = self._EVENT.unpack_from(data, offset)
+                name = data[offset + 16:offset + 16 + length].rstrip(b'\0').decode(errors='replace')
+                offset += 16 + length
+                if name and _relevant(name):
+                    names.add(name)
+
+
+class PollingWatcher:
+    """os.scandir of the watched directories every `interval` seconds (a stat per file, no reads)"""
+
+    def __init__(self, directories, interval=1.0):
+        self.directories = directories
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        files = {}
+        for directory in self.directories:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and _relevant(entry.name):
+                        stat = entry.stat()
+                        files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def wait(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            time.sleep(self.interval if deadline is None else max(0, min(self.interval, deadline - time.monotonic())))
+            snapshot = self._scan()
+            changed = {os.path.basename(path) for path in set(snapshot) | set(self.snapshot)
+                       if snapshot.get(path) != self.snapshot.get(path)}
+            self.snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+
+def watch(seed, debounce=2.0, poll=None):
+    directories = watched_directories()
+    watcher = None
+    if poll is None:
+        try:
+            watcher = InotifyWatcher(directories)
+        except (OSError, AttributeError) as e:
+            _log(f"inotify unavailable ({e}), polling instead")
+    if watcher is None:
+        watcher = PollingWatcher(directories, poll or 1.0)
+    _log(f"Watching {', '.join(os.path.relpath(d, script_dir) for d in directories)} "
+         f"({watcher.__class__.__name__.replace('Watcher', '').lower()}, {debounce:g}s debounce), seed {seed}")
+    state = load_state()
+    run_pending(state, seed)
+    try:
+        while True:
+            changed = watcher.wait(None)
+            if not changed:
+                continue
+            # Debounce: wait until the burst has been quiet for `debounce` seconds
+            while True:
+                more = watcher.wait(debounce)
+                if not more:
+                    break
+                changed |= more
+            _log(f"Changes: {', '.join(sorted(changed)[:5])}{' ...' if len(changed) > 5 else ''}")
+            start = time.perf_counter()
+            ran, failed = run_pending(state, seed)
+            if ran:
+                _log(f"{ran - failed} stages rebuilt" + (f", {failed} failed" if failed else '')
+                     + f" in {time.perf_counter() - start:.1f}s")
+    except KeyboardInterrupt:
+        _log("Stopped")
+
+
+def status(state):
+    for stage in STAGES:
+        previous = state.get(stage.name)
+        current = fingerprint(stage, previous)
+        if current is None:
+            missing = [pattern for pattern in stage.inputs if not _matches(pattern)]
+            print(f"  {stage.name:<22} skipped, missing {', '.join(missing) or 'inputs'}")
+            continue
+        changed = changed_inputs(current, previous)
+        print(f"  {stage.name:<22} " + (f"stale: {', '.join(changed)}" if changed else "up to date"))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    options = {'--seed': SEED_DB_PATH, '--debounce': '2'}
+    for option in options:
+        if option in args:
+            i = args.index(option)
+            options[option] = args[i + 1]
+            args = args[:i] + args[i + 2:]
+    poll = None
+    if '--poll' in args:
+        i = args.index('--poll')
+        interval = args[i + 1] if i + 1 < len(args) and args[i + 1].replace('.', '', 1).isdigit() else None
+        poll = float(interval) if interval else 1.0
+        args = args[:i] + args[i + (2 if interval else 1):]
+    if not args:
+        watch(options['--seed'], float(options['--debounce']), poll)
+    elif args == ['once']:
+        state = load_state()
+        ran, failed = run_pending(state, options['--seed'])
+        if not ran:
+            print("Everything is up to date")
+        sys.exit(1 if failed else 0)
+    elif args == ['status']:
+        status(load_state())
+    elif args == ['adopt']:
+        state = load_state()
+        for stage in STAGES:
+            current = fingerprint(stage, state.get(stage.name))
+            if current is not None:
+                state[stage.name] = current
+        save_state(state)
+        print(f"Recorded the current inputs of {len(state)} stages as built -> {state_file}")
+    else:
+        print("Usage: python3 watch_pipeline.py [--seed tablet-app.db] [--debounce seconds] [--poll [seconds]]"
+              " | once | status | adopt")
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Shared wiper-set table for the Valeo database.
+
+Most Valeo vehicles carry a `wipers` block (multiconnexion, standard and
+rear refs) identical to other body variants and years of the same model:
+2821 entries share 650 distinct blocks in the January 2026 file. The build
+stage hashes every block (blake2b of its canonical JSON), stores each
+distinct one once and makes the vehicles point at it:
+
+    python3 wiper_sets.py build
+reads wipers/wipers_database_janv2026.json and writes
+wipers/wiper_sets_janv2026.json:
+    {
+      "metadata": {... same as the database, "wiperSets": n},
+      "wiperSets": [{"id": 1, "hash": "9f3c...", "vehicles": 12, "wipers": {...}}, ...],
+      "brands": {"<brand>": [{id, model, picto1, picto2, direction, productionYears, "wiperSet": 1}, ...]}
+    }
+Set ids follow the first appearance of each block in the database.
+expand() turns it back into the usual database layout.
+
+    python3 wiper_sets.py seed [tablet-app.db]
+exports the same normalization: wiper_sets (one row per set, refs as
+columns plus the wipersPositions JSON of import-wipers-products.js) and
+wiper_vehicles (Valeo entries with their wiper_set_id). The
+(wiper_set_id) index answers "vehicles sharing this wiper set".
+
+    python3 wiper_sets.py shared <valeo id>   # vehicles with the same wipers
+    python3 wiper_sets.py --bench             # JSON / SQLite size, shared-set lookup
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from brand_aliases import load_aliases
+from json_cache import load_json
+from run_metrics import RunMetrics
+from names import slugify
+from seed_db import open_seed, replace_table
+from strapi_import import wiper_positions
+
+# File paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+wipers_database_file = os.path.join(script_dir, 'wipers', 'wipers_database_janv2026.json')
+wiper_sets_file = os.path.join(script_dir, 'wipers', 'wiper_sets_janv2026.json')
+
+REF_COLUMNS = [
+    ('multi_kit_avant', 'multiconnexion', 'kitAvant'),
+    ('multi_cote_conducteur', 'multiconnexion', 'coteConducteur'),
+    ('multi_mono_balais', 'multiconnexion', 'monoBalais'),
+    ('multi_cote_passager', 'multiconnexion', 'cotePassager'),
+    ('std_cote_conducteur', 'standard', 'coteConducteur'),
+    ('std_mono_balais', 'standard', 'monoBalais'),
+    ('std_cote_passager', 'standard', 'cotePassager'),
+]
+
+
+def wipers_hash(wipers):
+    canonical = json.dumps(wipers, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def build_sets(database):
+    """Database with wiper blocks replaced by ids into a shared "wiperSets" table"""
+    sets = {}
+    brands = {}
+    for brand, entries in database.get('brands', {}).items():
+        vehicles = brands[brand] = []
+        for entry in entries:
+            wipers = entry.get('wipers') or {}
+            digest = wipers_hash(wipers)
+            wiper_set = sets.get(digest)
+            if wiper_set is None:
+                wiper_set = sets[digest] = {"id": len(sets) + 1, "hash": digest, "vehicles": 0, "wipers": wipers}
+            wiper_set["vehicles"] += 1
+            vehicle = {key: value for key, value in entry.items() if key != 'wipers'}
+            vehicle["wiperSet"] = wiper_set["id"]
+            vehicles.append(vehicle)
+    metadata = dict(database.get('metadata', {}), wiperSets=len(sets))
+    return {"metadata": metadata, "wiperSets": list(sets.values()), "brands": brands}
+
+
+def expand(document):
+    """Usual database layout (every entry with its own "wipers" block) from a wiper-sets document"""
+    wipers = {wiper_set["id"]: wiper_set["wipers"] for wiper_set in document["wiperSets"]}
+    metadata = {key: value for key, value in document.get("metadata", {}).items() if key != 'wiperSets'}
+    brands = {}
+    for brand, vehicles in document["brands"].items():
+        brands[brand] = [dict({key: value for key, value in vehicle.items() if key != 'wiperSet'},
+                              wipers=wipers[vehicle["wiperSet"]]) for vehicle in vehicles]
+    return {"metadata": metadata, "brands": brands}
+
+
+def build(path=wipers_database_file, output=wiper_sets_file):
+    database = load_json(path)
+    document = build_sets(database)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2, ensure_ascii=False)
+    vehicles = sum(len(v) for v in document["brands"].values())
+    print(f"{vehicles} vehicles, {len(document['wiperSets'])} distinct wiper sets -> {output}")
+    print(f"JSON: {os.path.getsize(path) / 1024:.0f} KB -> {os.path.getsize(output) / 1024:.0f} KB")
+    return document
+
+
+def load_sets():
+    if os.path.exists(wiper_sets_file) and os.path.getmtime(wiper_sets_file) >= os.path.getmtime(wipers_database_file):
+        return load_json(wiper_sets_file)
+    return build_sets(load_json(wipers_database_file))
+
+
+def vehicles_sharing(document, vehicle_id):
+    """(wiper set, [(brand, vehicle)]) of the vehicles whose wipers equal those of `vehicle_id`"""
+    by_set = {}
+    target = None
+    for brand, vehicles in document["brands"].items():
+        for vehicle in vehicles:
+            by_set.setdefault(vehicle["wiperSet"], []).append((brand, vehicle))
+            if vehicle["id"] == vehicle_id:
+                target = vehicle["wiperSet"]
+    if target is None:
+        return None, []
+    return document["wiperSets"][target - 1], by_set[target]
+
+
+# --- Seed export ----------------------------------------------------------------
+
+WIPER_SETS_SQL = """CREATE TABLE wiper_sets (
+  id INTEGER PRIMARY KEY,
+  hash TEXT NOT NULL UNIQUE,
+  multi_kit_avant TEXT,
+  multi_cote_conducteur TEXT,
+  multi_mono_balais TEXT,
+  multi_cote_passager TEXT,
+  std_cote_conducteur TEXT,
+  std_mono_balais TEXT,
+  std_cote_passager TEXT,
+  arriere TEXT,
+  wipers_positions TEXT,
+  vehicle_count INTEGER NOT NULL
+)"""
+
+WIPER_VEHICLES_SQL = """CREATE TABLE wiper_vehicles (
+  id INTEGER PRIMARY KEY,
+  valeo_id TEXT NOT NULL,
+  brand_slug TEXT NOT NULL,
+  model_slug TEXT NOT NULL,
+  model TEXT,
+  picto1 TEXT,
+  picto2 TEXT,
+  direction TEXT,
+  construction_year_start TEXT,
+  construction_year_end TEXT,
+  wiper_set_id INTEGER NOT NULL REFERENCES wiper_sets(id)
+)"""
+
+WIPER_VEHICLES_INDEXES = [
+    "CREATE INDEX idx_wiper_vehicles_set ON wiper_vehicles(wiper_set_id)",
+    "CREATE INDEX idx_wiper_vehicles_model ON wiper_vehicles(brand_slug, model_slug)",
+    # Lookup by Valeo id (the tablet query below); not UNIQUE, the January 2026 file repeats id 8983
+    "CREATE INDEX idx_wiper_vehicles_valeo_id ON wiper_vehicles(valeo_id)",
+]
+
+
+def set_rows(document):
+    for wiper_set in document["wiperSets"]:
+        wipers = wiper_set["wipers"]
+        refs = [(wipers.get(category) or {}).get(key) for _, category, key in REF_COLUMNS]
+        yield (wiper_set["id"], wiper_set["hash"], *refs, wipers.get("arriere"),
+               json.dumps(wiper_positions(wipers), ensure_ascii=False), wiper_set["vehicles"])
+
+
+def vehicle_rows(document):
+    brand_slug = load_aliases().slug
+    row_id = 0
+    for brand, vehicles in document["brands"].items():
+        for vehicle in vehicles:
+            row_id += 1
+            years = vehicle.get("productionYears") or {}
+            yield (row_id, vehicle["id"], brand_slug(brand), slugify(vehicle.get("model")), vehicle.get("model"),
+                   vehicle.get("picto1"), vehicle.get("picto2"), vehicle.get("direction"),
+                   years.get("start"), years.get("end"), vehicle["wiperSet"])
+
+
+def export_to_seed(document, db_path=None):
+    conn = open_seed(db_path)
+    with conn:
+        sets = replace_table(conn, 'wiper_sets', WIPER_SETS_SQL, set_rows(document))
+        vehicles = replace_table(conn, 'wiper_vehicles', WIPER_VEHICLES_SQL, vehicle_rows(document),
+                                 indexes=WIPER_VEHICLES_INDEXES)
+    conn.close()
+    print(f"Exported {vehicles} wiper vehicles referencing {sets} wiper sets to the seed")
+    print("Tablet query: SELECT v.* FROM wiper_vehicles v WHERE v.wiper_set_id = "
+          "(SELECT wiper_set_id FROM wiper_vehicles WHERE valeo_id = ?)")
+    return sets, vehicles
+
+
+def bench(repeat=2000):
+    """Sizes of the per-vehicle layout against the shared sets, JSON and SQLite, and the shared-set lookup"""
+    database = load_json(wipers_database_file)
+    document = build_sets(database)
+    usual_json = json.dumps(database, indent=2, ensure_ascii=False)
+    sets_json = json.dumps(document, indent=2, ensure_ascii=False)
+    print(f"{sum(len(v) for v in document['brands'].values())} vehicles, {len(document['wiperSets'])} wiper sets")
+    print(f"JSON    per vehicle {len(usual_json.encode()) / 1024:7.0f} KB   shared sets "
+          f"{len(sets_json.encode()) / 1024:7.0f} KB")
+
+    directory = tempfile.mkdtemp()
+    flat_db, sets_db = os.path.join(directory, 'flat.db'), os.path.join(directory, 'sets.db')
+    # Per-vehicle layout: every row carries its refs and positions JSON
+    conn = sqlite3.connect(flat_db)
+    ref_columns = ', '.join(f"{column} TEXT" for column, _, _ in REF_COLUMNS)
+    conn.execute(f"CREATE TABLE wiper_vehicles (id INTEGER PRIMARY KEY, valeo_id TEXT, brand_slug TEXT, "
+                 f"model_slug TEXT, model TEXT, picto1 TEXT, picto2 TEXT, direction TEXT, "
+                 f"construction_year_start TEXT, construction_year_end TEXT, {ref_columns}, arriere TEXT, "
+                 f"wipers_positions TEXT)")
+    sets = {row[0]: row for row in set_rows(document)}
+    conn.executemany(f"INSERT INTO wiper_vehicles VALUES ({', '.join('?' * 19)})",
+                     (row[:-1] + sets[row[-1]][2:11] for row in vehicle_rows(document)))
+    conn.execute("CREATE INDEX idx_flat_model ON wiper_vehicles(brand_slug, model_slug)")
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    sqlite3.connect(sets_db).close()
+    export_to_seed(document, sets_db)
+    conn = sqlite3.connect(sets_db)
+    conn.execute("VACUUM")
+    conn.close()
+    print(f"SQLite  per vehicle {os.path.getsize(flat_db) / 1024:7.0f} KB   shared sets "
+          f"{os.path.getsize(sets_db) / 1024:7.0f} KB")
+
+    valeo_id = document["brands"][next(iter(document["brands"]))][0]["id"]
+    queries = [
+        (flat_db, "per vehicle: match 8 ref columns",
+         "SELECT COUNT(*) FROM wiper_vehicles v JOIN wiper_vehicles t ON t.valeo_id = ? "
+         + ''.join(f"AND v.{column} IS t.{column} " for column, _, _ in REF_COLUMNS) + "AND v.arriere IS t.arriere"),
+        (sets_db, "shared sets: wiper_set_id index",
+         "SELECT COUNT(*) FROM wiper_vehicles WHERE wiper_set_id = "
+         "(SELECT wiper_set_id FROM wiper_vehicles WHERE valeo_id = ?)"),
+    ]
+    for path, label, sql in queries:
+        conn = sqlite3.connect(path)
+        plan = ' / '.join(row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, (valeo_id,)))
+        start = time.perf_counter()
+        for _ in range(repeat):
+            count = conn.execute(sql, (valeo_id,)).fetchone()[0]
+        elapsed = (time.perf_counter() - start) / repeat
+        conn.close()
+        print(f"{label:<34} {elapsed * 1e6:8.1f} µs  {count} vehicles  {plan}")
+    for path in (flat_db, sets_db):
+        os.unlink(path)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['build']:
+        build()
+    elif args[:1] == ['seed']:
+        with RunMetrics('wiper-sets-seed') as metrics:
+            metrics.stage('load')
+            document = load_sets()
+            metrics.stage('seed')
+            sets, vehicles = export_to_seed(document, args[1] if len(args) > 1 else None)
+            metrics.count('rows_in', sum(len(v) for v in document["brands"].values()))
+            metrics.count('rows_out', vehicles)
+            metrics.count('wiper_sets', sets)
+    elif args[:1] == ['shared'] and len(args) == 2:
+        wiper_set, vehicles = vehicles_sharing(load_sets(), args[1])
+        if wiper_set is None:
+            sys.exit(f"No Valeo entry with id {args[1]}")
+        print(f"Wiper set {wiper_set['id']} ({wiper_set['hash']}): "
+              + ', '.join(f"{p['position']} {p['ref']}" for p in wiper_positions(wiper_set['wipers'])))
+        for brand, vehicle in vehicles:
+            years = vehicle.get('productionYears') or {}
+            print(f"  {vehicle['id']:>6} {brand} {vehicle['model']} {vehicle.get('picto1') or ''} "
+                  f"({years.get('start')} -> {years.get('end') or ''})")
+    elif args[:1] == ['--bench']:
+        bench()
+    else:
+        print("Usage: python3 wiper_sets.py build | seed [tablet-app.db] | shared <valeo id> | --bench")
@@ -1,10 +1,32 @@
-import csv
 import json
 import datetime
 import os
+import sys
 
-CSV_PATH = os.path.join(os.path.dirname(__file__), '../liste_affectation/Database_PerfectVision_Janv2026 VALEO.csv')
-OUTPUT_PATH = os.path.join(os.path.dirname(__file__), 'wipers_database_janv2026.json')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from catalog_records import WiperEntry, json_default
+from csv_chunks import bench_scaling, parse_chunked
+from brand_aliases import load_aliases
+from brand_reconciliation import slugify, strapi_models_file
+from json_cache import load_json
+from run_metrics import RunMetrics
+from validators import ValidationReport
+
+# Chemin du CSV en argument (nouvelle livraison Valeo), sinon la livraison de janvier 2026 ;
+# chemin de sortie en second argument (valeo_releases.py parse chaque livraison à part).
+# --bench [csv] [--scale N] : lecture parallèle à 1, 2, 4, 8 workers, sans rien écrire
+ARGS = sys.argv[1:]
+BENCH = '--bench' in ARGS
+BENCH_SCALE = 40  # ~113 000 lignes, l'ordre de grandeur de l'export Valeo multi-marchés
+if BENCH:
+    ARGS.remove('--bench')
+    if '--scale' in ARGS:
+        BENCH_SCALE = int(ARGS.pop(ARGS.index('--scale') + 1))
+        ARGS.remove('--scale')
+CSV_PATH = ARGS[0] if len(ARGS) > 0 else \
+    os.path.join(os.path.dirname(__file__), '../liste_affectation/Database_PerfectVision_Janv2026 VALEO.csv')
+OUTPUT_PATH = ARGS[1] if len(ARGS) > 1 else \
+    os.path.join(os.path.dirname(__file__), 'wipers_database_janv2026.json')
 
 
 import re
@@ -32,12 +54,8 @@ _MODEL_SUFFIXES = re.compile(
     re.IGNORECASE
 )
 
-# Mapping des noms de marque CSV → nom exact dans Strapi
-BRAND_NAME_MAP = {
-    'CITROËN':          'CITROEN',
-    'DS AUTOMOBILES':   'DS',
-    'AUSTIN ROVER':     'AUSTIN-ROVER',
-}
+# Noms de marque CSV → nom exact dans Strapi : table d'alias partagée (brand_aliases.py)
+BRAND_ALIASES = load_aliases()
 
 # Mapping des noms de modèle CSV (Jan 2026) → nom exact dans Strapi, par marque
 MODEL_NAME_MAP = {
@@ -786,51 +804,15 @@ def normalize_model(name: str, brand: str = '') -> str:
         return brand_map[cleaned]
     return cleaned
 
-def normalize_brand(name: str) -> str:
-    return BRAND_NAME_MAP.get(name.strip(), name.strip())
-
+def normalize_brand(name: str, record: bool = True) -> str:
+    return BRAND_ALIASES.canonical_name(name, record)
 
-brands = {}
-total = 0
 
-with open(CSV_PATH, encoding='utf-8') as f:
-    reader = csv.reader(f)
-    rows = list(reader)
-
-# Row 0-2 are headers; data starts at index 3
-for row in rows[3:]:
+def parse_row(row):
+    """Une ligne CSV → (marque brute, champs du WiperEntry) ; None si la ligne est incomplète.
+    Tourne dans les workers de parse_chunked : la normalisation (regex) est répartie sur les cœurs."""
     if len(row) < 18:
-        continue
-
-    wipers = {
-        "multiconnexion": {
-            "kitAvant":       clean_ref(row[10]),
-            "coteConducteur": clean_ref(row[11]),
-            "monoBalais":     clean_ref(row[12]),
-            "cotePassager":   clean_ref(row[13]),
-        },
-        "standard": {
-            "coteConducteur": clean_ref(row[14]),
-            "monoBalais":     clean_ref(row[15]),
-            "cotePassager":   clean_ref(row[16]),
-        },
-        "arriere": clean_ref(row[17]),
-    }
-
-    has_wipers = any([
-        wipers["multiconnexion"]["kitAvant"],
-        wipers["multiconnexion"]["coteConducteur"],
-        wipers["multiconnexion"]["monoBalais"],
-        wipers["multiconnexion"]["cotePassager"],
-        wipers["standard"]["coteConducteur"],
-        wipers["standard"]["monoBalais"],
-        wipers["standard"]["cotePassager"],
-        wipers["arriere"],
-    ])
-    if not has_wipers:
-        continue
-
-    brand = normalize_brand(row[1])
+        return None
     month_start = row[6].strip()
     year_start  = row[7].strip()
     month_end   = row[8].strip()
@@ -839,53 +821,112 @@ for row in rows[3:]:
     start = f"{month_start}/{year_start}" if year_start else None
     end   = f"{month_end}/{year_end}"     if year_end   else None
 
-    entry = {
-        "id":        row[0].strip(),
-        "model":     normalize_model(row[2], brand),
-        "picto1":    row[3].strip(),
-        "picto2":    row[4].strip(),
-        "direction": row[5].strip(),
-        "productionYears": {"start": start, "end": end},
-        "wipers": wipers,
-    }
-
-    brands.setdefault(brand, []).append(entry)
-    total += 1
-
-output = {
-    "metadata": {
-        "source":        "Database_PerfectVision_Janv2026 VALEO.csv",
-        "totalVehicles": total,
-        "brands":        len(brands),
-        "wiperBrand":    "Valeo",
-        "generatedAt":   datetime.datetime.utcnow().isoformat() + "Z",
-        "categories": {
-            "multiconnexion": "Balais plat avant multiconnexion (colonnes 11-14)",
-            "standard":       "Balais avant standard (colonnes 15-17)",
-            "arriere":        "Arrière (colonne 18)",
-        },
-    },
-    "brands": brands,
-}
+    return row[1], (
+        row[0].strip(),
+        normalize_model(row[2], normalize_brand(row[1], record=False)),
+        row[3].strip(),
+        row[4].strip(),
+        row[5].strip(),
+        start,
+        end,
+        clean_ref(row[10]), clean_ref(row[11]), clean_ref(row[12]), clean_ref(row[13]),  # multiconnexion
+        clean_ref(row[14]), clean_ref(row[15]), clean_ref(row[16]),                      # standard
+        clean_ref(row[17]),                                                              # arrière
+    )
 
-with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-    json.dump(output, f, ensure_ascii=False, indent=2)
 
-# Statistics
-multi_count = sum(
-    1 for brand_list in brands.values() for e in brand_list
-    if any(e["wipers"]["multiconnexion"].values())
-)
-std_count = sum(
-    1 for brand_list in brands.values() for e in brand_list
-    if any(e["wipers"]["standard"].values())
-)
-rear_count = sum(
-    1 for brand_list in brands.values() for e in brand_list
-    if e["wipers"]["arriere"]
-)
+def main():
+    if BENCH:
+        bench_scaling(CSV_PATH, parse_row, skip_rows=3, scale=BENCH_SCALE)
+        return
+
+    brands = {}
+    total = 0
+    validation = ValidationReport('valeo-wipers')
+    with RunMetrics('valeo-parse') as metrics:
+        metrics.stage('parse')
+
+        # Modèles Strapi connus : un modèle Valeo absent après normalisation est « non mappé »
+        strapi_model_slugs = set()
+        if os.path.exists(strapi_models_file):
+            strapi_model_slugs = {m.get('slug') for m in load_json(strapi_models_file).get('data', [])}
+        unmapped = {}
+
+        # Lignes 0-2 : en-têtes. Le CSV est découpé en plages d'octets alignées sur les lignes
+        # (sauts de ligne entre guillemets compris), lues et normalisées en parallèle, puis
+        # reprises ici dans l'ordre du fichier : une ligne CSV → un WiperEntry (slots + chaînes internées)
+        for line_num, parsed in parse_chunked(CSV_PATH, parse_row, skip_rows=3):
+            metrics.add('rows_in')
+            if parsed is None:
+                metrics.add('rows_short')
+                continue
+
+            raw_brand, fields = parsed
+            brand = normalize_brand(raw_brand)  # les marques non résolues sont comptées ici, pas dans les workers
+            entry = WiperEntry(*fields)
+            if not entry.has_wipers():
+                metrics.add('rows_without_wipers')
+                continue
+            if strapi_model_slugs and slugify(entry.model) not in strapi_model_slugs:
+                unmapped.setdefault((brand, entry.model), line_num)
+            validation.check('wiper-entry', entry, f"CSV line {line_num}")
+
+            brands.setdefault(brand, []).append(entry)
+            total += 1
+
+        output = {
+            "metadata": {
+                "source":        os.path.basename(CSV_PATH),
+                "totalVehicles": total,
+                "brands":        len(brands),
+                "wiperBrand":    "Valeo",
+                "generatedAt":   datetime.datetime.utcnow().isoformat() + "Z",
+                "categories": {
+                    "multiconnexion": "Balais plat avant multiconnexion (colonnes 11-14)",
+                    "standard":       "Balais avant standard (colonnes 15-17)",
+                    "arriere":        "Arrière (colonne 18)",
+                },
+            },
+            "brands": brands,
+        }
+
+        metrics.stage('write')
+        with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
+            json.dump(output, f, ensure_ascii=False, indent=2, default=json_default)
+
+        # Statistics
+        multi_count = sum(
+            1 for brand_list in brands.values() for e in brand_list
+            if any(e.multiconnexion())
+        )
+        std_count = sum(
+            1 for brand_list in brands.values() for e in brand_list
+            if any(e.standard())
+        )
+        rear_count = sum(
+            1 for brand_list in brands.values() for e in brand_list
+            if e.arriere
+        )
+
+        metrics.stage(None)
+        metrics.count('rows_out', total)
+        metrics.count('brands', len(brands))
+        metrics.count('unmapped_models', len(unmapped))
+        metrics.count('unresolved_brands', len(BRAND_ALIASES.unresolved))
+        metrics.count('unmapped_models_sample',
+                      [f"{b} / {m} (ligne {line})" for (b, m), line in list(unmapped.items())[:20]])
+        metrics.count('invalid_records', sum(validation.invalid.values()))
+
+        BRAND_ALIASES.print_unresolved()
+        validation.print_summary()
+        print(f"Rapport de validation : {validation.write()}")
+        print(f"✅ {total} véhicules / {len(brands)} marques → {OUTPUT_PATH}")
+        print(f"   Avec balais multiconnexion : {multi_count}")
+        print(f"   Avec balais standard       : {std_count}")
+        print(f"   Avec balai arrière         : {rear_count}")
+        if strapi_model_slugs:
+            print(f"   Modèles non mappés (absents de Strapi) : {len(unmapped)}")
+
 
-print(f"✅ {total} véhicules / {len(brands)} marques → {OUTPUT_PATH}")
-print(f"   Avec balais multiconnexion : {multi_count}")
-print(f"   Avec balais standard       : {std_count}")
-print(f"   Avec balai arrière         : {rear_count}")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Versioned store of the Valeo PerfectVision releases.
+
+Each Valeo delivery (Database_PerfectVision_<Mois><Année> VALEO.csv) is
+parsed by parse_valeo_janv2026.py, one process per CSV in parallel, and
+merged into wipers/valeo_releases.json:
+
+    {
+      "format": "valeo-releases-v1",
+      "releases": [{"release": "2026-01", "effective": "2026-01-01", "source", "sha1",
+                    "metadata": {...}, "vehicles": [key, ...]}],          # by effective date
+      "vehicles": {key: [{"from": "2026-01", "to": "2026-04", "brand": "AUDI", "entry": {...}},
+                         {"from": "2026-04", "to": null, ...}]}
+    }
+
+A vehicle key is its Valeo `id` (`id#2` for a second row with the same id
+in one release). A version holds one content of the vehicle, from the
+release that introduced it up to the release where it changed or
+disappeared (`to`, exclusive; null while current). `vehicles` of a
+release keeps the order of its CSV, so that the view of any release is
+rebuilt exactly as the parser wrote it. Release dates come from the file
+name ("Janv2026" -> 2026-01-01) or from path@YYYY-MM-DD.
+
+A CSV already in the store (same sha1) is not parsed again, and a release
+older than the latest is merged in its place: versions are re-cut around it.
+
+    python3 wipers/valeo_releases.py ingest [csv[@YYYY-MM-DD] ...]   # default: liste_affectation/*VALEO*.csv
+    python3 wipers/valeo_releases.py view [--at YYYY-MM-DD | --release YYYY-MM] [-o database.json]
+    python3 wipers/valeo_releases.py history <valeo id>
+    python3 wipers/valeo_releases.py releases
+"""
+import datetime
+import glob
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import unicodedata
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from json_cache import load_json
+
+# File paths
+wipers_dir = os.path.dirname(os.path.abspath(__file__))
+script_dir = os.path.dirname(wipers_dir)
+parser_script = os.path.join(wipers_dir, 'parse_valeo_janv2026.py')
+store_file = os.path.join(wipers_dir, 'valeo_releases.json')
+default_csv_pattern = os.path.join(script_dir, 'liste_affectation', '*VALEO*.csv')
+
+FORMAT = 'valeo-releases-v1'
+
+MONTHS = {
+    'janv': 1, 'jan': 1, 'fevr': 2, 'fev': 2, 'mars': 3, 'mar': 3, 'avr': 4, 'avril': 4, 'mai': 5, 'juin': 6,
+    'juil': 7, 'aout': 8, 'sept': 9, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+
+
+def release_date(path):
+    """Effective date of a release: path@YYYY-MM-DD, else <Mois><Année> of the file name"""
+    if '@' in os.path.basename(path):
+        path, date = path.rsplit('@', 1)
+        return path, datetime.date.fromisoformat(date)
+    name = unicodedata.normalize('NFKD', os.path.basename(path))
+    name = ''.join(ch for ch in name if not unicodedata.combining(ch)).lower()
+    for word, year in re.findall(r'([a-z]+)[ _-]?(\d{4})', name):
+        month = MONTHS.get(word) or MONTHS.get(word[-4:]) or MONTHS.get(word[-3:])
+        if month:
+            return path, datetime.date(int(year), month, 1)
+    sys.exit(f"No release month in {os.path.basename(path)}, pass it as {path}@YYYY-MM-DD")
+
+
+def _sha1(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def empty_store():
+    return {"format": FORMAT, "releases": [], "vehicles": {}}
+
+
+def load_store():
+    return load_json(store_file, use_cache=False) if os.path.exists(store_file) else empty_store()
+
+
+def save_store(store):
+    fd, tmp = tempfile.mkstemp(dir=wipers_dir, prefix='.valeo_releases.', suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(store, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, store_file)
+
+
+def parse_releases(paths):
+    """Parse every CSV in its own process, all at once; {csv path: parsed database}"""
+    directory = tempfile.mkdtemp(prefix='valeo-releases-')
+    processes = {}
+    for i, path in enumerate(paths):
+        output = os.path.join(directory, f"{i}.json")
+        log = open(os.path.join(directory, f"{i}.log"), 'w', encoding='utf-8')
+        processes[path] = (subprocess.Popen([sys.executable, parser_script, path, output], cwd=script_dir,
+                                            stdout=log, stderr=subprocess.STDOUT), output, log)
+    parsed = {}
+    for path, (process, output, log) in processes.items():
+        code = process.wait()
+        log.close()
+        with open(log.name, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        if code != 0:
+            print('\n'.join(lines[-15:]))
+            sys.exit(f"Parsing {os.path.basename(path)} failed (exit {code})")
+        summary = next((line for line in lines if line.startswith('✅')), '')
+        print(f"  {os.path.basename(path)}: {summary}".rstrip())
+        with open(output, encoding='utf-8') as f:
+            parsed[path] = json.load(f)
+        os.unlink(output)
+        os.unlink(log.name)
+    os.rmdir(directory)
+    return parsed
+
+
+def release_states(database):
+    """(vehicle keys in CSV order, {key: (brand, entry)}) of one parsed release"""
+    keys, states, seen = [], {}, {}
+    for brand, entries in database['brands'].items():
+        for entry in entries:
+            seen[entry['id']] = seen.get(entry['id'], 0) + 1
+            key = entry['id'] if seen[entry['id']] == 1 else f"{entry['id']}#{seen[entry['id']]}"
+            keys.append(key)
+            states[key] = (brand, entry)
+    return keys, states
+
+
+def merge_release(store, label, effective, source, sha1, database):
+    """Add (or replace) one release and re-cut the versions of every vehicle around it"""
+    releases = [release for release in store['releases'] if release['release'] != label]
+    old_order = [release['release'] for release in store['releases']]
+    # Expand the versions into per-release states, on the releases as they were
+    states = {}
+    for key, versions in store['vehicles'].items():
+        for version in versions:
+            start = old_order.index(version['from'])
+            end = old_order.index(version['to']) if version['to'] else len(old_order)
+            for release in old_order[start:end]:
+                if release != label:
+                    states.setdefault(key, {})[release] = (version['brand'], version['entry'])
+    keys, new_states = release_states(database)
+    for key, state in new_states.items():
+        states.setdefault(key, {})[label] = state
+    releases.append({"release": label, "effective": effective.isoformat(), "source": source, "sha1": sha1,
+                     "metadata": database.get('metadata', {}), "vehicles": keys})
+    releases.sort(key=lambda release: release['effective'])
+    order = [release['release'] for release in releases]
+
+    vehicles = {}
+    for key, by_release in states.items():
+        versions = []
+        for release in order:
+            state = by_release.get(release)
+            current = versions[-1] if versions and versions[-1]['to'] is None else None
+            if state is None:
+                if current:
+                    current['to'] = release
+            elif current and (current['brand'], current['entry']) == state:
+                continue
+            else:
+                if current:
+                    current['to'] = release
+                versions.append({"from": release, "to": None, "brand": state[0], "entry": state[1]})
+        vehicles[key] = versions
+    store['releases'] = releases
+    store['vehicles'] = vehicles
+    return store
+
+
+def ingest(paths):
+    store = load_store()
+    known = {release['sha1']: release['release'] for release in store['releases']}
+    pending = {}
+    for argument in paths:
+        path, effective = release_date(argument)
+        if not os.path.exists(path):
+            sys.exit(f"{path} not found")
+        sha1 = _sha1(path)
+        if sha1 in known:
+            print(f"  {os.path.basename(path)}: already in the store as {known[sha1]}")
+            continue
+        pending[path] = (effective, sha1)
+    if not pending:
+        print("Nothing to ingest")
+        return store
+    print(f"Parsing {len(pending)} release(s), one process per file...")
+    parsed = parse_releases(list(pending))
+    for path, (effective, sha1) in sorted(pending.items(), key=lambda item: item[1][0]):
+        label = effective.strftime('%Y-%m')
+        merge_release(store, label, effective, os.path.basename(path), sha1, parsed[path])
+        print(f"  merged {label} (effective {effective.isoformat()})")
+    save_store(store)
+    versions = sum(len(v) for v in store['vehicles'].values())
+    print(f"{len(store['releases'])} releases, {len(store['vehicles'])} vehicles, {versions} versions -> {store_file}")
+    return store
+
+
+def release_at(store, at=None, label=None):
+    """Release in effect on date `at` (latest by default), or the release labelled `label`"""
+    if label:
+        release = next((r for r in store['releases'] if r['release'] == label), None)
+        if release is None:
+            sys.exit(f"No release {label} (have: {', '.join(r['release'] for r in store['releases'])})")
+        return release
+    candidates = [r for r in store['releases'] if at is None or r['effective'] <= at.isoformat()]
+    if not candidates:
+        sys.exit(f"No release effective on {at}")
+    return candidates[-1]
+
+
+def view(store, release):
+    """The usual wipers database layout of one release, as parse_valeo_janv2026.py wrote it"""
+    order = [r['release'] for r in store['releases']]
+    index = order.index(release['release'])
+    brands = {}
+    for key in release['vehicles']:
+        for version in store['vehicles'][key]:
+            end = order.index(version['to']) if version['to'] else len(order)
+            if order.index(version['from']) <= index < end:
+                brands.setdefault(version['brand'], []).append(version['entry'])
+                break
+    metadata = dict(release['metadata'], release=release['release'], effective=release['effective'])
+    return {"metadata": metadata, "brands": brands}
+
+
+def history(store, valeo_id):
+    effective = {r['release']: r['effective'] for r in store['releases']}
+    keys = [key for key in store['vehicles'] if key == valeo_id or key.startswith(f"{valeo_id}#")]
+    if not keys:
+        sys.exit(f"No Valeo entry with id {valeo_id}")
+    for key in keys:
+        print(f"Valeo {key}:")
+        for version in store['vehicles'][key]:
+            entry = version['entry']
+            years = entry.get('productionYears') or {}
+            refs = ' | '.join(f"{block} " + ' / '.join(v for v in (entry['wipers'].get(block) or {}).values() if v)
+                              for block in ('multiconnexion', 'standard')
+                              if any((entry['wipers'].get(block) or {}).values()))
+            if entry['wipers'].get('arriere'):
+                refs += f" | arriere {entry['wipers']['arriere']}"
+            until = f"until {effective[version['to']]}" if version['to'] else "current"
+            print(f"  {effective[version['from']]} {until:<17} {version['brand']} {entry['model']} "
+                  f"({years.get('start')} -> {years.get('end') or ''}): {refs}")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['ingest']:
+        ingest(args[1:] or sorted(glob.glob(default_csv_pattern)))
+    elif args[:1] == ['view']:
+        options = dict(zip(args[1::2], args[2::2]))
+        store = load_store()
+        at = datetime.date.fromisoformat(options['--at']) if '--at' in options else None
+        release = release_at(store, at, options.get('--release'))
+        database = view(store, release)
+        total = sum(len(entries) for entries in database['brands'].values())
+        if '-o' in options:
+            with open(options['-o'], 'w', encoding='utf-8') as f:
+                json.dump(database, f, ensure_ascii=False, indent=2)
+        print(f"Release {release['release']} (effective {release['effective']}, {release['source']}): "
+              f"{total} vehicles, {len(database['brands'])} brands" + (f" -> {options['-o']}" if '-o' in options else ''))
+    elif args[:1] == ['history'] and len(args) == 2:
+        history(load_store(), args[1])
+    elif args[:1] == ['releases']:
+        for release in load_store()['releases']:
+            print(f"  {release['release']}  effective {release['effective']}  {len(release['vehicles']):>5} vehicles  "
+                  f"{release['source']}")
+    else:
+        print("Usage: python3 wipers/valeo_releases.py ingest [csv[@YYYY-MM-DD] ...]\n"
+              "       python3 wipers/valeo_releases.py view [--at YYYY-MM-DD | --release YYYY-MM] [-o database.json]\n"
+              "       python3 wipers/valeo_releases.py history <valeo id> | releases")
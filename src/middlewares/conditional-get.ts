@@ -0,0 +1,38 @@
+/**
+ * Conditional GET for the content API.
+ *
+ * Strapi sends no ETag / Last-Modified on /api/* responses, so clients had
+ * to download every page again even when nothing changed. This middleware
+ * hashes the JSON body of every successful GET /api/* response into a weak
+ * ETag and answers 304 Not Modified (no body) when the request's
+ * If-None-Match matches it. The pipeline fetchers (scripts/http_cache.py)
+ * then serve unchanged pages from their on-disk cache.
+ *
+ * Responses that already carry an ETag (the sync endpoint's version) are
+ * left as they are.
+ */
+import { createHash } from 'crypto';
+
+export default () => {
+  return async (ctx, next) => {
+    await next();
+
+    if ((ctx.method !== 'GET' && ctx.method !== 'HEAD') || ctx.status !== 200 || !ctx.path.startsWith('/api/')) {
+      return;
+    }
+    if (ctx.response.get('ETag') || ctx.body == null || typeof ctx.body.pipe === 'function') {
+      return;
+    }
+
+    // Serialize once here: koa would stringify the object again when sending it
+    const body = typeof ctx.body === 'string' || Buffer.isBuffer(ctx.body) ? ctx.body : JSON.stringify(ctx.body);
+    ctx.set('ETag', `W/"${createHash('sha1').update(body).digest('base64url')}"`);
+    ctx.body = body;
+
+    // ctx.fresh compares If-None-Match with the ETag just set
+    if (ctx.fresh) {
+      ctx.status = 304;
+      ctx.body = null;
+    }
+  };
+};